@@ -0,0 +1,71 @@
+"""
+Record codecs.
+
+RedisDB stores every record as one JSON document. The codec decides how that
+document is produced and parsed: "orjson" (default) is several times faster
+than the standard library for both directions, "json" uses the standard
+library only. Both write plain JSON, so records written by either codec (and
+records written before codecs existed) read back unchanged with the other.
+"""
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class JSONCodec:
+    """Standard library json"""
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> Union[str, bytes]:
+        return json.dumps(obj, separators=(",", ":"), default=str)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return self.dumps(obj).encode("utf-8")
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """orjson: UTF-8 bytes out, str or bytes in"""
+
+    name = "orjson"
+    _OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=self._OPTIONS)
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        return self.dumps(obj)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        return orjson.loads(data)
+
+
+CODECS = {
+    "json": JSONCodec,
+    "orjson": OrjsonCodec,
+}
+
+
+@lru_cache()
+def get_codec() -> JSONCodec:
+    """Get the configured record codec (RECORD_CODEC=orjson or json)"""
+    name = get_settings().record_codec
+    if name not in CODECS:
+        raise ValueError(f"Unknown RECORD_CODEC {name!r}; expected one of {', '.join(CODECS)}")
+    if name == "orjson" and orjson is None:
+        logger.warning("orjson is not installed; falling back to the json record codec")
+        name = "json"
+    return CODECS[name]()
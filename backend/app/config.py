@@ -9,14 +9,57 @@ from functools import lru_cache
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
+    # Storage: "redis", or "memory" for a single process without Redis (data is not persisted)
+    storage_engine: str = "redis"
+    
+    # Record serialization: "orjson", or "json" for the standard library (both store plain JSON)
+    record_codec: str = "orjson"
+    
     # Redis
     redis_url: str = "redis://localhost:6379/0"
     
+    # Request instrumentation: Server-Timing headers and slow request log
+    redis_instrumentation: bool = True
+    slow_request_threshold_ms: float = 500.0
+    slow_request_redis_round_trips: int = 100
+    
+    # /metrics: scrapers send "Authorization: Bearer <token>"; if empty, only loopback clients are served
+    metrics_token: str = ""
+    
     # JWT
     jwt_secret_key: str
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 60
     
+    # Password hashing (bcrypt cost, worker threads, max calls waiting before 503)
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 64
+    
+    # Auth caching (verified token claims and user profiles, per process)
+    auth_cache_size: int = 10000
+    auth_user_cache_ttl_seconds: float = 5.0
+    
+    # Process-local entity cache, invalidated over Redis pub/sub (empty list disables it)
+    entity_cache_entities: str = "campaigns,sending_accounts,email_sequences,users"
+    entity_cache_size: int = 10000
+    entity_cache_ttl_seconds: float = 30.0
+    
+    # Listing ETags: rendered listing bodies kept per process, keyed by ETag (0 disables)
+    listing_cache_max_bytes: int = 16 * 1024 * 1024
+    
+    # Event retention: email events older than the window move from Redis to a
+    # SQLite archive at this path (run app.services.event_retention; empty disables)
+    event_archive_path: str = ""
+    event_hot_retention_days: int = 30
+    event_compaction_interval_seconds: float = 3600.0
+    
+    # Event log: created email events are also appended to sharded Redis streams
+    # for projections (python -m app.services.event_projections; 0 shards disables)
+    event_stream_shards: int = 4
+    event_stream_max_length: int = 100000
+    event_consumer_batch_size: int = 500
+    
     # CORS
     frontend_url: str = "http://localhost:5173"
     
@@ -26,6 +69,39 @@ class Settings(BaseSettings):
     smtp_username: str = ""
     smtp_password: str = ""
     
+    # Tracking
+    tracking_base_url: str = "http://localhost:8000"
+    tracking_signing_keys: str = ""  # "1:secret,2:secret"; derived from jwt_secret_key if empty
+    tracking_key_version: int = 1
+    click_link_cache_size: int = 10000
+    click_flush_interval_seconds: float = 1.0
+    click_flush_batch_size: int = 500
+    click_buffer_max_size: int = 100000  # clicks kept while writes fail; the oldest are dropped beyond this
+    
+    # IMAP reply polling
+    imap_max_workers: int = 16
+    imap_max_connections_per_host: int = 4
+    imap_timeout_seconds: float = 30.0
+    imap_poll_timeout_seconds: float = 120.0
+    imap_fetch_batch_size: int = 200
+    imap_snippet_bytes: int = 2048
+    imap_initial_sync_days: int = 7
+    
+    # IMAP IDLE reply listener
+    imap_idle_timeout_seconds: float = 25 * 60
+    imap_poll_fallback_seconds: float = 300.0
+    imap_reconnect_max_backoff_seconds: float = 300.0
+    reply_listener_refresh_seconds: float = 60.0
+    
+    # Lead import
+    lead_import_chunk_size: int = 1000
+    
+    # Deletes touching more dependents than this run as background jobs
+    cascade_inline_limit: int = 1000
+    
+    # Finished job records are purged after this long
+    job_retention_hours: int = 7 * 24
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
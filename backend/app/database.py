@@ -2,40 +2,253 @@
 Redis database client and helper functions
 """
 import redis
-import json
+import time
 import uuid
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterator, Iterable, Set
 from functools import lru_cache
 from .config import get_settings
+from .codec import JSONCodec, get_codec
+from .entity_cache import EntityCache, INVALIDATION_CHANNEL, cached_entities, get_entity_cache
+from .event_log import append_event, stream_keys
+from .instrumentation import InstrumentedRedis
+from .metrics import Gauge
+from .storage import StorageEngine, RedisEngine, MemoryEngine, SQLiteArchive
+
+
+# Field indexes ({entity}:by_{field}:{value}) maintained for each entity,
+# so deletes can clean them up without callers listing them
+INDEXED_FIELDS = {
+    "users": ("email",),
+    "leads": ("lead_list_id", "campaign_id"),
+    "email_sequences": ("campaign_id",),
+    "email_sequence_variants": ("sequence_id",),
+    "email_events": ("lead_id", "campaign_id", "message_id"),
+}
+
+# Dependents removed along with a parent record by cascade_delete:
+# parent entity -> [(child entity, child field referencing the parent, action)]
+# "delete" removes the child (and its own dependents), "detach" clears the field.
+CASCADES = {
+    "campaigns": [
+        ("email_sequences", "campaign_id", "delete"),
+        ("email_events", "campaign_id", "delete"),
+        ("leads", "campaign_id", "detach"),
+    ],
+    "email_sequences": [
+        ("email_sequence_variants", "sequence_id", "delete"),
+    ],
+}
+
+# Entities without a user_id of their own, owned through a parent record:
+# entity -> (parent entity, field holding the parent's ID)
+OWNER_REFERENCES = {
+    "email_sequences": ("campaigns", "campaign_id"),
+    "email_events": ("campaigns", "campaign_id"),
+}
+
+# Positional layouts of high-volume entities: their records are stored as a
+# JSON array [RECORD_LAYOUT_TAG, *values, {other fields}] instead of an
+# object, so field names are not repeated in every record (about a third
+# fewer value bytes for a typical event; see storage.email_events.record_bytes
+# in benchmarks/run.py - per-key overhead is unchanged). The trailing
+# object is always written (empty when there are no other fields), so
+# appending fields keeps stored records readable; reordering or removing
+# them does not. Tag 1 arrays (object only when non-empty) are still read.
+RECORD_LAYOUTS = {
+    "email_events": (
+        "id", "created_at", "updated_at", "occurred_at", "event_type", "campaign_id", "lead_id",
+        "sequence_id", "step_number", "sending_account_id", "message_id", "recipient_email", "subject",
+    ),
+}
+RECORD_LAYOUT_TAG = 2
+
+# Entities whose records older than EVENT_HOT_RETENTION_DAYS move to the
+# archive (EVENT_ARCHIVE_PATH); reads of them span both tiers
+ARCHIVED_ENTITIES = ("email_events",)
+
+# Per-record keys other than the record itself, removed when it is deleted
+AUXILIARY_KEYS = {
+    "campaigns": ("stats:by_campaign:{id}", "stats:applied:by_campaign:{id}", "counters:campaigns:{id}"),
+    "email_sequences": ("email_sequences:links:{id}", "email_sequences:link_ids:{id}"),
+}
+
+# Why an address is suppressed. Each reason has its own set; the set checked
+# before sending holds their union, so lifting one reason keeps the others
+SUPPRESSION_REASONS = ("bounced", "unsubscribed")
+
+# Number of records read or written per round trip by the batch helpers
+BATCH_SIZE = 1000
+
+
+def normalize_email(email: Optional[str]) -> str:
+    """Normalize an email address for duplicate detection"""
+    return (email or "").strip().lower()
+
+
+def _packed(entity: str, record: Dict[str, Any]):
+    """The value stored for a record: the record, or its RECORD_LAYOUTS array"""
+    layout = RECORD_LAYOUTS.get(entity)
+    if layout is None:
+        return record
+    values: List[Any] = [RECORD_LAYOUT_TAG]
+    values.extend(record.get(field) for field in layout)
+    # Most records are never updated; store updated_at only once it differs
+    if record.get("updated_at") == record.get("created_at"):
+        values[layout.index("updated_at") + 1] = None
+    values.append({key: value for key, value in record.items() if key not in layout})
+    return values
+
+
+def encode_record(entity: str, record: Dict[str, Any], codec: Optional[JSONCodec] = None):
+    """Encode a record, positionally if its entity has a RECORD_LAYOUTS entry"""
+    return (codec or get_codec()).dumps(_packed(entity, record))
+
+
+def decode_record(entity: str, data, codec: Optional[JSONCodec] = None) -> Dict[str, Any]:
+    """Decode a record written by encode_record (or as a plain JSON object)"""
+    value = (codec or get_codec()).loads(data)
+    if isinstance(value, dict):
+        return value
+    layout = RECORD_LAYOUTS[entity]
+    # Layout fields are scalars, so a trailing object is the other fields
+    # (always present from tag 2, only when non-empty in tag 1)
+    extras = value[-1] if isinstance(value[-1], dict) else {}
+    values = value[1:-1] if isinstance(value[-1], dict) else value[1:]
+    record = dict(zip(layout, values))
+    for field in layout[len(values):]:
+        record[field] = None
+    if record.get("updated_at") is None:
+        record["updated_at"] = record.get("created_at")
+    record.update(extras)
+    return record
 
 
 @lru_cache()
 def get_redis_client() -> redis.Redis:
     """Get cached Redis client"""
     settings = get_settings()
-    return redis.from_url(settings.redis_url, decode_responses=True)
+    client_class = InstrumentedRedis if settings.redis_instrumentation else redis.Redis
+    return client_class.from_url(settings.redis_url, decode_responses=True)
 
 
-def get_db() -> redis.Redis:
-    """Dependency to get database client"""
-    return get_redis_client()
+@lru_cache()
+def get_event_archive() -> Optional[SQLiteArchive]:
+    """The archive of ARCHIVED_ENTITIES at EVENT_ARCHIVE_PATH, or None when archiving is off"""
+    path = get_settings().event_archive_path
+    if not path:
+        return None
+    return SQLiteArchive(
+        path,
+        {entity: INDEXED_FIELDS.get(entity, ()) for entity in ARCHIVED_ENTITIES},
+        encode=lambda entity, record: get_codec().dumps_bytes(_packed(entity, record)),
+        decode=decode_record
+    )
+
+
+@lru_cache()
+def get_storage_engine() -> StorageEngine:
+    """Get the configured storage engine (STORAGE_ENGINE=redis or memory)"""
+    if get_settings().storage_engine == "memory":
+        return MemoryEngine()
+    return RedisEngine(get_redis_client())
+
+
+def _redis_pool_stats() -> Dict[tuple, int]:
+    if get_settings().storage_engine != "redis":
+        return {}
+    pool = get_redis_client().connection_pool
+    return {
+        ("in_use",): len(pool._in_use_connections),
+        ("idle",): len(pool._available_connections),
+        ("max",): pool.max_connections
+    }
+
+
+REDIS_POOL_CONNECTIONS = Gauge(
+    "redis_pool_connections", "Redis connection pool usage", ("state",), callback=_redis_pool_stats
+)
+
+
+def _event_log_stats() -> Dict[tuple, int]:
+    engine = get_storage_engine()
+    stats = {}
+    for key in stream_keys():
+        shard = key.rsplit(":", 1)[1]
+        for group, info in engine.stream_groups(key).items():
+            if info["lag"] is not None:
+                stats[(group, shard, "lag")] = info["lag"]
+            stats[(group, shard, "pending")] = info["pending"]
+    return stats
+
+
+EVENT_LOG_ENTRIES = Gauge(
+    "event_log_consumer_entries",
+    "Event log entries per consumer group and shard not yet delivered (lag) or not yet acknowledged (pending)",
+    ("group", "shard", "state"),
+    callback=_event_log_stats
+)
+
+
+def get_db() -> StorageEngine:
+    """Dependency to get the storage engine"""
+    return get_storage_engine()
 
 
 class RedisDB:
     """
-    Redis database helper for managing entities.
-    Uses Redis hashes and sets to simulate a document database.
+    Database helper for managing entities.
+    Uses the hashes and sets of a StorageEngine (Redis, or in-memory) to
+    simulate a document database.
     
     Data structure:
-    - {entity}:{id} -> JSON string of entity data
+    - {entity}:{id} -> JSON string of entity data (encoded by the record codec; an array for RECORD_LAYOUTS entities)
     - {entity}:all -> Set of all entity IDs
     - {entity}:by_user:{user_id} -> Set of entity IDs for a user
     - {entity}:by_{field}:{value} -> Set of entity IDs with that field value
+    - leads:email_ids:by_lead_list_id:{list_id} -> Hash of normalized email -> lead ID
+    - leads:email_counts:by_user:{user_id} -> Hash of normalized email -> lead count
+    - leads:email_index:{lead_lists|users} -> Set of list/user IDs whose email index above has been built
+    - imap_sync:{account_id} -> Hash of uidvalidity and last_uid for the account's INBOX
+    - suppression:by_user:{user_id} -> Set of normalized emails that must not be mailed
+    - suppression:{reason}:by_user:{user_id} -> Set of the emails suppressed for a SUPPRESSION_REASONS reason
+    - email_sequences:links:{sequence_id} -> List of tracked link URLs (index = position)
+    - email_sequences:link_ids:{sequence_id} -> Hash of URL -> index in the list
+    - users:version:{user_id} -> Counter bumped on profile/password changes (auth cache invalidation)
+    - versions:by_user:{user_id} -> Hash of entity -> counter bumped by every write to the user's records (ETags)
+    - events:stream:{shard} -> Stream of created email events (see app.event_log)
+    - stats:by_campaign:{campaign_id} -> Hash of event type -> count (campaign_stats projection)
+    - stats:applied:by_campaign:{campaign_id} -> Set of the event IDs counted in it
+    - counters:{entity}:{id} -> Hash of field -> amount added to the record's field (increment_counters)
+    - jobs:finished -> Sorted set of finished job IDs by finish time (purged after JOB_RETENTION_HOURS)
+    
+    Reads of the entities in ENTITY_CACHE_ENTITIES go through the process-local
+    entity cache unless fresh=True; writes to them publish an invalidation on
+    the entity_cache:invalidate channel. Read-modify-write paths read fresh.
+    
+    Records of ARCHIVED_ENTITIES older than the retention window are moved to
+    the archive by app.services.event_retention. Reads (unless fresh=True)
+    span both tiers; updates and deletes only see the engine, except for
+    cascades, which also remove archived dependents.
     """
     
-    def __init__(self, client: redis.Redis):
-        self.client = client
+    def __init__(
+        self,
+        engine: StorageEngine,
+        codec: Optional[JSONCodec] = None,
+        cache: Optional[EntityCache] = None,
+        archive: Optional[SQLiteArchive] = None
+    ):
+        self.engine = engine
+        self.codec = codec or get_codec()
+        self.cache = cache
+        self.archive = archive
+    
+    def _encode(self, entity: str, record: Dict[str, Any]):
+        return encode_record(entity, record, self.codec)
+    
+    def _decode(self, entity: str, data) -> Dict[str, Any]:
+        return decode_record(entity, data, self.codec)
     
     def _generate_id(self) -> str:
         """Generate a unique ID"""
@@ -47,8 +260,18 @@ class RedisDB:
     
     # Generic CRUD operations
     
-    def create(self, entity: str, data: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
-        """Create a new entity"""
+    def create(
+        self,
+        entity: str,
+        data: Dict[str, Any],
+        user_id: Optional[str] = None,
+        owners: Optional[Set[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a new entity, indexed by user and by its INDEXED_FIELDS, in one pipeline.
+        Callers that already know the owning users pass owners, which saves
+        resolving them through OWNER_REFERENCES (see _bump_versions).
+        """
         entity_id = self._generate_id()
         now = self._now()
         
@@ -62,53 +285,240 @@ class RedisDB:
         if user_id:
             record["user_id"] = user_id
         
-        # Store the entity
-        self.client.set(f"{entity}:{entity_id}", json.dumps(record))
+        batch = self.engine.batch()
+        
+        # Store the entity (and log it, for event projections)
+        data = self._encode(entity, record)
+        batch.set(f"{entity}:{entity_id}", data)
+        append_event(batch, entity, record, data)
         
         # Add to all entities set
-        self.client.sadd(f"{entity}:all", entity_id)
+        batch.add_members(f"{entity}:all", entity_id)
         
         # Index by user if applicable
         if user_id:
-            self.client.sadd(f"{entity}:by_user:{user_id}", entity_id)
+            batch.add_members(f"{entity}:by_user:{user_id}", entity_id)
+        for field in INDEXED_FIELDS.get(entity, ()):
+            if record.get(field):
+                batch.add_members(f"{entity}:by_{field}:{record[field]}", entity_id)
+        
+        if entity == "leads":
+            self._add_lead_email(batch, record)
         
+        self._bump_versions(batch, entity, [record], owners)
+        batch.execute()
         return record
     
-    def get(self, entity: str, entity_id: str) -> Optional[Dict[str, Any]]:
-        """Get a single entity by ID"""
-        data = self.client.get(f"{entity}:{entity_id}")
-        return json.loads(data) if data else None
+    def create_many(
+        self,
+        entity: str,
+        items: List[Dict[str, Any]],
+        user_id: Optional[str] = None,
+        index_fields: Optional[tuple] = None,
+        owners: Optional[Set[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Create many entities with a single pipeline round trip.
+        Each record is also indexed by every field in index_fields that has a value
+        (defaults to the entity's INDEXED_FIELDS). owners as for create.
+        """
+        if index_fields is None:
+            index_fields = INDEXED_FIELDS.get(entity, ())
+        now = self._now()
+        records = []
+        batch = self.engine.batch()
+        
+        for data in items:
+            entity_id = self._generate_id()
+            record = {
+                "id": entity_id,
+                "created_at": now,
+                "updated_at": now,
+                **data
+            }
+            if user_id:
+                record["user_id"] = user_id
+            
+            data = self._encode(entity, record)
+            batch.set(f"{entity}:{entity_id}", data)
+            append_event(batch, entity, record, data)
+            batch.add_members(f"{entity}:all", entity_id)
+            if user_id:
+                batch.add_members(f"{entity}:by_user:{user_id}", entity_id)
+            for field in index_fields:
+                if record.get(field):
+                    batch.add_members(f"{entity}:by_{field}:{record[field]}", entity_id)
+            if entity == "leads":
+                self._add_lead_email(batch, record)
+            
+            records.append(record)
+        
+        if records:
+            self._bump_versions(batch, entity, records, owners)
+            batch.execute()
+        return records
+    
+    def get(self, entity: str, entity_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """Get a single entity by ID (fresh=True bypasses the entity cache)"""
+        key = f"{entity}:{entity_id}"
+        if fresh or not self._cached(entity):
+            data = self.engine.get(key)
+        else:
+            data = self.cache.get(key)
+            if data is None:
+                generation = self.cache.generation
+                data = self.engine.get(key)
+                if data:
+                    self.cache.put(key, data, generation)
+        if not data and not fresh and self._archived(entity):
+            archived = self.archive.get_many(entity, [entity_id])
+            return archived[0] if archived else None
+        return self._decode(entity, data) if data else None
+    
+    def get_many(self, entity: str, entity_ids: List[str], fresh: bool = False) -> List[Dict[str, Any]]:
+        """Get several entities with one MGET of the uncached ones, skipping missing IDs"""
+        if not entity_ids:
+            return []
+        keys = [f"{entity}:{entity_id}" for entity_id in entity_ids]
+        if fresh or not self._cached(entity):
+            values = self.engine.get_many(keys)
+        else:
+            values = [self.cache.get(key) for key in keys]
+            missing = [i for i, value in enumerate(values) if value is None]
+            if missing:
+                generation = self.cache.generation
+                fetched = self.engine.get_many([keys[i] for i in missing])
+                for i, value in zip(missing, fetched):
+                    values[i] = value
+                    if value:
+                        self.cache.put(keys[i], value, generation)
+        records = [self._decode(entity, v) for v in values if v]
+        if not fresh and len(records) < len(entity_ids) and self._archived(entity):
+            found = {record["id"] for record in records}
+            records.extend(self.archive.get_many(entity, [i for i in entity_ids if i not in found]))
+        return records
+    
+    def _cached(self, entity: str) -> bool:
+        return self.cache is not None and self.cache.caches(entity)
+    
+    def _archived(self, entity: str) -> bool:
+        return self.archive is not None and self.archive.archives(entity)
+    
+    def _with_archived(self, entity: str, records: List[Dict[str, Any]], archived: Iterable[Dict[str, Any]]):
+        """Add archived records to records read from the engine, skipping IDs already there"""
+        found = {record["id"] for record in records}
+        records.extend(record for record in archived if record["id"] not in found)
+        return records
     
-    def get_all(self, entity: str, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Get all entities, optionally filtered by user"""
+    def _invalidate(self, conn, entity: str, entity_ids: List[str]):
+        """Evict changed records here and queue an invalidation for every other process"""
+        if not entity_ids or entity not in cached_entities():
+            return
+        keys = [f"{entity}:{entity_id}" for entity_id in entity_ids]
+        if self.cache is not None:
+            self.cache.invalidate(keys)
+        conn.publish(INVALIDATION_CHANNEL, " ".join(keys))
+    
+    def get_all(self, entity: str, user_id: Optional[str] = None, fresh: bool = False) -> List[Dict[str, Any]]:
+        """Get all entities, optionally filtered by user (fresh=True: engine only, bypassing the entity cache)"""
         if user_id:
-            ids = self.client.smembers(f"{entity}:by_user:{user_id}")
+            ids = self.engine.members(f"{entity}:by_user:{user_id}")
         else:
-            ids = self.client.smembers(f"{entity}:all")
+            ids = self.engine.members(f"{entity}:all")
         
         results = []
         for entity_id in ids:
-            data = self.get(entity, entity_id)
+            data = self.get(entity, entity_id, fresh=fresh)
             if data:
                 results.append(data)
         
+        # Archived records have no user index
+        if not user_id and not fresh and self._archived(entity):
+            for archived in self.archive.iter_batches(entity):
+                self._with_archived(entity, results, archived)
+        
         # Sort by created_at descending
         results.sort(key=lambda x: x.get("created_at", ""), reverse=True)
         return results
     
-    def get_by_field(self, entity: str, field: str, value: str) -> List[Dict[str, Any]]:
+    def get_by_field(self, entity: str, field: str, value: str, fresh: bool = False) -> List[Dict[str, Any]]:
         """Get entities by a specific field value"""
-        ids = self.client.smembers(f"{entity}:by_{field}:{value}")
+        ids = self.engine.members(f"{entity}:by_{field}:{value}")
         results = []
         for entity_id in ids:
-            data = self.get(entity, entity_id)
+            data = self.get(entity, entity_id, fresh=fresh)
             if data:
                 results.append(data)
+        if self._archived(entity) and field in INDEXED_FIELDS.get(entity, ()):
+            self._with_archived(entity, results, self.archive.find(entity, field, value))
+        return results
+    
+    def get_by_field_values(self, entity: str, field: str, values: List[str], fresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get entities whose field is one of values: one pipeline of index reads,
+        MGETs of the records, then archived ones filtered in SQL rather than
+        loading the whole archive
+        """
+        values = list(dict.fromkeys(v for v in values if v))
+        if not values:
+            return []
+        
+        batch = self.engine.batch()
+        for value in values:
+            batch.members(f"{entity}:by_{field}:{value}")
+        entity_ids = [entity_id for ids in batch.execute() for entity_id in ids]
+        
+        results = []
+        for start in range(0, len(entity_ids), BATCH_SIZE):
+            results.extend(self.get_many(entity, entity_ids[start:start + BATCH_SIZE], fresh=fresh))
+        if self._archived(entity) and field in INDEXED_FIELDS.get(entity, ()):
+            self._with_archived(entity, results, self.archive.find_many(entity, field, values))
         return results
     
-    def update(self, entity: str, entity_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update an entity"""
-        existing = self.get(entity, entity_id)
+    def iter_batches(
+        self,
+        entity: str,
+        user_id: Optional[str] = None,
+        field: Optional[str] = None,
+        value: Optional[str] = None,
+        fresh: bool = False
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield the records of one index (field=value, else the user's, else all)
+        in batches of up to BATCH_SIZE, one SSCAN page and one MGET each, so
+        memory stays bounded however large the index is. As with SSCAN, records
+        added or removed during the scan may or may not be included. Archived
+        records follow the engine's, minus any still present there, unless
+        fresh=True (engine only, bypassing the entity cache).
+        """
+        if field:
+            key = f"{entity}:by_{field}:{value}"
+        elif user_id:
+            key = f"{entity}:by_user:{user_id}"
+        else:
+            key = f"{entity}:all"
+        for ids in self._sscan_batches(key):
+            records = self.get_many(entity, ids, fresh=fresh or self._archived(entity))
+            if records:
+                yield records
+        if fresh or not self._archived(entity) or (user_id and not field):
+            return
+        for records in self.archive.iter_batches(entity, field, value):
+            # Records being archived are briefly in both tiers
+            hot = self.engine.are_members(f"{entity}:all", [record["id"] for record in records])
+            records = [record for record, flag in zip(records, hot) if not flag]
+            if records:
+                yield records
+    
+    def update(
+        self,
+        entity: str,
+        entity_id: str,
+        updates: Dict[str, Any],
+        owners: Optional[Set[str]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Update an entity (owners as for create)"""
+        existing = self.get(entity, entity_id, fresh=True)
         if not existing:
             return None
         
@@ -118,40 +528,638 @@ class RedisDB:
             "updated_at": self._now()
         }
         
-        self.client.set(f"{entity}:{entity_id}", json.dumps(updated))
+        batch = self.engine.batch()
+        batch.set(f"{entity}:{entity_id}", self._encode(entity, updated))
+        self._move_field_indexes(batch, entity, existing, updated)
+        self._invalidate(batch, entity, [entity_id])
+        self._bump_versions(batch, entity, [existing], owners)
+        
+        if entity == "leads":
+            self._move_lead_email(batch, existing, updated)
+        
+        batch.execute()
         return updated
     
+    def update_if(
+        self,
+        entity: str,
+        entity_id: str,
+        updates: Dict[str, Any],
+        field: str,
+        allowed: Iterable[Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Update an entity only while its field holds one of the allowed values,
+        checked and written in one WATCH/MULTI transaction. Returns the record
+        as stored afterwards (unchanged if the check failed), or None if missing.
+        """
+        key = f"{entity}:{entity_id}"
+        allowed = set(allowed)
+        
+        def guarded(tx):
+            data = tx.get(key)
+            if not data:
+                return None
+            existing = self._decode(entity, data)
+            if existing.get(field) not in allowed:
+                return existing
+            updated = {**existing, **updates, "updated_at": self._now()}
+            tx.multi()
+            tx.set(key, self._encode(entity, updated))
+            self._invalidate(tx, entity, [entity_id])
+            self._bump_versions(tx, entity, [existing])
+            if entity == "leads":
+                self._move_lead_email(tx, existing, updated)
+            return updated
+        
+        return self.engine.transaction(guarded, key)
+    
+    def update_many(self, entity: str, updates_by_id: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Apply per-entity updates with one MGET and one pipeline, skipping missing IDs"""
+        existing = self.get_many(entity, list(updates_by_id), fresh=True)
+        now = self._now()
+        batch = self.engine.batch()
+        
+        results = []
+        for record in existing:
+            updated = {**record, **updates_by_id[record["id"]], "updated_at": now}
+            batch.set(f"{entity}:{record['id']}", self._encode(entity, updated))
+            self._move_field_indexes(batch, entity, record, updated)
+            if entity == "leads":
+                self._move_lead_email(batch, record, updated)
+            results.append(updated)
+        
+        if results:
+            self._invalidate(batch, entity, [record["id"] for record in results])
+            self._bump_versions(batch, entity, existing)
+            batch.execute()
+        return results
+    
     def delete(self, entity: str, entity_id: str) -> bool:
         """Delete an entity"""
-        existing = self.get(entity, entity_id)
+        existing = self.get(entity, entity_id, fresh=True)
         if not existing:
             return False
         
-        # Remove from main storage
-        self.client.delete(f"{entity}:{entity_id}")
-        
-        # Remove from all entities set
-        self.client.srem(f"{entity}:all", entity_id)
-        
-        # Remove from user index
-        if "user_id" in existing:
-            self.client.srem(f"{entity}:by_user:{existing['user_id']}", entity_id)
+        batch = self.engine.batch()
+        self._delete_record(batch, entity, existing)
+        self._bump_versions(batch, entity, [existing])
+        batch.execute()
         
         return True
     
+    def _delete_record(self, conn, entity: str, record: Dict[str, Any]):
+        """Queue removal of a record and every index entry pointing at it"""
+        entity_id = record["id"]
+        conn.delete(f"{entity}:{entity_id}")
+        for key in AUXILIARY_KEYS.get(entity, ()):
+            conn.delete(key.format(id=entity_id))
+        conn.remove_members(f"{entity}:all", entity_id)
+        if record.get("user_id"):
+            conn.remove_members(f"{entity}:by_user:{record['user_id']}", entity_id)
+        for field in INDEXED_FIELDS.get(entity, ()):
+            if record.get(field):
+                conn.remove_members(f"{entity}:by_{field}:{record[field]}", entity_id)
+        if entity == "leads":
+            self._remove_lead_email(conn, record)
+        self._invalidate(conn, entity, [entity_id])
+    
+    def _owned_batches(self, entity: str, entity_ids: List[str], user_id: Optional[str]):
+        """Yield batches of existing records, keeping only those owned by user_id"""
+        entity_ids = list(dict.fromkeys(entity_ids))
+        for start in range(0, len(entity_ids), BATCH_SIZE):
+            records = self.get_many(entity, entity_ids[start:start + BATCH_SIZE], fresh=True)
+            if user_id:
+                records = [r for r in records if r.get("user_id") == user_id]
+            if records:
+                yield records
+    
+    def delete_many(self, entity: str, entity_ids: List[str], user_id: Optional[str] = None) -> int:
+        """
+        Delete several entities, including all their index entries.
+        Ownership is checked with one MGET per batch and all removals for the
+        batch go out in a single pipeline. Returns the number actually deleted.
+        """
+        deleted = 0
+        for records in self._owned_batches(entity, entity_ids, user_id):
+            batch = self.engine.batch()
+            for record in records:
+                self._delete_record(batch, entity, record)
+            self._bump_versions(batch, entity, records)
+            batch.execute()
+            deleted += len(records)
+        return deleted
+    
+    def set_fields_many(
+        self,
+        entity: str,
+        entity_ids: List[str],
+        updates: Dict[str, Any],
+        user_id: Optional[str] = None
+    ) -> int:
+        """
+        Apply the same field updates to several entities.
+        Batched like delete_many; returns the number actually updated.
+        """
+        updated = 0
+        now = self._now()
+        for records in self._owned_batches(entity, entity_ids, user_id):
+            batch = self.engine.batch()
+            for record in records:
+                batch.set(f"{entity}:{record['id']}", self._encode(entity, {**record, **updates, "updated_at": now}))
+            self._invalidate(batch, entity, [record["id"] for record in records])
+            self._bump_versions(batch, entity, records)
+            batch.execute()
+            updated += len(records)
+        return updated
+    
     def index_by_field(self, entity: str, entity_id: str, field: str, value: str):
         """Add entity to a field index"""
-        self.client.sadd(f"{entity}:by_{field}:{value}", entity_id)
+        self.engine.add_members(f"{entity}:by_{field}:{value}", entity_id)
     
     def remove_from_index(self, entity: str, entity_id: str, field: str, value: str):
         """Remove entity from a field index"""
-        self.client.srem(f"{entity}:by_{field}:{value}", entity_id)
+        self.engine.remove_members(f"{entity}:by_{field}:{value}", entity_id)
+    
+    # Collection versions
+    
+    def _owners(self, entity: str, records: Iterable[Dict[str, Any]]) -> Set[str]:
+        """User IDs owning records, directly or through OWNER_REFERENCES"""
+        owners = set()
+        parent_ids = set()
+        reference = OWNER_REFERENCES.get(entity)
+        for record in records:
+            if record.get("user_id"):
+                owners.add(record["user_id"])
+            elif reference and record.get(reference[1]):
+                parent_ids.add(record[reference[1]])
+        if parent_ids:
+            owners.update(
+                parent["user_id"] for parent in self.get_many(reference[0], list(parent_ids))
+                if parent.get("user_id")
+            )
+        return owners
+    
+    def _bump_versions(self, conn, entity: str, records: List[Dict[str, Any]], owners: Optional[Set[str]] = None):
+        """Queue a bump of the entity's collection version for every user owning one of records"""
+        if owners is None:
+            owners = self._owners(entity, records)
+        for user_id in owners:
+            conn.hash_incr(f"versions:by_user:{user_id}", entity)
+    
+    def get_collection_versions(self, user_id: str, entities: List[str]) -> List[int]:
+        """Change counters of a user's collections, with one HMGET"""
+        values = self.engine.hash_get_many(f"versions:by_user:{user_id}", list(entities))
+        return [int(value or 0) for value in values]
+    
+    # Counters
+    
+    def increment_counters(self, entity: str, increments: Dict[str, Dict[str, int]], owners: Set[str]):
+        """
+        Add to integer fields of records ({id: {field: amount}}) with HINCRBY on
+        counters:{entity}:{id}, so concurrent writers never lose an increment.
+        One pipeline; owners are the users whose collection versions are bumped.
+        """
+        if not increments:
+            return
+        batch = self.engine.batch()
+        for entity_id, fields in increments.items():
+            for field, amount in fields.items():
+                batch.hash_incr(f"counters:{entity}:{entity_id}", field, amount)
+        self._bump_versions(batch, entity, [], owners)
+        batch.execute()
+    
+    def with_counters(self, entity: str, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Copies of records with their increment_counters totals added to the stored fields"""
+        batch = self.engine.batch()
+        for record in records:
+            batch.hash_get_all(f"counters:{entity}:{record['id']}")
+        results = []
+        for record, counters in zip(records, batch.execute() if records else []):
+            record = dict(record)
+            for field, amount in counters.items():
+                record[field] = (record.get(field) or 0) + int(amount)
+            results.append(record)
+        return results
+    
+    # Event projections
+    
+    def get_event_counts(self, campaign_id: str) -> Dict[str, int]:
+        """Events per type for a campaign, as counted by the campaign_stats projection"""
+        counts = self.engine.hash_get_all(f"stats:by_campaign:{campaign_id}")
+        return {event_type: int(count) for event_type, count in counts.items()}
+    
+    # Background jobs
+    
+    def create_job(self, data: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        """Create a job record, first purging jobs finished more than JOB_RETENTION_HOURS ago"""
+        self.purge_finished_jobs(get_settings().job_retention_hours * 3600)
+        return self.create("jobs", data, user_id=user_id)
+    
+    def finish_job(self, job_id: str, updates: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Record a job's final state; it is purged once past the retention period"""
+        job = self.update("jobs", job_id, updates)
+        if job:
+            self.engine.sorted_add("jobs:finished", {job_id: time.time()})
+        return job
+    
+    def purge_finished_jobs(self, max_age_seconds: float) -> int:
+        """Delete up to BATCH_SIZE jobs finished more than max_age_seconds ago"""
+        job_ids = self.engine.sorted_range_by_score(
+            "jobs:finished", max_score=time.time() - max_age_seconds, limit=BATCH_SIZE
+        )
+        if not job_ids:
+            return 0
+        deleted = self.delete_many("jobs", job_ids)
+        self.engine.sorted_remove("jobs:finished", *job_ids)
+        return deleted
+    
+    # Cascading deletes
+    
+    def count_dependents(self, entity: str, entity_id: str) -> int:
+        """Count the direct dependents a cascade_delete of this record would touch"""
+        batch = self.engine.batch()
+        for child, field, _ in CASCADES.get(entity, []):
+            batch.count_members(f"{child}:by_{field}:{entity_id}")
+        return sum(batch.execute())
+    
+    def cascade_delete(
+        self,
+        entity: str,
+        entity_id: str,
+        on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+        owners: Optional[Set[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Delete a record and everything that depends on it (see CASCADES).
+        Dependents are enumerated through their field indexes with SSCAN and
+        removed in batched pipelines using non-blocking UNLINK, so the cost
+        per round trip stays flat no matter how large the graph is.
+        Pass owners (the root's owning user IDs) when the root may already be
+        gone, so the dependents' collection versions are still bumped.
+        Returns the number of records deleted or detached per entity.
+        """
+        counts: Dict[str, int] = {}
+        
+        # Dependents are owned by the root's owner; their parents are gone by the time they are removed
+        existing = self.get(entity, entity_id, fresh=True)
+        if existing:
+            if owners is None:
+                owners = self._owners(entity, [existing])
+            batch = self.engine.batch()
+            self._delete_record(batch, entity, existing)
+            self._bump_versions(batch, entity, [existing], owners)
+            batch.execute()
+            counts[entity] = 1
+        
+        self._cascade_children(entity, entity_id, counts, on_progress, owners)
+        return counts
+    
+    def _cascade_children(self, entity, entity_id, counts, on_progress, owners=None):
+        for child, field, action in CASCADES.get(entity, []):
+            index_key = f"{child}:by_{field}:{entity_id}"
+            
+            for ids in self._sscan_batches(index_key):
+                records = self.get_many(child, ids, fresh=True)
+                batch = self.engine.batch()
+                for record in records:
+                    if action == "delete":
+                        self._delete_record(batch, child, record)
+                    else:
+                        batch.set(f"{child}:{record['id']}", self._encode(child, {
+                            **record, field: None, "updated_at": self._now()
+                        }))
+                if action != "delete":
+                    self._invalidate(batch, child, [record["id"] for record in records])
+                self._bump_versions(batch, child, records, owners)
+                batch.execute()
+                
+                if action == "delete":
+                    for record in records:
+                        self._cascade_children(child, record["id"], counts, on_progress, owners)
+                
+                counts[child] = counts.get(child, 0) + len(records)
+                if on_progress:
+                    on_progress(counts)
+            
+            self.engine.delete(index_key)
+            
+            if action == "delete" and self._archived(child):
+                archived = self.archive.delete_where(child, field, entity_id)
+                if archived:
+                    batch = self.engine.batch()
+                    self._bump_versions(batch, child, [], owners or set())
+                    batch.execute()
+                    counts[child] = counts.get(child, 0) + archived
+    
+    def _sscan_batches(self, key: str):
+        """Yield a set's members in batches of up to BATCH_SIZE using SSCAN"""
+        batch: List[str] = []
+        for member in self.engine.scan_members(key, count=BATCH_SIZE):
+            batch.append(member)
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    
+    # Retention
+    
+    def archive_records(self, entity: str, records: List[Dict[str, Any]]):
+        """
+        Move records to the archive: written there first, then removed from
+        the engine along with their index entries. Reads return the same
+        records afterwards, so collection versions are not bumped.
+        """
+        self.archive.put_many(entity, records)
+        batch = self.engine.batch()
+        for record in records:
+            self._delete_record(batch, entity, record)
+        batch.execute()
+    
+    # Lead email uniqueness index
+    
+    def _add_lead_email(self, conn, lead: Dict[str, Any]):
+        """Record a lead's normalized email in the per-list and per-user indexes"""
+        email = normalize_email(lead.get("email"))
+        if not email:
+            return
+        if lead.get("lead_list_id"):
+            conn.hash_set(f"leads:email_ids:by_lead_list_id:{lead['lead_list_id']}", {email: lead["id"]})
+        if lead.get("user_id"):
+            conn.hash_incr(f"leads:email_counts:by_user:{lead['user_id']}", email)
+    
+    def _remove_lead_email(self, conn, lead: Dict[str, Any]):
+        """Drop a lead's normalized email from the per-list and per-user indexes"""
+        email = normalize_email(lead.get("email"))
+        if not email:
+            return
+        if lead.get("lead_list_id"):
+            conn.hash_delete(f"leads:email_ids:by_lead_list_id:{lead['lead_list_id']}", email)
+        if lead.get("user_id"):
+            conn.hash_decr_remove(f"leads:email_counts:by_user:{lead['user_id']}", email)
+    
+    def _move_field_indexes(self, conn, entity: str, old: Dict[str, Any], new: Dict[str, Any]):
+        """Move a record between {entity}:by_{field} indexes for changed INDEXED_FIELDS"""
+        for field in INDEXED_FIELDS.get(entity, ()):
+            if old.get(field) == new.get(field):
+                continue
+            if old.get(field):
+                conn.remove_members(f"{entity}:by_{field}:{old[field]}", old["id"])
+            if new.get(field):
+                conn.add_members(f"{entity}:by_{field}:{new[field]}", new["id"])
+    
+    def _move_lead_email(self, conn, old: Dict[str, Any], new: Dict[str, Any]):
+        """Re-index a lead whose email or lead list changed"""
+        if (normalize_email(old.get("email")) != normalize_email(new.get("email"))
+                or old.get("lead_list_id") != new.get("lead_list_id")):
+            self._remove_lead_email(conn, old)
+            self._add_lead_email(conn, new)
+    
+    def _build_lead_email_index(self, scope: str, owner_id: str):
+        """
+        Rebuild the email index of a lead list ({email: lead ID}) or a user
+        ({email: lead count}) from its leads and mark it built. Retried if a
+        lead is added, removed or re-indexed meanwhile.
+        """
+        if scope == "lead_lists":
+            members_key = f"leads:by_lead_list_id:{owner_id}"
+            index_key = f"leads:email_ids:by_lead_list_id:{owner_id}"
+        else:
+            members_key = f"leads:by_user:{owner_id}"
+            index_key = f"leads:email_counts:by_user:{owner_id}"
+        
+        def build(tx):
+            lead_ids = list(tx.members(members_key))
+            index: Dict[str, Any] = {}
+            for start in range(0, len(lead_ids), BATCH_SIZE):
+                for lead in self.get_many("leads", lead_ids[start:start + BATCH_SIZE], fresh=True):
+                    email = normalize_email(lead.get("email"))
+                    if not email:
+                        continue
+                    if scope == "lead_lists":
+                        index[email] = lead["id"]
+                    else:
+                        index[email] = index.get(email, 0) + 1
+            tx.multi()
+            tx.delete(index_key)
+            if index:
+                tx.hash_set(index_key, index)
+            tx.add_members(f"leads:email_index:{scope}", owner_id)
+        
+        self.engine.transaction(build, members_key, index_key)
+    
+    def find_lead_emails(
+        self,
+        emails: List[str],
+        lead_list_id: Optional[str] = None,
+        user_id: Optional[str] = None
+    ) -> Dict[str, Optional[str]]:
+        """
+        Look up which normalized emails already exist, in one round trip
+        once the indexes are built.
+        Returns {email: lead_id} for emails found in the lead list, and
+        {email: None} for emails only found elsewhere in the user's leads
+        (when user_id is given).
+        """
+        emails = list(dict.fromkeys(normalize_email(e) for e in emails if e))
+        if not emails:
+            return {}
+        
+        batch = self.engine.batch()
+        if lead_list_id:
+            batch.is_member("leads:email_index:lead_lists", lead_list_id)
+            batch.hash_get_many(f"leads:email_ids:by_lead_list_id:{lead_list_id}", emails)
+        if user_id:
+            batch.is_member("leads:email_index:users", user_id)
+            batch.hash_get_many(f"leads:email_counts:by_user:{user_id}", emails)
+        replies = batch.execute()
+        
+        # Indexes of lists and users with leads from before the index existed are built on first use
+        built = replies[0::2]
+        if not all(built):
+            if lead_list_id and not built[0]:
+                self._build_lead_email_index("lead_lists", lead_list_id)
+            if user_id and not built[-1]:
+                self._build_lead_email_index("users", user_id)
+            return self.find_lead_emails(emails, lead_list_id, user_id)
+        replies = replies[1::2]
+        
+        found: Dict[str, Optional[str]] = {}
+        if user_id:
+            for email, count in zip(emails, replies.pop()):
+                if count and int(count) > 0:
+                    found[email] = None
+        if lead_list_id:
+            for email, lead_id in zip(emails, replies.pop()):
+                if lead_id:
+                    found[email] = lead_id
+        return found
+    
+    # Sent message lookup
+    
+    def find_sent_events(self, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Map Message-IDs of our outgoing emails to their "sent" events,
+        using the email_events message_id index (two round trips per batch),
+        then the archive for Message-IDs not found.
+        """
+        message_ids = list(dict.fromkeys(m for m in message_ids if m))
+        if not message_ids:
+            return {}
+        
+        batch = self.engine.batch()
+        for message_id in message_ids:
+            batch.members(f"email_events:by_message_id:{message_id}")
+        event_ids = [event_id for ids in batch.execute() for event_id in ids]
+        
+        events = self.get_many("email_events", event_ids, fresh=True)
+        if self._archived("email_events"):
+            found = {event.get("message_id") for event in events}
+            missing = [message_id for message_id in message_ids if message_id not in found]
+            if missing:
+                events.extend(self.archive.find_many("email_events", "message_id", missing))
+        
+        return {
+            event["message_id"]: event
+            for event in events
+            if event.get("event_type") == "sent"
+        }
+    
+    # Click tracking link tables
+    
+    def get_link_indexes(self, sequence_id: str, urls: List[str]) -> List[int]:
+        """
+        Return the link table index of each URL for a sequence, appending new ones.
+        Indexes never change, so tokens in already-sent emails keep resolving.
+        """
+        if not urls:
+            return []
+        return self.engine.append_unique(
+            f"email_sequences:links:{sequence_id}", f"email_sequences:link_ids:{sequence_id}", urls
+        )
+    
+    def get_link(self, sequence_id: str, index: int) -> Optional[str]:
+        """Look up a tracked link URL by its index"""
+        return self.engine.list_get(f"email_sequences:links:{sequence_id}", index)
+    
+    # Suppression
+    
+    def suppress_emails(self, user_id: str, emails: List[str], reason: str):
+        """Add addresses to a user's suppression set for a reason (see SUPPRESSION_REASONS)"""
+        if reason not in SUPPRESSION_REASONS:
+            raise ValueError(f"Unknown suppression reason: {reason}")
+        emails = [normalize_email(e) for e in emails if e]
+        if emails:
+            batch = self.engine.batch()
+            batch.add_members(f"suppression:{reason}:by_user:{user_id}", *emails)
+            batch.add_members(f"suppression:by_user:{user_id}", *emails)
+            batch.execute()
+    
+    def find_suppressed(self, user_id: str, emails: List[str]) -> set:
+        """Return the normalized addresses among emails that are suppressed for the user"""
+        emails = list(dict.fromkeys(normalize_email(e) for e in emails if e))
+        if not emails:
+            return set()
+        flags = self.engine.are_members(f"suppression:by_user:{user_id}", emails)
+        return {email for email, flag in zip(emails, flags) if flag}
+    
+    def unsubscribe_lead(self, lead_id: str, reason: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Mark a lead unsubscribed, suppress its address and add it to the owner's
+        unsubscribe list in one MULTI/EXEC (WATCH on the lead and the unsubscribed
+        set). Repeated calls for an unsubscribed address do not add further list
+        entries; an address suppressed for another reason (a bounce) still gets one.
+        Returns the updated lead, or None if it does not exist.
+        """
+        lead_key = f"leads:{lead_id}"
+        
+        def unsubscribe(tx):
+            data = tx.get(lead_key)
+            if not data:
+                return None
+            lead = self._decode("leads", data)
+            user_id = lead.get("user_id")
+            email = normalize_email(lead.get("email"))
+            unsubscribed_key = f"suppression:unsubscribed:by_user:{user_id}"
+            tx.watch(unsubscribed_key)
+            already_unsubscribed = bool(email) and tx.is_member(unsubscribed_key, email)
+            
+            now = self._now()
+            tx.multi()
+            if lead.get("status") != "unsubscribed":
+                lead.update({"status": "unsubscribed", "unsubscribed_at": now, "updated_at": now})
+                tx.set(lead_key, self._encode("leads", lead))
+                self._invalidate(tx, "leads", [lead_id])
+                if user_id:
+                    tx.hash_incr(f"versions:by_user:{user_id}", "leads")
+            if email and not already_unsubscribed:
+                entry_id = self._generate_id()
+                tx.set(f"unsubscribe_list:{entry_id}", self._encode("unsubscribe_list", {
+                    "id": entry_id,
+                    "created_at": now,
+                    "updated_at": now,
+                    "email": email,
+                    "reason": reason,
+                    "user_id": user_id
+                }))
+                tx.add_members("unsubscribe_list:all", entry_id)
+                tx.add_members(f"unsubscribe_list:by_user:{user_id}", entry_id)
+                tx.add_members(unsubscribed_key, email)
+                tx.add_members(f"suppression:by_user:{user_id}", email)
+                tx.hash_incr(f"versions:by_user:{user_id}", "unsubscribe_list")
+            return lead
+        
+        return self.engine.transaction(unsubscribe, lead_key)
+    
+    def unsuppress_emails(self, user_id: str, emails: List[str], reason: str):
+        """
+        Lift one suppression reason for addresses. They stay suppressed while
+        another reason still applies (an unsubscribed address that also hard
+        bounced is not mailed again).
+        """
+        emails = list(dict.fromkeys(normalize_email(e) for e in emails if e))
+        if not emails:
+            return
+        reason_key = f"suppression:{reason}:by_user:{user_id}"
+        other_keys = [
+            f"suppression:{other}:by_user:{user_id}" for other in SUPPRESSION_REASONS if other != reason
+        ]
+        
+        def unsuppress(tx):
+            kept = {
+                email
+                for key in other_keys
+                for email, flag in zip(emails, tx.are_members(key, emails)) if flag
+            }
+            tx.multi()
+            tx.remove_members(reason_key, *emails)
+            lifted = [email for email in emails if email not in kept]
+            if lifted:
+                tx.remove_members(f"suppression:by_user:{user_id}", *lifted)
+        
+        self.engine.transaction(unsuppress, reason_key, *other_keys)
+    
+    # IMAP sync state
+    
+    def get_imap_sync_state(self, account_id: str) -> Optional[Dict[str, int]]:
+        """Get the UIDVALIDITY and last seen UID recorded for an account's INBOX"""
+        state = self.engine.hash_get_all(f"imap_sync:{account_id}")
+        if not state:
+            return None
+        return {key: int(value) for key, value in state.items()}
+    
+    def set_imap_sync_state(self, account_id: str, state: Dict[str, Optional[int]]):
+        """Record how far an account's INBOX has been synced"""
+        self.engine.hash_set(f"imap_sync:{account_id}", {
+            key: value for key, value in state.items() if value is not None
+        })
     
     # User-specific operations
     
     def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
-        """Get user by email"""
-        users = self.get_by_field("users", "email", email)
+        """Get user by email, fresh: login checks (and may re-hash) the stored password"""
+        users = self.get_by_field("users", "email", email, fresh=True)
         return users[0] if users else None
     
     def create_user(self, email: str, password_hash: str, full_name: Optional[str] = None) -> Dict[str, Any]:
@@ -164,14 +1172,26 @@ class RedisDB:
             "timezone": "America/New_York"
         })
         
-        # Index by email
-        self.index_by_field("users", user["id"], "email", email)
-        
+        # Indexed by email
         return user
+    
+    def get_user_version(self, user_id: str) -> int:
+        """Get the change counter of a user record"""
+        return int(self.engine.get(f"users:version:{user_id}") or 0)
+    
+    def bump_user_version(self, user_id: str) -> int:
+        """Mark a user record changed, invalidating cached copies in every process"""
+        return self.engine.incr(f"users:version:{user_id}")
 
 
-def get_redis_db(client: redis.Redis = None) -> RedisDB:
-    """Get RedisDB helper instance"""
-    if client is None:
-        client = get_redis_client()
-    return RedisDB(client)
+def get_redis_db(engine: Optional[StorageEngine] = None) -> RedisDB:
+    """
+    Get RedisDB helper instance with the engine's entity cache and the event
+    archive. A plain redis client is wrapped in a RedisEngine and gets no
+    cache (writes still publish invalidations).
+    """
+    if engine is None:
+        engine = get_storage_engine()
+    elif isinstance(engine, redis.Redis):
+        return RedisDB(RedisEngine(engine), archive=get_event_archive())
+    return RedisDB(engine, cache=get_entity_cache(engine), archive=get_event_archive())
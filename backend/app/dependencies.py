@@ -4,44 +4,48 @@ Auth dependencies for FastAPI routes
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-import redis
 from .config import get_settings
 from .database import get_db, get_redis_db
+from .storage import StorageEngine
+from .services.auth_cache import auth_cache
 
 security = HTTPBearer()
 
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ) -> dict:
     """
-    Validate JWT token and return current user
+    Validate JWT token and return current user.
+    Verified tokens and user profiles are cached in-process (see auth_cache).
     """
-    settings = get_settings()
     token = credentials.credentials
+    user_id = auth_cache.token_user(token)
     
-    try:
-        payload = jwt.decode(
-            token, 
-            settings.jwt_secret_key, 
-            algorithms=[settings.jwt_algorithm]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    if user_id is None:
+        settings = get_settings()
+        try:
+            payload = jwt.decode(
+                token, 
+                settings.jwt_secret_key, 
+                algorithms=[settings.jwt_algorithm]
+            )
+            user_id: str = payload.get("sub")
+            if user_id is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Invalid authentication token"
+                )
+        except JWTError:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication token"
+                detail="Could not validate credentials"
             )
-    except JWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials"
-        )
+        auth_cache.remember_token(token, user_id, payload.get("exp"))
     
-    # Get user from Redis
-    redis_db = get_redis_db(db)
-    user = redis_db.get("users", user_id)
+    # Get user (without password hash) from the cache or Redis
+    user = auth_cache.get_user(get_redis_db(db), user_id)
     
     if not user:
         raise HTTPException(
@@ -49,7 +53,4 @@ async def get_current_user(
             detail="User not found"
         )
     
-    # Remove password hash from response
-    user.pop("password_hash", None)
-    
     return user
@@ -0,0 +1,114 @@
+"""
+Process-local read-through cache for hot entities.
+
+RedisDB serves get/get_many for the entity types in ENTITY_CACHE_ENTITIES
+(campaigns, sending accounts, sequences and users by default) from a bounded
+LRU of encoded records, so repeated lookups of the same campaign or account
+within and across requests skip the network. Values are stored encoded and
+decoded on every hit, so callers can modify what they get back.
+
+Every RedisDB write to a cached entity publishes the changed keys on
+INVALIDATION_CHANNEL in the same pipeline as the write; every process
+subscribes and evicts them. Stale reads are bounded by that message's
+latency, and by ENTITY_CACHE_TTL_SECONDS should a message be lost. After a
+dropped subscription reconnects the whole cache is cleared.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Tuple, Union
+from .config import get_settings
+from .metrics import ENTITY_CACHE_LOOKUPS
+
+INVALIDATION_CHANNEL = "entity_cache:invalidate"
+
+Value = Union[str, bytes]
+
+
+class EntityCache:
+    """Bounded LRU of record key -> encoded record, each kept for at most ttl seconds"""
+
+    def __init__(self, entities: Iterable[str], max_size: int, ttl: float):
+        self.entities = frozenset(entities)
+        self.max_size = max_size
+        self.ttl = ttl
+        # record key -> (encoded record, monotonic expiry)
+        self._items: "OrderedDict[str, Tuple[Value, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; a read that started before one is not cached
+        self.generation = 0
+
+    def caches(self, entity: str) -> bool:
+        return entity in self.entities
+
+    def get(self, key: str) -> Optional[Value]:
+        """Cached value of a record key, or None"""
+        entity = key.split(":", 1)[0]
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._items.move_to_end(key)
+                ENTITY_CACHE_LOOKUPS.inc(entity, "hit")
+                return entry[0]
+            if entry is not None:
+                del self._items[key]
+        ENTITY_CACHE_LOOKUPS.inc(entity, "miss")
+        return None
+
+    def put(self, key: str, value: Value, generation: int):
+        """Cache a value read when self.generation was generation"""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str]):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._items.clear()
+
+    def on_message(self, message: Value):
+        """Handle an invalidation message: space-separated record keys"""
+        if isinstance(message, bytes):
+            message = message.decode("utf-8")
+        self.invalidate(message.split())
+
+
+_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_caches_lock = threading.Lock()
+
+
+@lru_cache()
+def cached_entities() -> FrozenSet[str]:
+    """Entity types whose writes publish invalidations (ENTITY_CACHE_ENTITIES)"""
+    return frozenset(e.strip() for e in get_settings().entity_cache_entities.split(",") if e.strip())
+
+
+def get_entity_cache(engine) -> Optional[EntityCache]:
+    """
+    The entity cache for a storage engine, subscribed to invalidations on
+    first use; None when ENTITY_CACHE_ENTITIES is empty.
+    """
+    entities = cached_entities()
+    if not entities:
+        return None
+    with _caches_lock:
+        cache = _caches.get(engine)
+        if cache is None:
+            settings = get_settings()
+            cache = _caches[engine] = EntityCache(
+                entities, settings.entity_cache_size, settings.entity_cache_ttl_seconds
+            )
+            engine.subscribe(INVALIDATION_CHANNEL, cache.on_message, on_connect=cache.clear)
+    return cache
@@ -0,0 +1,147 @@
+"""
+Event log: email events appended to sharded Redis streams.
+
+Every email event RedisDB creates is also appended to events:stream:{shard}
+in the same pipeline as the record itself. There are EVENT_STREAM_SHARDS
+streams, and a campaign's events all go to the same one, so they stay in
+order. Each stream is trimmed to about EVENT_STREAM_MAX_LENGTH entries.
+
+Derived views (stats, funnels, webhooks, ...) are Projections. Each one
+reads the log in its own consumer group, in batches, off the request path
+(python -m app.services.event_projections). A batch's view writes and its
+acknowledgement are committed in one transaction.
+
+Delivery is at least once: entries delivered to a consumer that dies
+before acknowledging them are redelivered when a consumer of the same name
+starts again, so projections must apply each event at most once. A
+projection can be replayed: its view is reset and rebuilt from the stored
+records (hot and archived), since the log itself is trimmed.
+"""
+import logging
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Optional
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Entities whose created records are appended to the log
+LOGGED_ENTITIES = ("email_events",)
+
+STREAM_KEY = "events:stream:{shard}"
+
+
+def stream_keys() -> List[str]:
+    """Keys of every shard of the log"""
+    return [STREAM_KEY.format(shard=shard) for shard in range(get_settings().event_stream_shards)]
+
+
+def shard_of(record: Dict[str, Any]) -> int:
+    """Shard of a record: by campaign, so a campaign's events stay ordered"""
+    partition = record.get("campaign_id") or record.get("lead_id") or record["id"]
+    return zlib.crc32(partition.encode("utf-8")) % get_settings().event_stream_shards
+
+
+def append_event(conn, entity: str, record: Dict[str, Any], data):
+    """Queue a created record (data: its stored encoding) onto its shard's stream"""
+    settings = get_settings()
+    if entity not in LOGGED_ENTITIES or not settings.event_stream_shards:
+        return
+    conn.stream_add(
+        STREAM_KEY.format(shard=shard_of(record)),
+        {"entity": entity, "type": record.get("event_type") or "", "data": data},
+        max_length=settings.event_stream_max_length
+    )
+
+
+class Projection:
+    """A view derived from the event log, built by its own consumer group"""
+
+    # Consumer group name; one group per projection
+    name: str = ""
+
+    def apply(self, redis_db, tx, events: List[Dict[str, Any]]):
+        """
+        Apply a batch of events in a transaction: read (and watch) what the
+        batch needs with tx, then call tx.multi() and queue the view changes.
+        The acknowledgement is queued after them. Events already applied
+        (redelivered entries) must be skipped.
+        """
+        raise NotImplementedError
+
+    def reset(self, redis_db):
+        """Remove everything the projection has built, before a replay"""
+        raise NotImplementedError
+
+    def rebuild(self, redis_db):
+        """Build the view from the stored records, after a reset"""
+        raise NotImplementedError
+
+
+class EventLogConsumer:
+    """Runs one projection as a named consumer of its group on every shard"""
+
+    def __init__(
+        self,
+        redis_db,
+        projection: Projection,
+        consumer: str,
+        decode: Callable[[str, Any], Dict[str, Any]],
+        batch_size: Optional[int] = None,
+        block_ms: int = 5000
+    ):
+        self.redis_db = redis_db
+        self.engine = redis_db.engine
+        self.projection = projection
+        self.consumer = consumer
+        self.decode = decode
+        self.batch_size = batch_size or get_settings().event_consumer_batch_size
+        self.block_ms = block_ms
+        self.keys = stream_keys()
+
+    def setup(self):
+        """Create the projection's group on every shard, reading from the start of the log"""
+        for key in self.keys:
+            self.engine.stream_create_group(key, self.projection.name, "0")
+
+    def replay(self):
+        """Rebuild the view from the stored records; the group keeps its position in the log"""
+        self.projection.reset(self.redis_db)
+        self.projection.rebuild(self.redis_db)
+
+    def poll(self, pending: bool = False, block_ms: Optional[int] = None) -> int:
+        """Apply and acknowledge one batch per shard; returns the number of entries handled"""
+        replies = self.engine.stream_read_group(
+            self.projection.name, self.consumer, self.keys,
+            count=self.batch_size, block_ms=block_ms, pending=pending
+        )
+        handled = 0
+        for key, entries in replies:
+            events = [self.decode(fields["entity"], fields["data"]) for _, fields in entries]
+            entry_ids = [entry_id for entry_id, _ in entries]
+
+            def apply(tx):
+                self.projection.apply(self.redis_db, tx, events)
+                tx.stream_ack(key, self.projection.name, *entry_ids)
+
+            self.engine.transaction(apply)
+            handled += len(entries)
+        return handled
+
+    def run(self, stopped: threading.Event):
+        """Follow the log until stopped, first retrying entries left unacknowledged by a previous run"""
+        self.setup()
+        pending = True
+        while not stopped.is_set():
+            try:
+                handled = self.poll(pending=pending, block_ms=None if pending else self.block_ms)
+            except Exception:
+                logger.exception(f"Projection {self.projection.name} failed; retrying")
+                # The failed batch stays pending for this consumer
+                pending = True
+                stopped.wait(1.0)
+                continue
+            if pending and not handled:
+                pending = False
+            elif handled:
+                logger.debug(f"Projection {self.projection.name} applied {handled} events")
@@ -0,0 +1,164 @@
+"""
+Per-request Redis instrumentation.
+
+InstrumentedRedis counts the commands, round trips, pipelines, payload bytes
+and time spent in Redis while a request is being handled, in a RedisStats
+object held in a context variable. RedisTimingMiddleware creates that object
+per request, reports it in a Server-Timing header and logs requests that are
+slow or make too many round trips, with the most frequent command patterns
+(e.g. "GET leads:{id} x500") to point at N+1 loops.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Optional
+import redis
+from redis.client import Pipeline
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_ID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# Commands whose second argument is not a key
+_KEYLESS_COMMANDS = {"EVALSHA", "EVAL", "SCRIPT", "PING", "INFO", "MULTI", "EXEC", "WATCH", "UNWATCH"}
+
+
+def _size(value: Any) -> int:
+    """Approximate payload size of a command argument or reply"""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_size(k) + _size(v) for k, v in value.items())
+    return 8
+
+
+def command_pattern(args: tuple) -> str:
+    """'GET leads:1b4e...' -> 'GET leads:{id}'"""
+    name = str(args[0]).upper()
+    if len(args) > 1 and name not in _KEYLESS_COMMANDS and isinstance(args[1], str):
+        return f"{name} {_ID_RE.sub('{id}', args[1])}"
+    return name
+
+
+class RedisStats:
+    """Redis usage of one request"""
+
+    __slots__ = ("commands", "round_trips", "pipelines", "bytes", "seconds", "patterns")
+
+    def __init__(self):
+        self.commands = 0
+        self.round_trips = 0
+        self.pipelines = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.patterns: Counter = Counter()
+
+    def record(self, commands: list, elapsed: float, response: Any, pipeline: bool = False):
+        self.commands += len(commands)
+        self.round_trips += 1
+        self.pipelines += pipeline
+        self.seconds += elapsed
+        self.bytes += _size(response)
+        for args in commands:
+            self.bytes += _size(args)
+            self.patterns[command_pattern(args)] += 1
+
+
+current_redis_stats: ContextVar[Optional[RedisStats]] = ContextVar("current_redis_stats", default=None)
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline that records each execute() as one round trip"""
+
+    def immediate_execute_command(self, *args, **options):
+        # Commands issued while WATCHing run immediately
+        stats = current_redis_stats.get()
+        if stats is None:
+            return super().immediate_execute_command(*args, **options)
+        started_at = time.perf_counter()
+        response = super().immediate_execute_command(*args, **options)
+        stats.record([args], time.perf_counter() - started_at, response)
+        return response
+
+    def execute(self, raise_on_error: bool = True):
+        stats = current_redis_stats.get()
+        if stats is None or not self.command_stack:
+            return super().execute(raise_on_error)
+        commands = [args for args, _ in self.command_stack]
+        started_at = time.perf_counter()
+        response = super().execute(raise_on_error)
+        stats.record(commands, time.perf_counter() - started_at, response, pipeline=True)
+        return response
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that reports its commands to the current request's RedisStats"""
+
+    def execute_command(self, *args, **options):
+        stats = current_redis_stats.get()
+        if stats is None:
+            return super().execute_command(*args, **options)
+        started_at = time.perf_counter()
+        response = super().execute_command(*args, **options)
+        stats.record([args], time.perf_counter() - started_at, response)
+        return response
+
+    def pipeline(self, transaction=True, shard_hint=None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class RedisTimingMiddleware:
+    """
+    ASGI middleware adding Server-Timing (total and Redis time, command and
+    round trip counts) to every HTTP response, with a log line per request at
+    DEBUG and a WARNING with the top command patterns for slow requests.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        settings = get_settings()
+        self.slow_ms = settings.slow_request_threshold_ms
+        self.slow_round_trips = settings.slow_request_redis_round_trips
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RedisStats()
+        token = current_redis_stats.set(stats)
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - started_at) * 1000
+                server_timing = (
+                    f'app;dur={total_ms:.2f}, '
+                    f'redis;dur={stats.seconds * 1000:.2f};'
+                    f'desc="{stats.commands} cmds/{stats.round_trips} trips"'
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_redis_stats.reset(token)
+            self._log(scope, stats, (time.perf_counter() - started_at) * 1000)
+
+    def _log(self, scope, stats: RedisStats, total_ms: float):
+        summary = (
+            f"{scope.get('method')} {scope.get('path')} {total_ms:.1f}ms; redis "
+            f"{stats.commands} cmds, {stats.round_trips} round trips, {stats.pipelines} pipelines, "
+            f"{stats.bytes} bytes, {stats.seconds * 1000:.1f}ms"
+        )
+        if total_ms >= self.slow_ms or stats.round_trips >= self.slow_round_trips:
+            top = ", ".join(f"{pattern} x{count}" for pattern, count in stats.patterns.most_common(5))
+            logger.warning(f"Slow request {summary}; top commands: {top}")
+        elif logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Request {summary}")
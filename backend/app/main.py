@@ -2,8 +2,10 @@
 Email Automation API
 FastAPI application entrypoint
 """
+import hmac
 import logging
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 # Configure logging
@@ -12,6 +14,9 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 from .config import get_settings
+from .instrumentation import RedisTimingMiddleware
+from .responses import FastJSONResponse
+from .metrics import MetricsMiddleware, render_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
 from .routers import (
     auth_router,
     campaigns_router,
@@ -25,14 +30,28 @@ from .routers import (
     team_router,
     subscription_router,
     unsubscribe_router,
-    emails_router
+    emails_router,
+    jobs_router
 )
+from .services.link_tracking import click_recorder
+from .services.passwords import get_password_hasher
 
 # Get settings
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background workers owned by the API process"""
+    click_recorder.start()
+    yield
+    await click_recorder.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     title="Email Automation API",
     description="Backend API for Email Automation platform",
     version="1.0.0",
@@ -55,8 +74,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "ETag"],
 )
 
+# Per-request Redis command counts and timings
+if settings.redis_instrumentation:
+    app.add_middleware(RedisTimingMiddleware)
+
+# Request latency histograms for /metrics
+app.add_middleware(MetricsMiddleware)
+
 # Register routers
 app.include_router(auth_router)
 app.include_router(campaigns_router)
@@ -71,6 +98,7 @@ app.include_router(team_router)
 app.include_router(subscription_router)
 app.include_router(unsubscribe_router)
 app.include_router(emails_router)
+app.include_router(jobs_router)
 
 
 @app.get("/")
@@ -86,4 +114,22 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "ok"}
+    return {
+        "status": "ok",
+        "password_hashing": get_password_hasher().stats()
+    }
+
+
+_LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics for this worker process (bearer METRICS_TOKEN, or loopback only)"""
+    if settings.metrics_token:
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.metrics_token.encode()):
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    elif not request.client or request.client.host not in _LOOPBACK_HOSTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
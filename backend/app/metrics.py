@@ -0,0 +1,221 @@
+"""
+Minimal Prometheus metrics registry.
+
+Counters, gauges and histograms keyed by label value tuples in plain dicts,
+rendered in the Prometheus text exposition format by /metrics. An
+observation is a dict lookup plus a bisect, a few microseconds, so it is
+cheap enough for every request and every tracking hit. Metrics are
+per process; scrape each worker.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        _REGISTRY.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self.samples())
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. EMAILS_SENT.inc(account_id)"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_label_text(self.labels, values)} {value}"
+            for values, value in list(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Current value, either set directly or read from a callback at scrape time"""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        callback: Optional[Callable[[], Dict[Tuple, float]]] = None
+    ):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *label_values):
+        self._values[label_values] = value
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        if self.callback:
+            try:
+                values.update(self.callback())
+            except Exception:
+                pass
+        return [f"{self.name}{_label_text(self.labels, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(_Metric):
+    """Bucketed distribution, e.g. with SMTP_SEND_SECONDS.time("smtp.example.com"): ..."""
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values):
+        entry = self._values.get(label_values)
+        if entry is None:
+            entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def time(self, *label_values) -> "_Timer":
+        return _Timer(self, label_values)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, values)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, values)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "label_values", "started_at")
+
+    def __init__(self, histogram: Histogram, label_values: Tuple):
+        self.histogram = histogram
+        self.label_values = label_values
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started_at, *self.label_values)
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text format"""
+    return "".join(metric.render() for metric in _REGISTRY)
+
+
+# API
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status")
+)
+
+# Send engine
+# Labelled by sending account ID, never by address or server: scrapes must not reveal customers' identities
+EMAILS_SENT = Counter("emails_sent_total", "Emails accepted by the SMTP server", ("account",))
+EMAILS_FAILED = Counter("emails_failed_total", "Emails rejected permanently", ("account",))
+EMAILS_DEFERRED = Counter(
+    "emails_deferred_total", "Emails that hit a temporary SMTP failure (4xx, connection, timeout)", ("account",)
+)
+SMTP_SEND_SECONDS = Histogram(
+    "smtp_send_duration_seconds", "Time to hand one message to the SMTP server", ("account",), SLOW_BUCKETS
+)
+
+# Reply checker
+IMAP_POLL_SECONDS = Histogram(
+    "imap_poll_duration_seconds", "Time to fetch new messages from one mailbox", ("account",), SLOW_BUCKETS
+)
+IMAP_POLL_ERRORS = Counter("imap_poll_errors_total", "Failed mailbox polls", ("account",))
+IMAP_MESSAGES_FETCHED = Counter("imap_messages_fetched_total", "Messages fetched from sending account inboxes")
+
+# Tracking
+TRACKING_EVENTS = Counter("tracking_events_total", "Tracking endpoint hits", ("type",))
+CLICKS_DROPPED = Counter("clicks_dropped_total", "Buffered clicks discarded after failed writes filled the buffer")
+
+# Entity cache
+ENTITY_CACHE_LOOKUPS = Counter(
+    "entity_cache_lookups_total", "Entity cache lookups by entity and result (hit, miss)", ("entity", "result")
+)
+
+# Event retention
+EVENTS_ARCHIVED = Counter("events_archived_total", "Records moved from Redis to the event archive", ("entity",))
+
+
+class MetricsMiddleware:
+    """ASGI middleware observing HTTP_REQUEST_SECONDS per matched route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot inflate cardinality
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status[0]
+            )
@@ -53,10 +53,12 @@ class SendingAccountCreate(BaseModel):
     smtp_port: Optional[int] = 587
     smtp_username: Optional[str] = None
     smtp_password_encrypted: Optional[str] = None
+    smtp_use_tls: Optional[bool] = True
     imap_host: Optional[str] = None
     imap_port: Optional[int] = 993
     imap_username: Optional[str] = None
     imap_password_encrypted: Optional[str] = None
+    imap_use_ssl: Optional[bool] = True
     daily_send_limit: Optional[int] = 50
     status: Optional[AccountStatus] = AccountStatus.active
 
@@ -68,8 +70,10 @@ class SendingAccountUpdate(BaseModel):
     smtp_port: Optional[int] = None
     smtp_username: Optional[str] = None
     smtp_password_encrypted: Optional[str] = None
+    smtp_use_tls: Optional[bool] = None
     imap_host: Optional[str] = None
     imap_port: Optional[int] = None
+    imap_use_ssl: Optional[bool] = None
     daily_send_limit: Optional[int] = None
     status: Optional[AccountStatus] = None
 
@@ -159,6 +163,7 @@ class EventType(str, Enum):
     opened = "opened"
     clicked = "clicked"
     replied = "replied"
+    auto_replied = "auto_replied"
     bounced = "bounced"
     unsubscribed = "unsubscribed"
 
@@ -175,11 +180,18 @@ class EmailEventResponse(BaseModel):
     subject: Optional[str]
     recipient_email: Optional[str]
     error_message: Optional[str]
+    reply_type: Optional[str] = None
     occurred_at: datetime
     lead: Optional[dict] = None
     campaign: Optional[dict] = None
 
 
+# Exports
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 # Inbox
 class InboxThread(BaseModel):
     lead_id: str
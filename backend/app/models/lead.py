@@ -34,6 +34,21 @@ class LeadBulkCreate(BaseModel):
     leads: List[dict]  # [{email, first_name, last_name, company, custom_fields}]
 
 
+class LeadImportFormat(str, Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class LeadImportMode(str, Enum):
+    skip = "skip"
+    upsert = "upsert"
+
+
+class LeadDedupeScope(str, Enum):
+    list = "list"
+    user = "user"
+
+
 class LeadUpdate(BaseModel):
     email: Optional[EmailStr] = None
     first_name: Optional[str] = None
@@ -46,6 +61,11 @@ class LeadBulkDelete(BaseModel):
     ids: List[str]
 
 
+class LeadBulkStatusUpdate(BaseModel):
+    ids: List[str]
+    status: LeadStatus
+
+
 class LeadResponse(BaseModel):
     id: str
     user_id: str
@@ -0,0 +1,95 @@
+"""
+JSON responses rendered with the record codec.
+
+FastJSONResponse is the app's default response class. Returned as-is from a
+route it also skips FastAPI's jsonable_encoder pass, which walks every value
+of every record in Python and dominates the cost of large listings. Use it
+that way for routes returning records straight from RedisDB (plain dicts,
+lists, strings and numbers).
+
+Listing routes polled by the dashboard also answer conditional GETs: the
+ETag is derived from per-user collection versions that RedisDB bumps on
+every write, so an unchanged listing costs one HMGET and a 304. Listings
+are built from fresh reads (past the entity cache): the ETag is read first,
+and a record cached here before another process's write, whose invalidation
+has not arrived yet, would otherwise be served under the new ETag until the
+next write.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from .codec import get_codec
+from .config import get_settings
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serialized by the configured record codec"""
+
+    def render(self, content: Any) -> bytes:
+        return get_codec().dumps_bytes(content)
+
+
+class ListingCache:
+    """LRU of rendered listing bodies keyed by ETag, bounded by total size in bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        body = self._items.get(etag)
+        if body is not None:
+            self._items.move_to_end(etag)
+        return body
+
+    def put(self, etag: str, body: bytes):
+        if len(body) > self.max_bytes or etag in self._items:
+            return
+        self._items[etag] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+listing_cache = ListingCache(get_settings().listing_cache_max_bytes)
+
+_LISTING_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+def listing_etag(request: Request, redis_db, user_id: str, collections: Tuple[str, ...]) -> str:
+    """
+    ETag of a listing built from the user's collections: changes whenever a
+    write bumps one of their versions (one HMGET). Read before building the
+    listing, so a write racing the build only causes a needless refetch.
+    """
+    versions = redis_db.get_collection_versions(user_id, collections)
+    digest = hashlib.blake2b(digest_size=12)
+    for part in (user_id, request.url.path, str(request.query_params), *collections, *map(str, versions)):
+        digest.update(part.encode("utf-8") + b"\0")
+    return f'"{digest.hexdigest()}"'
+
+
+def cached_listing(request: Request, etag: str) -> Optional[Response]:
+    """304 if the client already has this version, the cached body if this process rendered it, else None"""
+    headers = {**_LISTING_HEADERS, "ETag": etag}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    body = listing_cache.get(etag)
+    if body is not None:
+        return Response(body, media_type="application/json", headers=headers)
+    return None
+
+
+def listing_response(content: Any, etag: str) -> Response:
+    """Render a listing with its ETag and keep the body for the next poll"""
+    body = get_codec().dumps_bytes(content)
+    if listing_cache.max_bytes:
+        listing_cache.put(etag, body)
+    return Response(body, media_type="application/json", headers={**_LISTING_HEADERS, "ETag": etag})
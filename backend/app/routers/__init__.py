@@ -12,6 +12,7 @@ from .email_events import router as email_events_router
 from .domains import router as domains_router
 from .team_subscription import team_router, subscription_router, unsubscribe_router
 from .emails import router as emails_router
+from .jobs import router as jobs_router
 
 __all__ = [
     "auth_router",
@@ -26,5 +27,6 @@ __all__ = [
     "team_router",
     "subscription_router",
     "unsubscribe_router",
-    "emails_router"
+    "emails_router",
+    "jobs_router"
 ]
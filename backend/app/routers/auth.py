@@ -4,11 +4,12 @@ Authentication routes with Redis
 from fastapi import APIRouter, Depends, HTTPException, status
 from datetime import datetime, timedelta
 from jose import jwt
-from passlib.hash import bcrypt
-import redis
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
 from ..config import get_settings
+from ..services.auth_cache import auth_cache
+from ..services.passwords import get_password_hasher, PasswordHasherBusy
 from ..models.auth import (
     LoginRequest, RegisterRequest, TokenResponse,
     ProfileResponse, ProfileUpdate, PasswordUpdate
@@ -28,8 +29,17 @@ def create_access_token(user_id: str) -> str:
     return jwt.encode(payload, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
 
 
+def password_hasher_busy() -> HTTPException:
+    """503 for requests turned away because the bcrypt queue is full"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many password checks in progress, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
 @router.post("/login", response_model=TokenResponse)
-async def login(request: LoginRequest, db: redis.Redis = Depends(get_db)):
+async def login(request: LoginRequest, db: StorageEngine = Depends(get_db)):
     """Sign in with email and password"""
     redis_db = get_redis_db(db)
     
@@ -41,7 +51,16 @@ async def login(request: LoginRequest, db: redis.Redis = Depends(get_db)):
             detail="Invalid email or password"
         )
     
-    if not bcrypt.verify(request.password, user.get("password_hash", "")):
+    hasher = get_password_hasher()
+    try:
+        valid = await hasher.verify(request.password, user.get("password_hash", ""))
+        if valid and hasher.needs_update(user["password_hash"]):
+            # Re-hash with the configured cost while the plain password is at hand
+            redis_db.update("users", user["id"], {"password_hash": await hasher.hash(request.password)})
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -56,7 +75,7 @@ async def login(request: LoginRequest, db: redis.Redis = Depends(get_db)):
 
 
 @router.post("/register", response_model=TokenResponse)
-async def register(request: RegisterRequest, db: redis.Redis = Depends(get_db)):
+async def register(request: RegisterRequest, db: StorageEngine = Depends(get_db)):
     """Create a new user account"""
     redis_db = get_redis_db(db)
     
@@ -69,7 +88,10 @@ async def register(request: RegisterRequest, db: redis.Redis = Depends(get_db)):
         )
     
     # Hash password
-    password_hash = bcrypt.hash(request.password)
+    try:
+        password_hash = await get_password_hasher().hash(request.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
     
     # Create user
     user = redis_db.create_user(
@@ -103,13 +125,14 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 async def update_profile(
     updates: ProfileUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update current user profile"""
     redis_db = get_redis_db(db)
     
     update_data = updates.model_dump(exclude_unset=True)
     updated = redis_db.update("users", current_user["id"], update_data)
+    auth_cache.invalidate_user(redis_db, current_user["id"])
     
     if updated:
         updated.pop("password_hash", None)
@@ -121,12 +144,16 @@ async def update_profile(
 async def update_password(
     request: PasswordUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update password"""
     redis_db = get_redis_db(db)
     
-    password_hash = bcrypt.hash(request.password)
+    try:
+        password_hash = await get_password_hasher().hash(request.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
     redis_db.update("users", current_user["id"], {"password_hash": password_hash})
+    auth_cache.invalidate_user(redis_db, current_user["id"])
     
     return {"message": "Password updated successfully"}
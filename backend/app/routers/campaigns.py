@@ -1,32 +1,43 @@
 """
 Campaign routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
-import redis
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
 from typing import List
 from datetime import datetime
+from ..config import get_settings
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.campaign import (
     CampaignCreate, CampaignUpdate, CampaignStatusUpdate, CampaignResponse
 )
+from ..services.cascade_delete import create_cascade_job, run_cascade_job
 
 router = APIRouter(prefix="/api/campaigns", tags=["Campaigns"])
 
 
 @router.get("/")
 async def list_campaigns(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List all campaigns for current user"""
     redis_db = get_redis_db(db)
-    campaigns = redis_db.get_all("campaigns", user_id=current_user["id"])
+    etag = listing_etag(request, redis_db, current_user["id"], ("campaigns", "sending_accounts"))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
+    
+    campaigns = redis_db.with_counters("campaigns", redis_db.get_all("campaigns", user_id=current_user["id"], fresh=True))
     
     # Add sending account info
+    account_ids = {c["sending_account_id"] for c in campaigns if c.get("sending_account_id")}
+    accounts = {a["id"]: a for a in redis_db.get_many("sending_accounts", list(account_ids), fresh=True)}
     for campaign in campaigns:
         if campaign.get("sending_account_id"):
-            account = redis_db.get("sending_accounts", campaign["sending_account_id"])
+            account = accounts.get(campaign["sending_account_id"])
             if account:
                 campaign["sending_account"] = {
                     "id": account["id"],
@@ -35,14 +46,14 @@ async def list_campaigns(
                     "status": account.get("status")
                 }
     
-    return campaigns
+    return listing_response(campaigns, etag)
 
 
 @router.get("/{campaign_id}")
 async def get_campaign(
     campaign_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get campaign details with sequences"""
     redis_db = get_redis_db(db)
@@ -50,6 +61,7 @@ async def get_campaign(
     
     if not campaign or campaign.get("user_id") != current_user["id"]:
         raise HTTPException(status_code=404, detail="Campaign not found")
+    campaign = redis_db.with_counters("campaigns", [campaign])[0]
     
     # Get sending account
     if campaign.get("sending_account_id"):
@@ -73,6 +85,9 @@ async def get_campaign(
     
     campaign["sequences"] = sequences
     
+    # Maintained asynchronously from the event log; may trail recent events
+    campaign["event_counts"] = redis_db.get_event_counts(campaign_id)
+    
     return campaign
 
 
@@ -81,7 +96,7 @@ async def create_campaign(
     campaign: CampaignCreate,
     background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Create a new campaign with optional sequences"""
     redis_db = get_redis_db(db)
@@ -120,7 +135,6 @@ async def create_campaign(
                 "is_reply": seq.is_reply if seq.is_reply is not None else (idx > 0)
             }
             seq_record = redis_db.create("email_sequences", seq_data)
-            redis_db.index_by_field("email_sequences", seq_record["id"], "campaign_id", record["id"])
             
             # Create variants
             if seq.variants:
@@ -135,8 +149,7 @@ async def create_campaign(
                         "replied_count": 0,
                         "clicked_count": 0
                     }
-                    var_record = redis_db.create("email_sequence_variants", var_data)
-                    redis_db.index_by_field("email_sequence_variants", var_record["id"], "sequence_id", seq_record["id"])
+                    redis_db.create("email_sequence_variants", var_data)
     
     # If campaign is created with active status, start sending emails
     if status_value == "active":
@@ -158,7 +171,7 @@ async def update_campaign(
     campaign_id: str,
     updates: CampaignUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a campaign"""
     redis_db = get_redis_db(db)
@@ -171,34 +184,38 @@ async def update_campaign(
     if update_data.get("status"):
         update_data["status"] = update_data["status"].value
     
-    return redis_db.update("campaigns", campaign_id, update_data)
+    return redis_db.with_counters("campaigns", [redis_db.update("campaigns", campaign_id, update_data)])[0]
 
 
 @router.delete("/{campaign_id}")
 async def delete_campaign(
     campaign_id: str,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
-    """Delete a campaign"""
+    """
+    Delete a campaign with its sequences, variants and email events,
+    and detach its leads. Large campaigns are cleaned up in the background;
+    poll /api/jobs/{job_id} for progress.
+    """
     redis_db = get_redis_db(db)
     
     existing = redis_db.get("campaigns", campaign_id)
     if not existing or existing.get("user_id") != current_user["id"]:
         raise HTTPException(status_code=404, detail="Campaign not found")
     
-    # Delete related sequences
-    sequences = redis_db.get_by_field("email_sequences", "campaign_id", campaign_id)
-    for seq in sequences:
-        # Delete variants
-        variants = redis_db.get_by_field("email_sequence_variants", "sequence_id", seq["id"])
-        for var in variants:
-            redis_db.delete("email_sequence_variants", var["id"])
-        redis_db.delete("email_sequences", seq["id"])
+    job = create_cascade_job(redis_db, "campaigns", campaign_id, current_user["id"])
+    
+    if redis_db.count_dependents("campaigns", campaign_id) <= get_settings().cascade_inline_limit:
+        job = run_cascade_job(redis_db, job["id"], "campaigns", campaign_id, current_user["id"])
+        return {"message": "Campaign deleted", "job_id": job["id"], "status": job["status"]}
     
+    # Hide the campaign right away; dependents are removed by the job
     redis_db.delete("campaigns", campaign_id)
+    background_tasks.add_task(run_cascade_job, redis_db, job["id"], "campaigns", campaign_id, current_user["id"])
     
-    return {"message": "Campaign deleted"}
+    return {"message": "Campaign deletion started", "job_id": job["id"], "status": job["status"]}
 
 
 @router.patch("/{campaign_id}/status")
@@ -207,7 +224,7 @@ async def update_campaign_status(
     status_update: CampaignStatusUpdate,
     background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update campaign status - automatically sends emails when launched"""
     redis_db = get_redis_db(db)
@@ -228,7 +245,7 @@ async def update_campaign_status(
     elif status_update.status.value == "completed":
         update_data["completed_at"] = datetime.utcnow().isoformat()
     
-    updated = redis_db.update("campaigns", campaign_id, update_data)
+    updated = redis_db.with_counters("campaigns", [redis_db.update("campaigns", campaign_id, update_data)])[0]
     
     if status_update.status.value == "active":
         updated["_message"] = "Campaign launched! Emails are being sent in the background."
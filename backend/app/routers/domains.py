@@ -1,11 +1,12 @@
 """
 Domains routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Request
 import secrets
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.common import DomainCreate, DomainUpdate
 
 router = APIRouter(prefix="/api/domains", tags=["Domains"])
@@ -13,19 +14,24 @@ router = APIRouter(prefix="/api/domains", tags=["Domains"])
 
 @router.get("/")
 async def list_domains(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List all domains"""
     redis_db = get_redis_db(db)
-    return redis_db.get_all("domains", user_id=current_user["id"])
+    etag = listing_etag(request, redis_db, current_user["id"], ("domains",))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
+    return listing_response(redis_db.get_all("domains", user_id=current_user["id"]), etag)
 
 
 @router.get("/{domain_id}/health")
 async def check_domain_health(
     domain_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Check domain health (DNS, SPF, DKIM, DMARC)"""
     redis_db = get_redis_db(db)
@@ -50,7 +56,7 @@ async def check_domain_health(
 async def create_domain(
     domain: DomainCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Add a new domain"""
     redis_db = get_redis_db(db)
@@ -67,7 +73,7 @@ async def update_domain(
     domain_id: str,
     updates: DomainUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a domain"""
     redis_db = get_redis_db(db)
@@ -84,7 +90,7 @@ async def update_domain(
 async def delete_domain(
     domain_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete a domain"""
     redis_db = get_redis_db(db)
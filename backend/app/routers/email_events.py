@@ -1,15 +1,25 @@
 """
 Email Events routes with Redis
 """
-from fastapi import APIRouter, Depends, Query, Response
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Request
+from fastapi.responses import RedirectResponse
 from typing import Optional
 from datetime import datetime
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
+from ..models.common import ExportFormat
+from ..services.exports import EVENT_EXPORT_FIELDS, export_response
+from ..services.tracking_tokens import decode_token
+from ..services.link_tracking import link_cache, click_recorder
+from ..metrics import TRACKING_EVENTS
 
 router = APIRouter(prefix="/api/email-events", tags=["Email Events"])
 
+# An open only advances these; it never overrides replied, bounced or unsubscribed
+OPENABLE_LEAD_STATUSES = ("active", "sent")
+
 # 1x1 transparent GIF
 TRANSPARENT_GIF = bytes([
     0x47, 0x49, 0x46, 0x38, 0x39, 0x61, 0x01, 0x00, 0x01, 0x00,
@@ -21,23 +31,32 @@ TRANSPARENT_GIF = bytes([
 
 @router.get("/")
 async def list_email_events(
+    request: Request,
     campaign_id: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List email events, optionally filtered by campaign"""
     redis_db = get_redis_db(db)
+    etag = listing_etag(request, redis_db, current_user["id"], ("email_events", "leads", "campaigns"))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
     
+    leads = {lead["id"]: lead for lead in redis_db.get_all("leads", user_id=current_user["id"])}
     if campaign_id:
         events = redis_db.get_by_field("email_events", "campaign_id", campaign_id)
     else:
-        events = redis_db.get_all("email_events")
+        # Only the user's leads' events, so archived ones are filtered in SQL
+        events = redis_db.get_by_field_values("email_events", "lead_id", list(leads))
     
     # Add lead and campaign info, filter by user
+    campaign_ids = list({e["campaign_id"] for e in events if e.get("campaign_id")})
+    campaigns = {c["id"]: c for c in redis_db.get_many("campaigns", campaign_ids, fresh=True)}
     result = []
     for event in events:
-        lead = redis_db.get("leads", event.get("lead_id", ""))
-        if not lead or lead.get("user_id") != current_user["id"]:
+        lead = leads.get(event.get("lead_id", ""))
+        if not lead:
             continue
         
         event["lead"] = {
@@ -47,54 +66,91 @@ async def list_email_events(
             "last_name": lead.get("last_name")
         }
         
-        if event.get("campaign_id"):
-            campaign = redis_db.get("campaigns", event["campaign_id"])
-            if campaign:
-                event["campaign"] = {"id": campaign["id"], "name": campaign.get("name")}
+        campaign = campaigns.get(event.get("campaign_id"))
+        if campaign:
+            event["campaign"] = {"id": campaign["id"], "name": campaign.get("name")}
         
         result.append(event)
     
-    result.sort(key=lambda x: x.get("occurred_at", ""), reverse=True)
-    return result
+    result.sort(key=lambda x: x.get("occurred_at") or "", reverse=True)
+    return listing_response(result, etag)
+
+
+@router.get("/export")
+async def export_email_events(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    campaign_id: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: StorageEngine = Depends(get_db)
+):
+    """
+    Stream the events of one campaign, or of all the user's campaigns, as
+    NDJSON (full records) or CSV (EVENT_EXPORT_FIELDS). Events are grouped by
+    campaign, not sorted; memory use is bounded by the scan batch size.
+    """
+    redis_db = get_redis_db(db)
+    
+    if campaign_id:
+        campaign = redis_db.get("campaigns", campaign_id)
+        if not campaign or campaign.get("user_id") != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        campaign_ids = [campaign_id]
+    else:
+        campaign_ids = [c["id"] for c in redis_db.get_all("campaigns", user_id=current_user["id"])]
+    
+    def batches():
+        for cid in campaign_ids:
+            yield from redis_db.iter_batches("email_events", field="campaign_id", value=cid)
+    
+    return export_response(batches(), format.value, EVENT_EXPORT_FIELDS, "email_events")
+
+
+def _record_open(redis_db, sent: dict):
+    """Record an open event for a sent email and mark its lead opened if nothing later happened to it"""
+    now = datetime.utcnow().isoformat()
+    
+    # Update lead status; its owner is the event's, so the event write skips looking it up
+    lead = None
+    if sent.get("lead_id"):
+        lead = redis_db.update_if("leads", sent["lead_id"], {
+            "status": "opened",
+            "opened_at": now
+        }, "status", OPENABLE_LEAD_STATUSES)
+    
+    # The event and its lead/campaign indexes go out in one pipeline
+    redis_db.create_many("email_events", [{
+        "campaign_id": sent.get("campaign_id"),
+        "lead_id": sent.get("lead_id"),
+        "sending_account_id": sent.get("sending_account_id"),
+        "sequence_id": sent.get("sequence_id"),
+        "step_number": sent.get("step_number"),
+        "event_type": "opened",
+        "occurred_at": now
+    }], owners={lead["user_id"]} if lead and lead.get("user_id") else None)
 
 
 @router.get("/track-open")
 async def track_open(
-    id: str = Query(..., description="Event ID to track"),
-    db: redis.Redis = Depends(get_db)
+    t: Optional[str] = Query(None, description="Signed tracking token"),
+    id: Optional[str] = Query(None, description="Sent event ID (emails sent before signed tokens)"),
+    db: StorageEngine = Depends(get_db)
 ):
     """
     Tracking pixel endpoint - records email opens.
     Returns a 1x1 transparent GIF.
     """
+    TRACKING_EVENTS.inc("open")
     try:
         redis_db = get_redis_db(db)
-        sent_event = redis_db.get("email_events", id)
         
-        if sent_event:
-            # Record the open event
-            open_event = redis_db.create("email_events", {
-                "campaign_id": sent_event.get("campaign_id"),
-                "lead_id": sent_event.get("lead_id"),
-                "sending_account_id": sent_event.get("sending_account_id"),
-                "sequence_id": sent_event.get("sequence_id"),
-                "step_number": sent_event.get("step_number"),
-                "event_type": "opened",
-                "occurred_at": datetime.utcnow().isoformat()
-            })
-            
-            # Index by lead_id and campaign_id
-            if sent_event.get("lead_id"):
-                redis_db.index_by_field("email_events", open_event["id"], "lead_id", sent_event["lead_id"])
-            if sent_event.get("campaign_id"):
-                redis_db.index_by_field("email_events", open_event["id"], "campaign_id", sent_event["campaign_id"])
-            
-            # Update lead status
-            if sent_event.get("lead_id"):
-                redis_db.update("leads", sent_event["lead_id"], {
-                    "status": "opened",
-                    "opened_at": datetime.utcnow().isoformat()
-                })
+        if t:
+            decoded = decode_token(t)
+            if decoded and decoded[0] == "open":
+                _record_open(redis_db, decoded[1])
+        elif id:
+            sent_event = redis_db.get("email_events", id)
+            if sent_event:
+                _record_open(redis_db, sent_event)
     except Exception as e:
         print(f"Error tracking open: {e}")
     
@@ -107,3 +163,27 @@ async def track_open(
             "Expires": "0"
         }
     )
+
+
+@router.get("/track-click")
+async def track_click(
+    t: str = Query(..., description="Signed click token"),
+    db: StorageEngine = Depends(get_db)
+):
+    """
+    Click tracking redirect - records the click and redirects to the original link.
+    The target comes from a cached link table and the click is written in the background.
+    """
+    TRACKING_EVENTS.inc("click")
+    decoded = decode_token(t)
+    if not decoded or decoded[0] != "click":
+        raise HTTPException(status_code=404, detail="Link not found")
+    
+    click = decoded[1]
+    url = link_cache.resolve(get_redis_db(db), click["sequence_id"], click["link_index"])
+    if not url:
+        raise HTTPException(status_code=404, detail="Link not found")
+    
+    click_recorder.record({**click, "url": url})
+    
+    return RedirectResponse(url, status_code=302, headers={"Cache-Control": "no-store"})
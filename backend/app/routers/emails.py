@@ -2,8 +2,8 @@
 Email Operations routes with Redis
 """
 from fastapi import APIRouter, Depends, BackgroundTasks
-import redis
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
 from ..services.email_sender import send_campaign_emails
 from ..services.reply_checker import check_replies
@@ -16,7 +16,7 @@ async def trigger_send_campaign(
     background_tasks: BackgroundTasks,
     campaign_id: str = None,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """
     Trigger sending of campaign emails.
@@ -33,7 +33,7 @@ async def trigger_send_campaign(
 async def trigger_check_replies(
     background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """
     Check for email replies via IMAP.
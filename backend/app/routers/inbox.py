@@ -1,39 +1,41 @@
 """
 Inbox routes with Redis
 """
-from fastapi import APIRouter, Depends
-import redis
+from fastapi import APIRouter, Depends, Request
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import FastJSONResponse, listing_etag, cached_listing, listing_response
 
 router = APIRouter(prefix="/api/inbox", tags=["Inbox"])
 
 
 @router.get("/threads")
 async def list_threads(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List email threads grouped by lead"""
     redis_db = get_redis_db(db)
+    etag = listing_etag(request, redis_db, current_user["id"], ("email_events", "leads"))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
     
-    # Get all email events
-    events = redis_db.get_all("email_events")
+    # Only the user's leads' events, so archived ones are filtered in SQL
+    leads = {lead["id"]: lead for lead in redis_db.get_all("leads", user_id=current_user["id"])}
+    events = redis_db.get_by_field_values("email_events", "lead_id", list(leads))
+    events.sort(key=lambda x: x.get("created_at", ""), reverse=True)
     
     # Group by lead_id
-    threads_map = {}
+    events_by_lead = {}
     for event in events:
-        lead_id = event.get("lead_id")
-        if not lead_id or lead_id in threads_map:
-            continue
-        
-        lead = redis_db.get("leads", lead_id)
-        if not lead or lead.get("user_id") != current_user["id"]:
-            continue
-        
-        lead_events = [e for e in events if e.get("lead_id") == lead_id]
-        has_reply = any(e.get("event_type") == "replied" for e in lead_events)
-        
+        events_by_lead.setdefault(event["lead_id"], []).append(event)
+    
+    threads_map = {}
+    for lead_id, lead_events in events_by_lead.items():
+        lead = leads[lead_id]
         threads_map[lead_id] = {
             "lead_id": lead_id,
             "lead": {
@@ -42,19 +44,19 @@ async def list_threads(
                 "last_name": lead.get("last_name"),
                 "company": lead.get("company")
             },
-            "last_event": event,
-            "has_reply": has_reply,
+            "last_event": lead_events[0],
+            "has_reply": any(e.get("event_type") == "replied" for e in lead_events),
             "event_count": len(lead_events)
         }
     
-    return list(threads_map.values())
+    return listing_response(list(threads_map.values()), etag)
 
 
 @router.get("/threads/{lead_id}")
 async def get_thread_history(
     lead_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get email thread history for a lead"""
     redis_db = get_redis_db(db)
@@ -82,4 +84,4 @@ async def get_thread_history(
                 event["campaign"] = {"id": campaign["id"], "name": campaign.get("name")}
     
     events.sort(key=lambda x: x.get("occurred_at", ""))
-    return events
+    return FastJSONResponse(events)
@@ -0,0 +1,25 @@
+"""
+Background job routes with Redis
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
+from ..dependencies import get_current_user
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: StorageEngine = Depends(get_db)
+):
+    """Get job status and progress counters"""
+    redis_db = get_redis_db(db)
+    job = redis_db.get("jobs", job_id)
+    
+    if not job or job.get("user_id") != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job
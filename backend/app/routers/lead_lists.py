@@ -1,10 +1,11 @@
 """
 Lead Lists routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Request
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.lead import LeadListCreate, LeadListUpdate
 
 router = APIRouter(prefix="/api/lead-lists", tags=["Lead Lists"])
@@ -12,11 +13,17 @@ router = APIRouter(prefix="/api/lead-lists", tags=["Lead Lists"])
 
 @router.get("/")
 async def list_lead_lists(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List all lead lists"""
     redis_db = get_redis_db(db)
+    etag = listing_etag(request, redis_db, current_user["id"], ("lead_lists", "leads"))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
+    
     lists = redis_db.get_all("lead_lists", user_id=current_user["id"])
     
     # Count leads for each list
@@ -24,14 +31,14 @@ async def list_lead_lists(
         leads = redis_db.get_by_field("leads", "lead_list_id", lead_list["id"])
         lead_list["lead_count"] = len(leads)
     
-    return lists
+    return listing_response(lists, etag)
 
 
 @router.get("/{list_id}")
 async def get_lead_list(
     list_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get lead list details"""
     redis_db = get_redis_db(db)
@@ -47,7 +54,7 @@ async def get_lead_list(
 async def create_lead_list(
     lead_list: LeadListCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Create a new lead list"""
     redis_db = get_redis_db(db)
@@ -63,7 +70,7 @@ async def update_lead_list(
     list_id: str,
     updates: LeadListUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a lead list"""
     redis_db = get_redis_db(db)
@@ -80,7 +87,7 @@ async def update_lead_list(
 async def delete_lead_list(
     list_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete a lead list"""
     redis_db = get_redis_db(db)
@@ -1,27 +1,46 @@
 """
 Leads routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from typing import Optional
+from ..config import get_settings
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.lead import (
-    LeadCreate, LeadBulkCreate, LeadUpdate, LeadBulkDelete, LeadResponse
+    LeadCreate, LeadBulkCreate, LeadUpdate, LeadBulkDelete, LeadBulkStatusUpdate, LeadResponse,
+    LeadImportFormat, LeadImportMode, LeadDedupeScope
 )
+from ..models.common import ExportFormat
+from ..services.exports import LEAD_EXPORT_FIELDS, export_response, filter_batches
+from ..services.lead_import import LeadImporter, dedupe_leads
 
 router = APIRouter(prefix="/api/leads", tags=["Leads"])
 
 
+def _check_campaign(redis_db, campaign_id: Optional[str], user_id: str):
+    """Reject a campaign_id that isn't one of the user's campaigns"""
+    if campaign_id:
+        campaign = redis_db.get("campaigns", campaign_id)
+        if not campaign or campaign.get("user_id") != user_id:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+
+
 @router.get("/")
 async def list_leads(
+    request: Request,
     campaign_id: Optional[str] = Query(None),
     lead_list_id: Optional[str] = Query(None),
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List leads with optional filters"""
     redis_db = get_redis_db(db)
+    etag = listing_etag(request, redis_db, current_user["id"], ("leads", "campaigns"))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
     
     if campaign_id:
         leads = redis_db.get_by_field("leads", "campaign_id", campaign_id)
@@ -34,21 +53,55 @@ async def list_leads(
     leads = [l for l in leads if l.get("user_id") == current_user["id"]]
     
     # Add campaign info
+    campaign_ids = {l["campaign_id"] for l in leads if l.get("campaign_id")}
+    campaigns = {c["id"]: c for c in redis_db.get_many("campaigns", list(campaign_ids), fresh=True)}
     for lead in leads:
         if lead.get("campaign_id"):
-            campaign = redis_db.get("campaigns", lead["campaign_id"])
+            campaign = campaigns.get(lead["campaign_id"])
             if campaign:
                 lead["campaign"] = {"id": campaign["id"], "name": campaign.get("name")}
     
     leads.sort(key=lambda x: x.get("created_at", ""), reverse=True)
-    return leads
+    return listing_response(leads, etag)
+
+
+@router.get("/export")
+async def export_leads(
+    format: ExportFormat = Query(ExportFormat.ndjson),
+    campaign_id: Optional[str] = Query(None),
+    lead_list_id: Optional[str] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: StorageEngine = Depends(get_db)
+):
+    """
+    Stream the user's leads as NDJSON (full records) or CSV (LEAD_EXPORT_FIELDS),
+    optionally limited to one campaign or lead list. Unsorted; memory use is
+    bounded by the scan batch size rather than the number of leads.
+    """
+    redis_db = get_redis_db(db)
+    
+    if campaign_id:
+        campaign = redis_db.get("campaigns", campaign_id)
+        if not campaign or campaign.get("user_id") != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+        batches = redis_db.iter_batches("leads", field="campaign_id", value=campaign_id)
+    elif lead_list_id:
+        lead_list = redis_db.get("lead_lists", lead_list_id)
+        if not lead_list or lead_list.get("user_id") != current_user["id"]:
+            raise HTTPException(status_code=404, detail="Lead list not found")
+        batches = redis_db.iter_batches("leads", field="lead_list_id", value=lead_list_id)
+    else:
+        batches = redis_db.iter_batches("leads", user_id=current_user["id"])
+    
+    batches = filter_batches(batches, lambda lead: lead.get("user_id") == current_user["id"])
+    return export_response(batches, format.value, LEAD_EXPORT_FIELDS, "leads")
 
 
 @router.get("/{lead_id}")
 async def get_lead(
     lead_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get lead details"""
     redis_db = get_redis_db(db)
@@ -70,11 +123,14 @@ async def get_lead(
 async def create_lead(
     lead: LeadCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Create a single lead"""
     redis_db = get_redis_db(db)
     
+    if redis_db.find_lead_emails([lead.email], lead_list_id=lead.lead_list_id):
+        raise HTTPException(status_code=400, detail="A lead with this email already exists in this list")
+    
     lead_data = lead.model_dump()
     if lead_data.get("status"):
         lead_data["status"] = lead_data["status"].value
@@ -84,31 +140,25 @@ async def create_lead(
     lead_data.setdefault("current_step", 0)
     lead_data.setdefault("custom_fields", {})
     
-    record = redis_db.create("leads", lead_data, user_id=current_user["id"])
-    
-    # Index by lead_list_id
-    if lead.lead_list_id:
-        redis_db.index_by_field("leads", record["id"], "lead_list_id", lead.lead_list_id)
-    
-    # Index by campaign_id
-    if lead.campaign_id:
-        redis_db.index_by_field("leads", record["id"], "campaign_id", lead.campaign_id)
-    
-    return record
+    # Indexed by lead_list_id and campaign_id
+    return redis_db.create("leads", lead_data, user_id=current_user["id"])
 
 
 @router.post("/bulk")
 async def create_leads_bulk(
     bulk: LeadBulkCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
-    """Import leads in bulk"""
+    """
+    Import leads in bulk, skipping emails already in the lead list.
+    Returns the created leads with created and skipped counts.
+    """
     redis_db = get_redis_db(db)
-    created = []
+    _check_campaign(redis_db, bulk.campaign_id, current_user["id"])
     
-    for lead in bulk.leads:
-        lead_data = {
+    leads = [
+        {
             "lead_list_id": bulk.lead_list_id,
             "campaign_id": bulk.campaign_id,
             "email": lead.get("email"),
@@ -119,17 +169,57 @@ async def create_leads_bulk(
             "status": "active",
             "current_step": 0
         }
-        
-        record = redis_db.create("leads", lead_data, user_id=current_user["id"])
-        
-        if bulk.lead_list_id:
-            redis_db.index_by_field("leads", record["id"], "lead_list_id", bulk.lead_list_id)
-        if bulk.campaign_id:
-            redis_db.index_by_field("leads", record["id"], "campaign_id", bulk.campaign_id)
-        
-        created.append(record)
+        for lead in bulk.leads
+    ]
+    leads, duplicates = dedupe_leads(redis_db, leads, bulk.lead_list_id)
+    
+    created = redis_db.create_many(
+        "leads", leads,
+        user_id=current_user["id"]
+    )
+    return {"created": len(created), "skipped": len(duplicates), "leads": created}
+
+
+@router.post("/import")
+async def import_leads(
+    request: Request,
+    lead_list_id: str = Query(...),
+    campaign_id: Optional[str] = Query(None),
+    format: Optional[LeadImportFormat] = Query(None, description="csv or ndjson; inferred from Content-Type if omitted"),
+    mode: LeadImportMode = Query(LeadImportMode.skip, description="skip or upsert leads whose email is already in the list"),
+    dedupe_scope: LeadDedupeScope = Query(LeadDedupeScope.list, description="also skip emails in the user's other lists with 'user'"),
+    current_user: dict = Depends(get_current_user),
+    db: StorageEngine = Depends(get_db)
+):
+    """
+    Stream a CSV or NDJSON file of leads in the request body.
+    Rows are validated and written in chunks as the body arrives, so the
+    response is sent once the whole file is imported. Duplicate emails are
+    skipped, or update the existing lead (and its campaign) in upsert mode.
+    Returns the finished import job with its counters, not the created leads.
+    """
+    redis_db = get_redis_db(db)
+    
+    lead_list = redis_db.get("lead_lists", lead_list_id)
+    if not lead_list or lead_list.get("user_id") != current_user["id"]:
+        raise HTTPException(status_code=404, detail="Lead list not found")
+    _check_campaign(redis_db, campaign_id, current_user["id"])
     
-    return created
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = LeadImportFormat.ndjson if "json" in content_type else LeadImportFormat.csv
+    
+    importer = LeadImporter(
+        redis_db,
+        user_id=current_user["id"],
+        lead_list_id=lead_list_id,
+        campaign_id=campaign_id,
+        chunk_size=get_settings().lead_import_chunk_size,
+        mode=mode.value,
+        dedupe_scope=dedupe_scope.value
+    )
+    
+    return await importer.run(request.stream(), format.value)
 
 
 @router.patch("/{lead_id}")
@@ -137,7 +227,7 @@ async def update_lead(
     lead_id: str,
     updates: LeadUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a lead"""
     redis_db = get_redis_db(db)
@@ -157,7 +247,7 @@ async def update_lead(
 async def delete_lead(
     lead_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete a lead"""
     redis_db = get_redis_db(db)
@@ -175,14 +265,27 @@ async def delete_lead(
 async def delete_leads_bulk(
     bulk: LeadBulkDelete,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete multiple leads"""
     redis_db = get_redis_db(db)
     
-    for lead_id in bulk.ids:
-        existing = redis_db.get("leads", lead_id)
-        if existing and existing.get("user_id") == current_user["id"]:
-            redis_db.delete("leads", lead_id)
+    deleted = redis_db.delete_many("leads", bulk.ids, user_id=current_user["id"])
+    
+    return {"message": f"{deleted} leads deleted", "deleted": deleted}
+
+
+@router.post("/bulk/status")
+async def update_leads_status_bulk(
+    bulk: LeadBulkStatusUpdate,
+    current_user: dict = Depends(get_current_user),
+    db: StorageEngine = Depends(get_db)
+):
+    """Set the status of multiple leads"""
+    redis_db = get_redis_db(db)
+    
+    updated = redis_db.set_fields_many(
+        "leads", bulk.ids, {"status": bulk.status.value}, user_id=current_user["id"]
+    )
     
-    return {"message": f"{len(bulk.ids)} leads deleted"}
+    return {"message": f"{updated} leads updated", "updated": updated}
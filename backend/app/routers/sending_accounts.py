@@ -1,10 +1,11 @@
 """
 Sending Accounts routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Request
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.common import SendingAccountCreate, SendingAccountUpdate
 
 router = APIRouter(prefix="/api/sending-accounts", tags=["Sending Accounts"])
@@ -12,19 +13,24 @@ router = APIRouter(prefix="/api/sending-accounts", tags=["Sending Accounts"])
 
 @router.get("/")
 async def list_sending_accounts(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List all sending accounts"""
     redis_db = get_redis_db(db)
-    return redis_db.get_all("sending_accounts", user_id=current_user["id"])
+    etag = listing_etag(request, redis_db, current_user["id"], ("sending_accounts",))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
+    return listing_response(redis_db.get_all("sending_accounts", user_id=current_user["id"], fresh=True), etag)
 
 
 @router.get("/{account_id}")
 async def get_sending_account(
     account_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get sending account details"""
     redis_db = get_redis_db(db)
@@ -40,7 +46,7 @@ async def get_sending_account(
 async def create_sending_account(
     account: SendingAccountCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Create a new sending account"""
     redis_db = get_redis_db(db)
@@ -65,7 +71,7 @@ async def update_sending_account(
     account_id: str,
     updates: SendingAccountUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a sending account"""
     redis_db = get_redis_db(db)
@@ -85,7 +91,7 @@ async def update_sending_account(
 async def delete_sending_account(
     account_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete a sending account"""
     redis_db = get_redis_db(db)
@@ -1,11 +1,14 @@
 """
 Team, Subscription, and Unsubscribe routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import HTMLResponse
 from datetime import datetime
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..services.tracking_tokens import decode_token
+from ..metrics import TRACKING_EVENTS
 from ..models.common import (
     TeamMemberInvite,
     UnsubscribeCreate,
@@ -19,7 +22,7 @@ team_router = APIRouter(prefix="/api/team", tags=["Team"])
 @team_router.get("/")
 async def list_team_members(
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List team members"""
     redis_db = get_redis_db(db)
@@ -30,7 +33,7 @@ async def list_team_members(
 async def invite_team_member(
     invite: TeamMemberInvite,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Invite a team member"""
     redis_db = get_redis_db(db)
@@ -46,7 +49,7 @@ async def invite_team_member(
 async def remove_team_member(
     member_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Remove a team member"""
     redis_db = get_redis_db(db)
@@ -67,7 +70,7 @@ subscription_router = APIRouter(prefix="/api/subscriptions", tags=["Subscription
 @subscription_router.get("/")
 async def get_subscription(
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get user subscription"""
     redis_db = get_redis_db(db)
@@ -97,7 +100,7 @@ unsubscribe_router = APIRouter(prefix="/api/unsubscribe", tags=["Unsubscribe"])
 @unsubscribe_router.get("/")
 async def list_unsubscribed(
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List unsubscribed emails"""
     redis_db = get_redis_db(db)
@@ -108,20 +111,22 @@ async def list_unsubscribed(
 async def add_to_unsubscribe(
     entry: UnsubscribeCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Add email to unsubscribe list"""
     redis_db = get_redis_db(db)
     
     entry_data = entry.model_dump()
-    return redis_db.create("unsubscribe_list", entry_data, user_id=current_user["id"])
+    created = redis_db.create("unsubscribe_list", entry_data, user_id=current_user["id"])
+    redis_db.suppress_emails(current_user["id"], [entry_data["email"]], "unsubscribed")
+    return created
 
 
 @unsubscribe_router.delete("/{entry_id}")
 async def remove_from_unsubscribe(
     entry_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Remove email from unsubscribe list"""
     redis_db = get_redis_db(db)
@@ -131,14 +136,64 @@ async def remove_from_unsubscribe(
         raise HTTPException(status_code=404, detail="Entry not found")
     
     redis_db.delete("unsubscribe_list", entry_id)
+    # Addresses that also hard bounced stay suppressed
+    redis_db.unsuppress_emails(current_user["id"], [existing.get("email")], "unsubscribed")
     
     return {"message": "Removed from unsubscribe list"}
 
 
+ONE_CLICK_CONFIRM_PAGE = """<!DOCTYPE html>
+<html><body style="font-family: sans-serif; text-align: center; padding: 48px;">
+<p>Unsubscribe from these emails?</p>
+<form method="post"><button type="submit">Unsubscribe</button></form>
+</body></html>"""
+
+ONE_CLICK_DONE_PAGE = """<!DOCTYPE html>
+<html><body style="font-family: sans-serif; text-align: center; padding: 48px;">
+<p>You have been unsubscribed and will not receive further emails.</p>
+</body></html>"""
+
+
+@unsubscribe_router.get("/one-click", response_class=HTMLResponse)
+async def confirm_one_click_unsubscribe(
+    t: str = Query(..., description="Signed unsubscribe token")
+):
+    """
+    Unsubscribe link opened in a browser - shows a confirmation form.
+    Link scanners prefetch GET URLs, so only the POST unsubscribes.
+    """
+    decoded = decode_token(t)
+    if not decoded or decoded[0] != "unsubscribe":
+        raise HTTPException(status_code=404, detail="Link not found")
+    return ONE_CLICK_CONFIRM_PAGE
+
+
+@unsubscribe_router.post("/one-click", response_class=HTMLResponse)
+async def one_click_unsubscribe(
+    t: str = Query(..., description="Signed unsubscribe token"),
+    db: StorageEngine = Depends(get_db)
+):
+    """
+    RFC 8058 one-click unsubscribe (List-Unsubscribe-Post), no login required.
+    The signed token identifies the lead; suppression, the unsubscribe list
+    entry and the lead status are written in a single transaction.
+    """
+    TRACKING_EVENTS.inc("unsubscribe")
+    decoded = decode_token(t)
+    if not decoded or decoded[0] != "unsubscribe":
+        raise HTTPException(status_code=404, detail="Link not found")
+    
+    lead = get_redis_db(db).unsubscribe_lead(decoded[1]["lead_id"], reason="one_click")
+    if not lead:
+        raise HTTPException(status_code=404, detail="Link not found")
+    
+    return ONE_CLICK_DONE_PAGE
+
+
 @unsubscribe_router.get("/blacklist")
 async def list_blacklist(
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List blacklisted domains"""
     redis_db = get_redis_db(db)
@@ -149,7 +204,7 @@ async def list_blacklist(
 async def add_to_blacklist(
     entry: DomainBlacklistCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Add domain to blacklist"""
     redis_db = get_redis_db(db)
@@ -162,7 +217,7 @@ async def add_to_blacklist(
 async def remove_from_blacklist(
     entry_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Remove domain from blacklist"""
     redis_db = get_redis_db(db)
@@ -1,10 +1,11 @@
 """
 Email Templates routes with Redis
 """
-from fastapi import APIRouter, Depends, HTTPException
-import redis
+from fastapi import APIRouter, Depends, HTTPException, Request
 from ..database import get_db, get_redis_db
+from ..storage import StorageEngine
 from ..dependencies import get_current_user
+from ..responses import listing_etag, cached_listing, listing_response
 from ..models.common import TemplateCreate, TemplateUpdate
 
 router = APIRouter(prefix="/api/templates", tags=["Email Templates"])
@@ -12,19 +13,24 @@ router = APIRouter(prefix="/api/templates", tags=["Email Templates"])
 
 @router.get("/")
 async def list_templates(
+    request: Request,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """List all email templates"""
     redis_db = get_redis_db(db)
-    return redis_db.get_all("email_templates", user_id=current_user["id"])
+    etag = listing_etag(request, redis_db, current_user["id"], ("email_templates",))
+    cached = cached_listing(request, etag)
+    if cached:
+        return cached
+    return listing_response(redis_db.get_all("email_templates", user_id=current_user["id"]), etag)
 
 
 @router.get("/{template_id}")
 async def get_template(
     template_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Get template details"""
     redis_db = get_redis_db(db)
@@ -40,7 +46,7 @@ async def get_template(
 async def create_template(
     template: TemplateCreate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Create a new email template"""
     redis_db = get_redis_db(db)
@@ -56,7 +62,7 @@ async def update_template(
     template_id: str,
     updates: TemplateUpdate,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Update a template"""
     redis_db = get_redis_db(db)
@@ -73,7 +79,7 @@ async def update_template(
 async def delete_template(
     template_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Delete a template"""
     redis_db = get_redis_db(db)
@@ -91,7 +97,7 @@ async def delete_template(
 async def increment_template_usage(
     template_id: str,
     current_user: dict = Depends(get_current_user),
-    db: redis.Redis = Depends(get_db)
+    db: StorageEngine = Depends(get_db)
 ):
     """Increment template usage count"""
     redis_db = get_redis_db(db)
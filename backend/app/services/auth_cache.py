@@ -0,0 +1,79 @@
+"""
+In-process caches for request authentication: verified JWT claims and user
+profiles. A profile is served from memory for auth_user_cache_ttl_seconds,
+then revalidated against the users:version counter (one small GET) instead
+of re-reading the whole user record.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from ..config import get_settings
+
+
+class AuthCache:
+    """Bounded LRU of token -> user ID and user ID -> profile"""
+
+    def __init__(self, max_size: int, user_ttl: float):
+        self.max_size = max_size
+        self.user_ttl = user_ttl
+        # token -> (user_id, expiry as epoch seconds)
+        self._tokens: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # user_id -> (profile without password_hash, version, monotonic time last validated)
+        self._users: "OrderedDict[str, Tuple[Dict[str, Any], int, float]]" = OrderedDict()
+
+    def _put(self, items: OrderedDict, key: str, value):
+        items[key] = value
+        items.move_to_end(key)
+        if len(items) > self.max_size:
+            items.popitem(last=False)
+
+    def token_user(self, token: str) -> Optional[str]:
+        """User ID of a previously verified, unexpired token"""
+        entry = self._tokens.get(token)
+        if entry is None:
+            return None
+        user_id, expires_at = entry
+        if expires_at <= time.time():
+            del self._tokens[token]
+            return None
+        self._tokens.move_to_end(token)
+        return user_id
+
+    def remember_token(self, token: str, user_id: str, expires_at: Optional[float]):
+        """Cache a verified token until its exp claim"""
+        if expires_at is None:
+            expires_at = time.time() + self.user_ttl
+        self._put(self._tokens, token, (user_id, float(expires_at)))
+
+    def get_user(self, redis_db, user_id: str) -> Optional[Dict[str, Any]]:
+        """Return a copy of the user's profile, reading Redis only when the cached copy is stale"""
+        entry = self._users.get(user_id)
+        now = time.monotonic()
+        if entry is not None:
+            profile, version, validated_at = entry
+            if now - validated_at < self.user_ttl:
+                self._users.move_to_end(user_id)
+                return dict(profile)
+            if redis_db.get_user_version(user_id) == version:
+                self._put(self._users, user_id, (profile, version, now))
+                return dict(profile)
+
+        # Read the version before the record so a concurrent change is caught on the next check;
+        # the record bypasses the entity cache, which may still hold the previous version
+        version = redis_db.get_user_version(user_id)
+        user = redis_db.get("users", user_id, fresh=True)
+        if not user:
+            self._users.pop(user_id, None)
+            return None
+        user.pop("password_hash", None)
+        self._put(self._users, user_id, (user, version, now))
+        return dict(user)
+
+    def invalidate_user(self, redis_db, user_id: str):
+        """Drop a changed user here and, via the version counter, in every other process"""
+        redis_db.bump_user_version(user_id)
+        self._users.pop(user_id, None)
+
+
+_settings = get_settings()
+auth_cache = AuthCache(_settings.auth_cache_size, _settings.auth_user_cache_ttl_seconds)
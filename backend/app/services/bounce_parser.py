@@ -0,0 +1,168 @@
+"""
+Bounce (DSN) parsing for messages found in sending account inboxes.
+
+Understands RFC 3464 delivery status notifications (multipart/report with a
+message/delivery-status part) and the plain-text bounces sent by common MTAs
+and providers (Exim, Postfix, qmail, Gmail, Outlook), which carry the failed
+recipient in X-Failed-Recipients or the body.
+"""
+import email
+import re
+from email.message import Message
+from typing import Dict, Any, List, Optional
+
+_BOUNCE_SENDER_RE = re.compile(r"mailer-daemon|postmaster|mail delivery (sub)?system", re.I)
+_BOUNCE_SUBJECT_RE = re.compile(
+    r"undeliver|delivery status notification|delivery (has )?failed|mail delivery failed"
+    r"|failure notice|returned mail|returned to sender|could not be delivered",
+    re.I
+)
+_STATUS_RE = re.compile(r"\b([245])\.(\d{1,3})\.(\d{1,3})\b")
+_SMTP_CODE_RE = re.compile(r"\b([45])\d\d[ -]")
+_MESSAGE_ID_RE = re.compile(r"^Message-ID:\s*<([^>\s]+)>", re.I | re.M)
+_EMAIL_RE = re.compile(r"<?([A-Za-z0-9._%+'-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,})>?")
+
+
+def looks_like_bounce(msg: Message) -> bool:
+    """
+    Cheap check on headers only, used to decide which messages need their
+    full body fetched for DSN parsing.
+    """
+    content_type = msg.get("Content-Type", "")
+    if "report-type" in content_type.lower() and "delivery-status" in content_type.lower():
+        return True
+    if msg.get("X-Failed-Recipients"):
+        return True
+    return bool(
+        _BOUNCE_SENDER_RE.search(msg.get("From", ""))
+        and _BOUNCE_SUBJECT_RE.search(msg.get("Subject", ""))
+    )
+
+
+def _strip_address(value: str) -> Optional[str]:
+    """'rfc822; user@example.com' -> 'user@example.com'"""
+    value = (value or "").split(";", 1)[-1].strip()
+    match = _EMAIL_RE.search(value)
+    return match.group(1).lower() if match else None
+
+
+def _is_hard(status: Optional[str], action: Optional[str]) -> bool:
+    if status:
+        return status.startswith("5")
+    return (action or "").lower() == "failed"
+
+
+def _original_message_id(msg: Message) -> Optional[str]:
+    """Find the Message-ID of the returned message in an attached copy or in the text"""
+    for part in msg.walk():
+        content_type = part.get_content_type()
+        if content_type == "message/rfc822":
+            payload = part.get_payload()
+            if isinstance(payload, list) and payload:
+                message_id = payload[0].get("Message-ID")
+                if message_id:
+                    return message_id.strip().strip("<>")
+        elif content_type in ("text/rfc822-headers", "text/plain"):
+            text = _part_text(part)
+            match = _MESSAGE_ID_RE.search(text)
+            if match:
+                return match.group(1)
+    return None
+
+
+def _part_text(part: Message) -> str:
+    payload = part.get_payload(decode=True)
+    if isinstance(payload, bytes):
+        return payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    if isinstance(payload, str):
+        return payload
+    return ""
+
+
+def _parse_delivery_status(part: Message) -> List[Dict[str, Any]]:
+    """Read the per-recipient blocks of a message/delivery-status part"""
+    blocks = part.get_payload()
+    if not isinstance(blocks, list):
+        # Some servers send it as text; re-parse each blank-line separated block
+        text = _part_text(part)
+        blocks = [email.message_from_string(block) for block in re.split(r"\r?\n\r?\n", text) if block.strip()]
+
+    recipients = []
+    for block in blocks:
+        recipient = _strip_address(block.get("Final-Recipient") or block.get("Original-Recipient") or "")
+        if not recipient:
+            continue
+        status_match = _STATUS_RE.search(block.get("Status", ""))
+        status = status_match.group(0) if status_match else None
+        action = (block.get("Action") or "").strip().lower() or None
+        if action in ("delivered", "relayed", "expanded"):
+            continue
+        recipients.append({
+            "recipient": recipient,
+            "status": status,
+            "action": action,
+            "diagnostic": (block.get("Diagnostic-Code") or "").strip() or None,
+            "hard": _is_hard(status, action)
+        })
+    return recipients
+
+
+def _parse_text_bounce(msg: Message) -> List[Dict[str, Any]]:
+    """Fallback for non-RFC 3464 bounces: X-Failed-Recipients or addresses in the body"""
+    text = "\n".join(
+        _part_text(part) for part in msg.walk()
+        if part.get_content_type() == "text/plain"
+    )
+
+    recipients = [
+        address.strip().lower()
+        for address in (msg.get("X-Failed-Recipients") or "").split(",")
+        if address.strip()
+    ]
+    if not recipients:
+        # Body text before the returned copy usually names the failed address first
+        head = text.split("Message-ID:", 1)[0]
+        match = _EMAIL_RE.search(head)
+        if match:
+            recipients = [match.group(1).lower()]
+
+    status_match = _STATUS_RE.search(text)
+    status = status_match.group(0) if status_match else None
+    if not status:
+        code_match = _SMTP_CODE_RE.search(text)
+        status = f"{code_match.group(1)}.0.0" if code_match else None
+
+    return [
+        {
+            "recipient": recipient,
+            "status": status,
+            "action": "failed",
+            "diagnostic": None,
+            # Text bounces without a temporary code are final failures
+            "hard": not (status or "").startswith("4")
+        }
+        for recipient in recipients
+    ]
+
+
+def parse_bounce(msg: Message) -> Optional[Dict[str, Any]]:
+    """
+    Parse a bounce message.
+    Returns {"original_message_id", "recipients": [{recipient, status, action,
+    diagnostic, hard}]}, or None when the message is not a bounce.
+    """
+    recipients: List[Dict[str, Any]] = []
+    for part in msg.walk():
+        if part.get_content_type() == "message/delivery-status":
+            recipients.extend(_parse_delivery_status(part))
+
+    if not recipients and looks_like_bounce(msg):
+        recipients = _parse_text_bounce(msg)
+
+    if not recipients:
+        return None
+
+    return {
+        "original_message_id": _original_message_id(msg),
+        "recipients": recipients
+    }
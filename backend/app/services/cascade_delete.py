@@ -0,0 +1,47 @@
+"""
+Cascading delete jobs with Redis
+"""
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def create_cascade_job(redis_db, entity: str, entity_id: str, user_id: str) -> Dict[str, Any]:
+    """Create the job record that tracks a cascading delete"""
+    return redis_db.create_job({
+        "type": "cascade_delete",
+        "status": "pending",
+        "entity": entity,
+        "entity_id": entity_id,
+        "deleted": {}
+    }, user_id=user_id)
+
+
+def run_cascade_job(
+    redis_db,
+    job_id: str,
+    entity: str,
+    entity_id: str,
+    owner_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Run a cascading delete, recording progress on the job record.
+    owner_id is the user owning the root record, which may already be deleted.
+    Synchronous so BackgroundTasks runs it in the threadpool instead of the event loop.
+    """
+    redis_db.update("jobs", job_id, {"status": "running"})
+
+    def on_progress(counts: Dict[str, int]):
+        redis_db.update("jobs", job_id, {"deleted": counts})
+
+    try:
+        counts = redis_db.cascade_delete(
+            entity, entity_id, on_progress=on_progress, owners={owner_id} if owner_id else None
+        )
+    except Exception as e:
+        logger.exception(f"Cascade delete of {entity}:{entity_id} failed: {e}")
+        return redis_db.finish_job(job_id, {"status": "failed", "error": str(e)})
+
+    logger.info(f"Cascade delete of {entity}:{entity_id} finished: {counts}")
+    return redis_db.finish_job(job_id, {"status": "completed", "deleted": counts})
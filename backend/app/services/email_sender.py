@@ -4,11 +4,34 @@ Email sending service with Redis
 import aiosmtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import make_msgid
 from datetime import datetime
 import logging
+from ..config import get_settings
+from ..database import normalize_email
+from ..metrics import EMAILS_SENT, EMAILS_FAILED, EMAILS_DEFERRED, SMTP_SEND_SECONDS
+from .tracking_tokens import encode_token
+from .link_tracking import prepare_tracked_body, fill_tracked_links
 
 logger = logging.getLogger(__name__)
 
+_TRANSIENT_SMTP_ERRORS = (
+    aiosmtplib.SMTPConnectError,
+    aiosmtplib.SMTPServerDisconnected,
+    aiosmtplib.SMTPTimeoutError,
+)
+
+
+def is_transient_smtp_error(error: Exception) -> bool:
+    """True for failures worth retrying later: 4xx replies, connection problems, timeouts"""
+    if isinstance(error, _TRANSIENT_SMTP_ERRORS):
+        return True
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return all(400 <= r.code < 500 for r in error.recipients)
+    if isinstance(error, aiosmtplib.SMTPResponseException):
+        return 400 <= error.code < 500
+    return False
+
 
 async def send_email(
     smtp_host: str,
@@ -20,13 +43,16 @@ async def send_email(
     to_email: str,
     subject: str,
     html_body: str,
-    headers: dict = None
+    headers: dict = None,
+    start_tls: bool = True
 ) -> dict:
     """Send a single email via SMTP"""
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = f"{from_name} <{from_email}>"
     msg['To'] = to_email
+    # Replies and bounces are matched back to the sent event by this ID
+    msg['Message-ID'] = make_msgid(domain=from_email.split("@")[-1])
     
     if headers:
         for key, value in headers.items():
@@ -43,13 +69,13 @@ async def send_email(
             port=smtp_port,
             username=username,
             password=password,
-            start_tls=True
+            start_tls=start_tls
         )
         logger.info(f"Email sent successfully to {to_email}")
         return {"success": True, "message_id": msg.get('Message-ID', '')}
     except Exception as e:
         logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return {"success": False, "error": str(e)}
+        return {"success": False, "error": str(e), "deferred": is_transient_smtp_error(e)}
 
 
 async def send_campaign_emails(redis_db, campaign_id: str = None):
@@ -69,6 +95,7 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
             campaigns = [c for c in campaigns if c.get("id") == campaign_id]
         
         logger.info(f"Found {len(campaigns)} active campaign(s) to process")
+        tracking_base = get_settings().tracking_base_url
         
         for campaign in campaigns:
             logger.info(f"Processing campaign: {campaign.get('name')}")
@@ -80,7 +107,12 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
             
             leads = redis_db.get_by_field("leads", "lead_list_id", campaign["lead_list_id"])
             leads = [l for l in leads if l.get("status") == "active"]
-            logger.info(f"Found {len(leads)} active leads")
+            
+            # Skip hard-bounced and unsubscribed addresses
+            suppressed = redis_db.find_suppressed(campaign.get("user_id"), [l.get("email") for l in leads])
+            if suppressed:
+                leads = [l for l in leads if normalize_email(l.get("email")) not in suppressed]
+            logger.info(f"Found {len(leads)} active leads ({len(suppressed)} suppressed)")
             
             # Get sending account
             if not campaign.get("sending_account_id"):
@@ -105,8 +137,13 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
             
             logger.info(f"Using sequence step 1: {first_step.get('subject')}")
             
+            # Rewrite links for click tracking once per template, not per lead
+            tracked_body, link_indexes = prepare_tracked_body(redis_db, first_step["id"], first_step.get("body", ""))
+            
             emails_sent = 0
             daily_limit = campaign.get("daily_send_limit", 50)
+            # Owner whose collection versions the event writes bump
+            owners = {campaign["user_id"]}
             
             for lead in leads:
                 if emails_sent >= daily_limit:
@@ -127,7 +164,7 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
                 
                 # Variable substitution
                 subject = first_step.get("subject", "")
-                body = first_step.get("body", "")
+                body = tracked_body
                 subject = subject.replace("{{first_name}}", lead.get("first_name") or "")
                 subject = subject.replace("{{last_name}}", lead.get("last_name") or "")
                 subject = subject.replace("{{company}}", lead.get("company") or "")
@@ -137,7 +174,7 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
                 body = body.replace("{{company}}", lead.get("company") or "")
                 body = body.replace("{{email}}", lead.get("email") or "")
                 
-                # Create event record
+                # Create event record (indexed by lead and campaign)
                 event = redis_db.create("email_events", {
                     "campaign_id": campaign["id"],
                     "lead_id": lead["id"],
@@ -148,38 +185,69 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
                     "recipient_email": lead["email"],
                     "subject": subject,
                     "occurred_at": datetime.utcnow().isoformat()
-                })
+                }, owners=owners)
                 
-                # Index the event
-                redis_db.index_by_field("email_events", event["id"], "lead_id", lead["id"])
-                redis_db.index_by_field("email_events", event["id"], "campaign_id", campaign["id"])
-                
-                # Add tracking pixel
-                tracking_base = "http://localhost:8000"
-                tracking_pixel = f'<img src="{tracking_base}/api/email-events/track-open?id={event["id"]}" width="1" height="1" style="display:none;" />'
+                # Add tracking pixel with a signed token so opens are recorded without a lookup
+                open_token = encode_token(
+                    "open",
+                    campaign_id=campaign["id"],
+                    lead_id=lead["id"],
+                    sequence_id=first_step["id"],
+                    sending_account_id=account["id"],
+                    step_number=1
+                )
+                tracking_pixel = f'<img src="{tracking_base}/api/email-events/track-open?t={open_token}" width="1" height="1" style="display:none;" />'
+                body = fill_tracked_links(
+                    body,
+                    link_indexes,
+                    campaign_id=campaign["id"],
+                    lead_id=lead["id"],
+                    sequence_id=first_step["id"],
+                    sending_account_id=account["id"],
+                    step_number=1
+                )
                 html_body = f"<div>{body}</div>{tracking_pixel}"
                 
+                # RFC 8058 one-click unsubscribe, plus a mailto fallback whose subject
+                # carries the same token (matched by the reply checker)
+                unsubscribe_token = encode_token("unsubscribe", campaign_id=campaign["id"], lead_id=lead["id"])
+                list_unsubscribe_headers = {
+                    "List-Unsubscribe": (
+                        f"<{tracking_base}/api/unsubscribe/one-click?t={unsubscribe_token}>, "
+                        f"<mailto:{account['email_address']}?subject=unsubscribe%20{unsubscribe_token}>"
+                    ),
+                    "List-Unsubscribe-Post": "List-Unsubscribe=One-Click"
+                }
+                
                 # Get password - try multiple field names
                 smtp_password = account.get("smtp_password") or account.get("smtp_password_encrypted") or ""
                 
                 # Send email
-                result = await send_email(
-                    smtp_host=account.get("smtp_host", "smtp.zoho.in"),
-                    smtp_port=account.get("smtp_port", 587),
-                    username=account.get("smtp_username") or account.get("email_address"),
-                    password=smtp_password,
-                    from_email=account["email_address"],
-                    from_name=account.get("display_name") or account["email_address"],
-                    to_email=lead["email"],
-                    subject=subject,
-                    html_body=html_body
-                )
+                with SMTP_SEND_SECONDS.time(account["id"]):
+                    result = await send_email(
+                        smtp_host=account.get("smtp_host", "smtp.zoho.in"),
+                        smtp_port=account.get("smtp_port", 587),
+                        username=account.get("smtp_username") or account.get("email_address"),
+                        password=smtp_password,
+                        from_email=account["email_address"],
+                        from_name=account.get("display_name") or account["email_address"],
+                        to_email=lead["email"],
+                        subject=subject,
+                        html_body=html_body,
+                        headers=list_unsubscribe_headers,
+                        start_tls=account.get("smtp_use_tls", True)
+                    )
                 
                 if result["success"]:
+                    EMAILS_SENT.inc(account["id"])
+                    
                     # Update event with message ID
+                    message_id = (result.get("message_id") or "").strip("<>")
                     redis_db.update("email_events", event["id"], {
-                        "message_id": result.get("message_id")
-                    })
+                        "message_id": message_id
+                    }, owners=owners)
+                    if message_id:
+                        redis_db.index_by_field("email_events", event["id"], "message_id", message_id)
                     
                     # Update lead status
                     redis_db.update("leads", lead["id"], {
@@ -188,10 +256,10 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
                         "current_step": 1
                     })
                     
-                    # Update campaign sent count
-                    redis_db.update("campaigns", campaign["id"], {
-                        "sent_count": campaign.get("sent_count", 0) + 1
-                    })
+                    # Update campaign sent count (atomic: other senders may be counting too)
+                    redis_db.increment_counters(
+                        "campaigns", {campaign["id"]: {"sent_count": 1}}, owners=owners
+                    )
                     
                     emails_sent += 1
                     results.append({
@@ -201,9 +269,13 @@ async def send_campaign_emails(redis_db, campaign_id: str = None):
                     })
                     logger.info(f"Successfully sent email to {lead['email']}")
                 else:
+                    if result.get("deferred"):
+                        EMAILS_DEFERRED.inc(account["id"])
+                    else:
+                        EMAILS_FAILED.inc(account["id"])
                     redis_db.update("email_events", event["id"], {
                         "error_message": result.get("error")
-                    })
+                    }, owners=owners)
                     results.append({
                         "campaign": campaign.get("name"),
                         "lead": lead["email"],
@@ -0,0 +1,124 @@
+"""
+Event projection worker - builds derived views from the event log.
+
+Run as a standalone process next to the API:
+
+    python -m app.services.event_projections
+    python -m app.services.event_projections --projection campaign_stats --replay
+
+Each projection runs in its own thread as a consumer of its group on every
+shard of the log (see app.event_log). Give every worker process a distinct,
+stable --consumer name (default: the host name), so entries it left
+unacknowledged are retried when it restarts. Stop the other workers before
+a --replay, which rebuilds the views from the stored events (Redis and the
+archive). Lag and pending entries per group are reported by the API's
+/metrics (event_log_consumer_entries).
+"""
+import argparse
+import logging
+import socket
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+from ..database import BATCH_SIZE, decode_record, get_redis_db
+from ..event_log import EventLogConsumer, Projection
+
+logger = logging.getLogger(__name__)
+
+
+class CampaignStatsProjection(Projection):
+    """
+    Events per type for each campaign (stats:by_campaign:{id}), read by
+    get_event_counts. The IDs of the events counted are kept per campaign
+    (stats:applied:by_campaign:{id}), so redelivered entries and events both
+    in the log and seen by a rebuild are counted once. Events of campaigns
+    that no longer exist are dropped.
+    """
+
+    name = "campaign_stats"
+
+    def apply(self, redis_db, tx, events: List[Dict[str, Any]]):
+        by_campaign = defaultdict(list)
+        for event in events:
+            if event.get("campaign_id") and event.get("event_type"):
+                by_campaign[event["campaign_id"]].append(event)
+        self._count(tx, by_campaign)
+
+    def _count(self, tx, by_campaign: Dict[str, List[Dict[str, Any]]]):
+        """Count the events not counted yet, for campaigns that still exist"""
+        campaign_ids = [cid for cid, events in by_campaign.items() if events]
+        if not campaign_ids:
+            return
+        # A concurrent delete of the campaign (and its stats) or count of the same events retries
+        tx.watch(*(f"campaigns:{cid}" for cid in campaign_ids))
+        tx.watch(*(f"stats:applied:by_campaign:{cid}" for cid in campaign_ids))
+        live = [cid for cid, flag in zip(campaign_ids, tx.are_members("campaigns:all", campaign_ids)) if flag]
+        new_events = {}
+        for campaign_id in live:
+            events = list({event["id"]: event for event in by_campaign[campaign_id]}.values())
+            applied = tx.are_members(f"stats:applied:by_campaign:{campaign_id}", [event["id"] for event in events])
+            new_events[campaign_id] = [event for event, flag in zip(events, applied) if not flag]
+        tx.multi()
+        for campaign_id, events in new_events.items():
+            if not events:
+                continue
+            tx.add_members(f"stats:applied:by_campaign:{campaign_id}", *(event["id"] for event in events))
+            for event_type, count in Counter(event["event_type"] for event in events).items():
+                tx.hash_incr(f"stats:by_campaign:{campaign_id}", event_type, count)
+
+    def reset(self, redis_db):
+        keys = [
+            key
+            for campaign_id in redis_db.engine.scan_members("campaigns:all")
+            for key in (f"stats:by_campaign:{campaign_id}", f"stats:applied:by_campaign:{campaign_id}")
+        ]
+        for start in range(0, len(keys), BATCH_SIZE):
+            redis_db.engine.delete(*keys[start:start + BATCH_SIZE])
+
+    def rebuild(self, redis_db):
+        for campaign_id in redis_db.engine.scan_members("campaigns:all"):
+            for events in redis_db.iter_batches("email_events", field="campaign_id", value=campaign_id):
+                events = [event for event in events if event.get("event_type")]
+                redis_db.engine.transaction(lambda tx: self._count(tx, {campaign_id: events}))
+
+
+PROJECTIONS = {
+    projection.name: projection
+    for projection in (CampaignStatsProjection(),)
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build derived views from the event log")
+    parser.add_argument(
+        "--projection", action="append", choices=sorted(PROJECTIONS),
+        help="Projection to run (repeatable; default: all)"
+    )
+    parser.add_argument("--consumer", default=socket.gethostname(), help="Consumer name, stable across restarts")
+    parser.add_argument("--replay", action="store_true", help="Reset the views and rebuild them from the stored events")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    redis_db = get_redis_db()
+    stopped = threading.Event()
+    threads = []
+    for name in args.projection or sorted(PROJECTIONS):
+        consumer = EventLogConsumer(redis_db, PROJECTIONS[name], args.consumer, decode_record)
+        if args.replay:
+            logger.info(f"Rebuilding projection {name}")
+            consumer.setup()
+            consumer.replay()
+        thread = threading.Thread(target=consumer.run, args=(stopped,), name=f"projection:{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        stopped.set()
+
+
+if __name__ == "__main__":
+    main()
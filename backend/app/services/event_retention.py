@@ -0,0 +1,73 @@
+"""
+Event retention service - moves old email events out of Redis.
+
+Run as a standalone process next to the API (EVENT_ARCHIVE_PATH must be set,
+and point at the same file for every process on the node):
+
+    python -m app.services.event_retention          # every EVENT_COMPACTION_INTERVAL_SECONDS
+    python -m app.services.event_retention --once
+
+Events older than EVENT_HOT_RETENTION_DAYS (by occurred_at, else created_at)
+are written to the SQLite archive and then removed from Redis with their
+index entries, so Redis holds a bounded window of events. Reads through
+RedisDB keep returning archived events.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+from ..config import get_settings
+from ..database import ARCHIVED_ENTITIES, get_redis_db
+from ..metrics import EVENTS_ARCHIVED
+
+logger = logging.getLogger(__name__)
+
+
+def compact_events(redis_db, retention_days: int) -> Dict[str, int]:
+    """
+    Archive every record of ARCHIVED_ENTITIES older than retention_days,
+    one index batch at a time. Returns the number moved per entity.
+    """
+    if redis_db.archive is None:
+        raise RuntimeError("EVENT_ARCHIVE_PATH is not set")
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+    moved: Dict[str, int] = {}
+    for entity in ARCHIVED_ENTITIES:
+        moved[entity] = 0
+        for records in redis_db.iter_batches(entity, fresh=True):
+            expired = [
+                record for record in records
+                if (record.get("occurred_at") or record.get("created_at") or "") < cutoff
+            ]
+            if expired:
+                redis_db.archive_records(entity, expired)
+                EVENTS_ARCHIVED.inc(entity, amount=len(expired))
+                moved[entity] += len(expired)
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move email events past the retention window to the archive")
+    parser.add_argument("--once", action="store_true", help="Compact once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    settings = get_settings()
+    redis_db = get_redis_db()
+    try:
+        while True:
+            started = time.monotonic()
+            moved = compact_events(redis_db, settings.event_hot_retention_days)
+            logger.info(f"Archived {moved} in {time.monotonic() - started:.1f}s")
+            if args.once:
+                break
+            time.sleep(settings.event_compaction_interval_seconds)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Streaming exports of leads and email events as NDJSON or CSV.
+
+Records are read one index batch at a time (RedisDB.iter_batches) and
+encoded batch by batch, so an export holds at most one batch in memory
+whatever the size of the account. The generators are synchronous: Starlette
+runs them in its threadpool, keeping the Redis calls off the event loop.
+"""
+import csv
+import io
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+from fastapi.responses import StreamingResponse
+from ..codec import get_codec
+
+LEAD_EXPORT_FIELDS = (
+    "id", "email", "first_name", "last_name", "company", "status",
+    "lead_list_id", "campaign_id", "current_step", "custom_fields",
+    "created_at", "updated_at",
+)
+
+EVENT_EXPORT_FIELDS = (
+    "id", "occurred_at", "event_type", "reply_type", "campaign_id", "lead_id",
+    "sequence_id", "step_number", "sending_account_id", "recipient_email",
+    "subject", "message_id", "url", "error_message", "metadata",
+)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+RecordBatches = Iterable[List[Dict[str, Any]]]
+
+
+def _csv_value(value: Any) -> Any:
+    """Nested values (custom fields, metadata) go into one cell as JSON"""
+    if isinstance(value, (dict, list)):
+        return get_codec().dumps_bytes(value).decode("utf-8")
+    return "" if value is None else value
+
+
+def iter_ndjson(batches: RecordBatches) -> Iterator[bytes]:
+    """One JSON object per line, one chunk per batch"""
+    codec = get_codec()
+    for records in batches:
+        yield b"".join(codec.dumps_bytes(record) + b"\n" for record in records)
+
+
+def iter_csv(batches: RecordBatches, fields: Iterable[str]) -> Iterator[bytes]:
+    """A header row, then the given fields of each record, one chunk per batch"""
+    fields = tuple(fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for records in batches:
+        for record in records:
+            writer.writerow([_csv_value(record.get(field)) for field in fields])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def filter_batches(batches: RecordBatches, keep: Callable[[Dict[str, Any]], bool]) -> Iterator[List[Dict[str, Any]]]:
+    """Drop records failing keep() from each batch"""
+    for records in batches:
+        kept = [record for record in records if keep(record)]
+        if kept:
+            yield kept
+
+
+def export_response(
+    batches: RecordBatches,
+    format: str,
+    fields: Iterable[str],
+    filename: str
+) -> StreamingResponse:
+    """Stream record batches as an NDJSON or CSV attachment"""
+    body = iter_ndjson(batches) if format == "ndjson" else iter_csv(batches, fields)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{format}"',
+            "Cache-Control": "no-store"
+        }
+    )
@@ -0,0 +1,263 @@
+"""
+Streaming lead import service with Redis
+"""
+import codecs
+import csv
+import logging
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple
+from email_validator import validate_email, EmailNotValidError
+from ..codec import get_codec
+from ..database import normalize_email
+
+logger = logging.getLogger(__name__)
+
+LEAD_FIELDS = ("email", "first_name", "last_name", "company")
+
+# Only the first few row errors are kept on the job record
+MAX_JOB_ERRORS = 20
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream incrementally and yield lines with their line endings"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def iter_csv_records(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Group lines into complete CSV records.
+    A quoted field may span several lines, so a record is only complete
+    once it contains an even number of quote characters.
+    """
+    pending = ""
+    async for line in iter_lines(stream):
+        pending += line
+        if pending.count('"') % 2 == 0:
+            yield pending
+            pending = ""
+    if pending:
+        yield pending
+
+
+def normalize_lead(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate and normalize a raw import row.
+    Unknown columns are folded into custom_fields.
+    Raises ValueError for rows that cannot be imported.
+    """
+    raw_email = (row.get("email") or "").strip()
+    if not raw_email:
+        raise ValueError("missing email")
+
+    try:
+        email = validate_email(raw_email, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError(f"invalid email {raw_email!r}: {e}")
+
+    custom_fields = row.get("custom_fields") or {}
+    if not isinstance(custom_fields, dict):
+        custom_fields = {}
+    for key, value in row.items():
+        if key not in LEAD_FIELDS and key != "custom_fields" and key and value not in (None, ""):
+            custom_fields[key] = value
+
+    def clean(value):
+        if value is None:
+            return None
+        value = str(value).strip()
+        return value or None
+
+    return {
+        "email": email,
+        "first_name": clean(row.get("first_name")),
+        "last_name": clean(row.get("last_name")),
+        "company": clean(row.get("company")),
+        "custom_fields": custom_fields
+    }
+
+
+def dedupe_leads(
+    redis_db,
+    leads: List[Dict[str, Any]],
+    lead_list_id: str,
+    user_id: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], List[Tuple[Optional[str], Dict[str, Any]]]]:
+    """
+    Split a batch of leads into new leads and duplicates using the email index.
+    Duplicates are returned as (existing_lead_id, lead); the ID is None when
+    the email only exists outside the lead list, or repeats within the batch.
+    Pass user_id to also treat emails in the user's other lists as duplicates.
+    """
+    existing = redis_db.find_lead_emails(
+        [lead.get("email") for lead in leads],
+        lead_list_id=lead_list_id,
+        user_id=user_id
+    )
+
+    new_leads = []
+    duplicates = []
+    seen = set()
+    for lead in leads:
+        email = normalize_email(lead.get("email"))
+        if email in existing:
+            duplicates.append((existing[email], lead))
+        elif email in seen:
+            duplicates.append((None, lead))
+        else:
+            seen.add(email)
+            new_leads.append(lead)
+    return new_leads, duplicates
+
+
+class LeadImporter:
+    """
+    Parses an uploaded CSV or NDJSON stream in chunks and writes each
+    chunk of leads with a single pipeline. Progress counters are stored
+    on a `jobs` record so clients can poll them while the upload runs.
+    """
+
+    def __init__(
+        self,
+        redis_db,
+        user_id: str,
+        lead_list_id: str,
+        campaign_id: Optional[str] = None,
+        chunk_size: int = 1000,
+        mode: str = "skip",
+        dedupe_scope: str = "list"
+    ):
+        self.redis_db = redis_db
+        self.user_id = user_id
+        self.lead_list_id = lead_list_id
+        self.campaign_id = campaign_id
+        self.chunk_size = chunk_size
+        self.mode = mode
+        self.dedupe_scope = dedupe_scope
+        self.counters = {"processed": 0, "created": 0, "updated": 0, "duplicates": 0, "invalid": 0}
+        self.errors: List[Dict[str, Any]] = []
+        self.job = redis_db.create_job({
+            "type": "lead_import",
+            "status": "running",
+            "lead_list_id": lead_list_id,
+            "campaign_id": campaign_id,
+            "mode": mode,
+            "dedupe_scope": dedupe_scope,
+            **self.counters,
+            "errors": []
+        }, user_id)
+
+    async def run(self, stream: AsyncIterator[bytes], file_format: str) -> Dict[str, Any]:
+        """Consume the stream, returning the finished job record"""
+        rows = self._iter_csv(stream) if file_format == "csv" else self._iter_ndjson(stream)
+        chunk: List[Tuple[int, Dict[str, Any]]] = []
+
+        try:
+            async for row_number, row in rows:
+                chunk.append((row_number, row))
+                if len(chunk) >= self.chunk_size:
+                    self._write_chunk(chunk)
+                    chunk = []
+            if chunk:
+                self._write_chunk(chunk)
+        except Exception as e:
+            logger.exception(f"Lead import {self.job['id']} failed: {e}")
+            return self._save(finished=True, status="failed", error=str(e))
+
+        logger.info(f"Lead import {self.job['id']} finished: {self.counters}")
+        return self._save(finished=True, status="completed")
+
+    async def _iter_csv(self, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        header = None
+        row_number = 0
+        async for record in iter_csv_records(stream):
+            if not record.strip():
+                continue
+            values = next(csv.reader([record]), [])
+            if header is None:
+                header = [h.strip().lower().replace(" ", "_") for h in values]
+                continue
+            row_number += 1
+            yield row_number, dict(zip(header, values))
+
+    async def _iter_ndjson(self, stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        row_number = 0
+        async for line in iter_lines(stream):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = get_codec().loads(line)
+            except ValueError:
+                row = None
+            if not isinstance(row, dict):
+                self._record_error(row_number, "line is not a JSON object")
+                continue
+            yield row_number, row
+
+    def _record_error(self, row_number: int, message: str):
+        self.counters["processed"] += 1
+        self.counters["invalid"] += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def _write_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]]):
+        leads = []
+        for row_number, row in chunk:
+            try:
+                lead = normalize_lead(row)
+            except ValueError as e:
+                self._record_error(row_number, str(e))
+                continue
+
+            lead.update({
+                "lead_list_id": self.lead_list_id,
+                "campaign_id": self.campaign_id,
+                "status": "active",
+                "current_step": 0
+            })
+            leads.append(lead)
+            self.counters["processed"] += 1
+
+        new_leads, duplicates = dedupe_leads(
+            self.redis_db, leads, self.lead_list_id,
+            user_id=self.user_id if self.dedupe_scope == "user" else None
+        )
+
+        updates = {}
+        for lead_id, lead in duplicates:
+            if self.mode == "upsert" and lead_id and lead_id not in updates:
+                # The import's campaign is applied too; without one, existing assignments stay
+                updates[lead_id] = {
+                    key: value for key, value in lead.items()
+                    if key in ("first_name", "last_name", "company", "custom_fields", "campaign_id") and value
+                }
+            else:
+                self.counters["duplicates"] += 1
+
+        created = self.redis_db.create_many(
+            "leads", new_leads,
+            user_id=self.user_id
+        )
+        updated = self.redis_db.update_many("leads", updates) if updates else []
+
+        self.counters["created"] += len(created)
+        self.counters["updated"] += len(updated)
+        self._save()
+
+    def _save(self, finished: bool = False, **extra) -> Dict[str, Any]:
+        updates = {**self.counters, "errors": self.errors, **extra}
+        if finished:
+            self.job = self.redis_db.finish_job(self.job["id"], updates)
+        else:
+            self.job = self.redis_db.update("jobs", self.job["id"], updates)
+        return self.job
@@ -0,0 +1,169 @@
+"""
+Click tracking: link rewriting for outgoing emails, cached link resolution
+and a write-behind buffer for recorded clicks.
+"""
+import asyncio
+import html
+import logging
+import re
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from ..config import get_settings
+from ..database import get_redis_db
+from ..metrics import CLICKS_DROPPED, Gauge
+from .tracking_tokens import encode_token
+
+logger = logging.getLogger(__name__)
+
+_HREF_RE = re.compile(r"""(<a\b[^>]*?\bhref\s*=\s*)(["'])(.*?)\2""", re.I | re.S)
+_UNTRACKED_PREFIXES = ("mailto:", "tel:", "sms:", "#", "javascript:")
+
+
+def _marker(index: int) -> str:
+    return f"{{{{__link_{index}}}}}"
+
+
+def prepare_tracked_body(redis_db, sequence_id: str, body: str) -> Tuple[str, List[int]]:
+    """
+    Replace each trackable href in a sequence body with a placeholder.
+    Done once per template: returns the body with placeholders (still holding
+    the {{variables}} for per-lead substitution) and the link table index of
+    each placeholder. Links containing template variables are left untracked
+    since their target differs per lead.
+    """
+    tracking_base = get_settings().tracking_base_url
+    urls: List[str] = []
+
+    def replace(match):
+        url = html.unescape(match.group(3).strip())
+        if (not url or "{{" in url or url.lower().startswith(_UNTRACKED_PREFIXES)
+                or url.startswith(tracking_base)):
+            return match.group(0)
+        urls.append(url)
+        return f"{match.group(1)}{match.group(2)}{_marker(len(urls) - 1)}{match.group(2)}"
+
+    template = _HREF_RE.sub(replace, body)
+    return template, redis_db.get_link_indexes(sequence_id, urls)
+
+
+def fill_tracked_links(body: str, link_indexes: List[int], **token_fields) -> str:
+    """Swap the placeholders of a prepared body for this recipient's click URLs"""
+    tracking_base = get_settings().tracking_base_url
+    for position, link_index in enumerate(link_indexes):
+        token = encode_token("click", link_index=link_index, **token_fields)
+        body = body.replace(_marker(position), f"{tracking_base}/api/email-events/track-click?t={token}")
+    return body
+
+
+class LinkCache:
+    """Bounded in-process LRU of (sequence_id, link_index) -> URL; link tables are append-only"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+
+    def resolve(self, redis_db, sequence_id: str, link_index: int) -> Optional[str]:
+        key = (sequence_id, link_index)
+        url = self._items.get(key)
+        if url is not None:
+            self._items.move_to_end(key)
+            return url
+
+        url = redis_db.get_link(sequence_id, link_index)
+        if url is not None:
+            self._items[key] = url
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return url
+
+
+class ClickRecorder:
+    """
+    Write-behind buffer for clicks. The redirect handler only appends to an
+    in-memory list; a background task flushes it every click_flush_interval
+    seconds, or as soon as click_flush_batch_size clicks are pending, with one
+    pipeline. A failed write is put back and retried on the next flush; at
+    most max_pending clicks are kept, dropping the oldest.
+    """
+
+    def __init__(self, flush_interval: float, batch_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: List[Dict[str, Any]] = []
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, click: Dict[str, Any]):
+        self._pending.append({**click, "occurred_at": datetime.utcnow().isoformat()})
+        if len(self._pending) >= self.batch_size:
+            # Flushed by run(), off the request path
+            self._full.set()
+
+    def flush(self) -> bool:
+        """Write all pending clicks; returns False (keeping them pending) when the write failed"""
+        if not self._pending:
+            return True
+        batch, self._pending = self._pending, []
+
+        try:
+            get_redis_db().create_many("email_events", [
+                {
+                    "campaign_id": click.get("campaign_id"),
+                    "lead_id": click.get("lead_id"),
+                    "sending_account_id": click.get("sending_account_id"),
+                    "sequence_id": click.get("sequence_id"),
+                    "step_number": click.get("step_number"),
+                    "event_type": "clicked",
+                    "url": click.get("url"),
+                    "occurred_at": click["occurred_at"]
+                }
+                for click in batch
+            ])
+        except Exception as e:
+            self._pending = batch + self._pending
+            overflow = len(self._pending) - self.max_pending
+            if overflow > 0:
+                del self._pending[:overflow]
+                CLICKS_DROPPED.inc(amount=overflow)
+            logger.error(f"Failed to flush {len(batch)} click(s), {len(self._pending)} pending: {e}")
+            return False
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            if not self.flush():
+                # Let a failing store recover before the next attempt
+                await asyncio.sleep(self.flush_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.flush()
+
+
+_settings = get_settings()
+link_cache = LinkCache(_settings.click_link_cache_size)
+click_recorder = ClickRecorder(
+    _settings.click_flush_interval_seconds, _settings.click_flush_batch_size, _settings.click_buffer_max_size
+)
+
+CLICK_BUFFER_DEPTH = Gauge(
+    "click_buffer_pending", "Clicks buffered in memory waiting to be written",
+    callback=lambda: {(): len(click_recorder._pending)}
+)
@@ -0,0 +1,109 @@
+"""
+Password hashing off the event loop.
+
+bcrypt spends hundreds of milliseconds of CPU per call by design. Calls run
+in a small dedicated thread pool (the bcrypt extension releases the GIL), and
+the number of waiting calls is capped so a login burst is rejected early
+instead of queueing without bound.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Any
+from passlib.hash import bcrypt
+from ..config import get_settings
+from ..metrics import Gauge
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are already waiting"""
+
+
+class PasswordHasher:
+    """Bounded bcrypt executor with queue-depth counters"""
+
+    def __init__(self, rounds: int, max_workers: int, max_queue: int):
+        self.hasher = bcrypt.using(rounds=rounds)
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        # Counters are updated from the event loop and the worker threads
+        self._lock = threading.Lock()
+
+    def _timed(self, enqueued_at: float, func, *args):
+        started_at = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            finished_at = time.perf_counter()
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.wait_seconds += started_at - enqueued_at
+                self.run_seconds += finished_at - started_at
+
+    async def _submit(self, func, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, time.perf_counter(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.hasher.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        if not password_hash:
+            return False
+        return await self._submit(self.hasher.verify, password, password_hash)
+
+    def needs_update(self, password_hash: str) -> bool:
+        """True when a stored hash uses a different cost than configured"""
+        return self.hasher.needs_update(password_hash)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_queued": self.max_queued,
+            "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+
+@lru_cache()
+def get_password_hasher() -> PasswordHasher:
+    """Shared hasher configured from settings"""
+    settings = get_settings()
+    return PasswordHasher(
+        rounds=settings.bcrypt_rounds,
+        max_workers=settings.password_hash_workers,
+        max_queue=settings.password_hash_max_queue
+    )
+
+
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_calls", "bcrypt calls waiting for or running on a worker thread", ("state",),
+    callback=lambda: {
+        ("queued",): get_password_hasher().queued,
+        ("running",): get_password_hasher().running
+    }
+)
@@ -1,108 +1,452 @@
 """
 Reply checker service with Redis
 """
-from datetime import datetime
+import asyncio
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import lru_cache
 import imaplib
 import email
+import logging
+import re
+import time
 from email.header import decode_header
+from typing import Callable, Dict, List, Optional, Tuple
+from ..config import get_settings
+from ..metrics import Gauge, IMAP_POLL_SECONDS, IMAP_POLL_ERRORS, IMAP_MESSAGES_FETCHED
+from .bounce_parser import looks_like_bounce, parse_bounce
+from .reply_classifier import HUMAN_REPLY, AUTO_REPLY, UNSUBSCRIBE_REQUEST, classify_replies
+from .tracking_tokens import decode_token
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache()
+def get_imap_executor() -> ThreadPoolExecutor:
+    """Bounded thread pool that runs the blocking imaplib calls off the event loop"""
+    settings = get_settings()
+    return ThreadPoolExecutor(max_workers=settings.imap_max_workers, thread_name_prefix="imap")
+
+
+IMAP_QUEUE_DEPTH = Gauge(
+    "imap_executor_queue_depth", "Mailbox fetches waiting for an IMAP worker thread",
+    callback=lambda: {(): get_imap_executor()._work_queue.qsize()}
+)
+
+
+# Only these headers and the first imap_snippet_bytes of the body are
+# downloaded; full bodies are fetched just for bounces
+HEADER_FIELDS = (
+    "MESSAGE-ID", "IN-REPLY-TO", "REFERENCES", "SUBJECT", "FROM",
+    "CONTENT-TYPE", "CONTENT-TRANSFER-ENCODING", "X-FAILED-RECIPIENTS",
+    "AUTO-SUBMITTED", "PRECEDENCE", "X-AUTOREPLY", "X-AUTORESPOND",
+    "X-AUTORESPONDER", "X-AUTOGENERATED"
+)
+
+_UID_RE = re.compile(rb"UID (\d+)")
+# Subject of a List-Unsubscribe mailto message: "unsubscribe <token>"
+_UNSUBSCRIBE_SUBJECT_RE = re.compile(r"\bunsubscribe\s+([A-Za-z0-9_-]{20,})", re.I)
+_FETCH_START_RE = re.compile(rb"^\d+ \(")
+
+
+def _response_int(mail: imaplib.IMAP4, code: str) -> Optional[int]:
+    """Read a numeric response code (UIDVALIDITY, UIDNEXT) from the last SELECT"""
+    typ, data = mail.response(code)
+    try:
+        return int(data[-1])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _before_command(mail: imaplib.IMAP4, deadline: float, timeout: float):
+    """Fail once the poll deadline has passed; otherwise bound the next command by what is left of it"""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("IMAP poll took longer than imap_poll_timeout_seconds")
+    mail.sock.settimeout(min(timeout, remaining))
+
+
+def search_criteria(sync_state: Optional[dict], uidvalidity: Optional[int]) -> Tuple[int, Tuple[str, ...]]:
+    """
+    (last seen UID, UID SEARCH criteria) for a sync: the UIDs after the stored
+    one, or the last few days on the first sync or when UIDVALIDITY changed
+    """
+    if sync_state and sync_state.get("uidvalidity") == uidvalidity:
+        last_uid = int(sync_state.get("last_uid", 0))
+        return last_uid, ("UID", f"{last_uid + 1}:*")
+    since = (datetime.utcnow() - timedelta(days=get_settings().imap_initial_sync_days)).strftime("%d-%b-%Y")
+    return 0, ("SINCE", since)
+
+
+def header_fetch_items() -> str:
+    """FETCH items for the headers and body snippet of new messages"""
+    fields = " ".join(HEADER_FIELDS)
+    return f"BODY.PEEK[HEADER.FIELDS ({fields})] BODY.PEEK[TEXT]<0.{get_settings().imap_snippet_bytes}>"
+
+
+def fetch_new_messages(
+    account: dict,
+    sync_state: Optional[dict],
+    timeout: float,
+    poll_timeout: Optional[float] = None
+) -> Tuple[List[email.message.Message], dict]:
+    """
+    Fetch the headers of messages that arrived since the last sync.
+    Uses the stored UIDVALIDITY and last seen UID to ask only for new UIDs,
+    and BODY.PEEK so the \\Seen flag is left alone. Messages that look like
+    bounces are fetched again in full so their DSN can be parsed. On the first sync (or when
+    UIDVALIDITY changes) messages from the last few days are scanned instead.
+    Every socket operation times out after timeout seconds, and the whole
+    poll after poll_timeout, so the thread and its connection never outlive it.
+    Blocking - run it in the IMAP executor. Returns (messages, new sync state).
+    """
+    settings = get_settings()
+    deadline = time.monotonic() + (poll_timeout or settings.imap_poll_timeout_seconds)
+    imap_class = imaplib.IMAP4_SSL if account.get("imap_use_ssl", True) else imaplib.IMAP4
+    mail = imap_class(
+        account["imap_host"],
+        account.get("imap_port", 993),
+        timeout=timeout
+    )
+    messages = []
+
+    try:
+        _before_command(mail, deadline, timeout)
+        mail.login(
+            account.get("imap_username") or account["email_address"],
+            account.get("imap_password_encrypted", "")
+        )
+
+        _before_command(mail, deadline, timeout)
+        mail.select("INBOX", readonly=True)
+        uidvalidity = _response_int(mail, "UIDVALIDITY")
+        uidnext = _response_int(mail, "UIDNEXT")
+
+        _before_command(mail, deadline, timeout)
+        last_uid, criteria = search_criteria(sync_state, uidvalidity)
+        status, data = mail.uid("SEARCH", *criteria)
+
+        # "n:*" always matches the newest message, even when its UID is below n
+        uids = sorted(int(uid) for uid in (data[0] or b"").split() if int(uid) > last_uid)
+
+        headers = _uid_fetch(
+            mail, uids,
+            header_fetch_items(),
+            settings.imap_fetch_batch_size,
+            lambda: _before_command(mail, deadline, timeout)
+        )
+
+        bounce_uids = [uid for uid, msg in headers.items() if looks_like_bounce(msg)]
+        if bounce_uids:
+            headers.update(_uid_fetch(
+                mail, bounce_uids, "BODY.PEEK[]", settings.imap_fetch_batch_size,
+                lambda: _before_command(mail, deadline, timeout)
+            ))
+
+        messages = [headers[uid] for uid in sorted(headers)]
+    finally:
+        try:
+            mail.sock.settimeout(min(timeout, 5.0))
+            mail.logout()
+        except Exception:
+            pass
+
+    new_last_uid = max([last_uid, *uids, (uidnext or 1) - 1])
+    return messages, {"uidvalidity": uidvalidity, "last_uid": new_last_uid}
+
+
+def _uid_fetch(
+    mail: imaplib.IMAP4,
+    uids: List[int],
+    items: str,
+    batch_size: int,
+    before_command: Callable[[], None] = lambda: None
+) -> Dict[int, email.message.Message]:
+    """
+    UID FETCH data items for many messages, batch_size UIDs per command.
+    The literals returned for each message (e.g. header fields, then a body
+    snippet) are concatenated and parsed as one message.
+    """
+    messages = {}
+    for start in range(0, len(uids), batch_size):
+        before_command()
+        batch = uids[start:start + batch_size]
+        status, msg_data = mail.uid("FETCH", ",".join(str(uid) for uid in batch), f"(UID {items})")
+
+        current = None
+        parsed = []
+        for response_part in msg_data:
+            head = response_part[0] if isinstance(response_part, tuple) else response_part
+            if isinstance(response_part, tuple) and _FETCH_START_RE.match(head):
+                current = {"uid": None, "raw": b""}
+                parsed.append(current)
+            if current is None:
+                continue
+            match = _UID_RE.search(head or b"")
+            if match:
+                current["uid"] = int(match.group(1))
+            if isinstance(response_part, tuple):
+                current["raw"] += response_part[1]
+
+        for item in parsed:
+            if item["uid"] is not None:
+                messages[item["uid"]] = email.message_from_bytes(item["raw"])
+    return messages
+
+
+def reply_to_message_id(msg: email.message.Message) -> Optional[str]:
+    """Message-ID this message answers, from In-Reply-To or the last References entry"""
+    in_reply_to = msg.get("In-Reply-To", "") or (msg.get("References", "").split() or [""])[-1]
+    return in_reply_to.strip().strip("<>") or None
+
+
+def mailto_unsubscribe_lead(msg: email.message.Message) -> Optional[str]:
+    """Lead ID from the signed token in a List-Unsubscribe mailto subject, if the message is one"""
+    match = _UNSUBSCRIBE_SUBJECT_RE.search(msg.get("Subject", ""))
+    decoded = decode_token(match.group(1)) if match else None
+    if not decoded or decoded[0] != "unsubscribe":
+        return None
+    return decoded[1]["lead_id"]
+
+
+def process_messages(redis_db, account: dict, messages: List[email.message.Message]) -> List[dict]:
+    """
+    Sort fetched messages into bounces, List-Unsubscribe mailto requests and
+    replies, resolve the sent emails they refer to in one batched lookup,
+    classify the replies, and record them.
+    """
+    replies = []
+    bounces = []
+    results = []
+    for msg in messages:
+        bounce = parse_bounce(msg) if looks_like_bounce(msg) else None
+        if bounce:
+            bounces.append(bounce)
+            continue
+        unsubscribe_lead_id = mailto_unsubscribe_lead(msg)
+        if unsubscribe_lead_id:
+            if redis_db.unsubscribe_lead(unsubscribe_lead_id, reason="mailto"):
+                results.append({
+                    "account": account["email_address"],
+                    "status": "unsubscribe_detected",
+                    "lead_id": unsubscribe_lead_id
+                })
+            continue
+        reply_to_id = reply_to_message_id(msg)
+        if reply_to_id:
+            replies.append((msg, reply_to_id))
+
+    originals = redis_db.find_sent_events(
+        [reply_to_id for _, reply_to_id in replies]
+        + [bounce["original_message_id"] for bounce in bounces]
+    )
+
+    replies = [(msg, reply_to_id) for msg, reply_to_id in replies if reply_to_id in originals]
+    reply_types = classify_replies([msg for msg, _ in replies])
+
+    for (msg, reply_to_id), reply_type in zip(replies, reply_types):
+        results.append(record_reply(redis_db, account, msg, originals[reply_to_id], reply_type))
+
+    results.extend(record_bounces(redis_db, account, bounces, originals))
+    return results
+
+
+def record_bounces(redis_db, account: dict, bounces: List[dict], originals: Dict[str, dict]) -> List[dict]:
+    """
+    Record a batch of parsed bounces against the emails that caused them.
+    Every failed recipient gets a "bounced" event; hard bounces also mark the
+    lead bounced, bump the campaign's bounced_count and suppress the address.
+    """
+    now = datetime.utcnow().isoformat()
+    events = []
+    hard_by_lead: Dict[str, dict] = {}
+
+    for bounce in bounces:
+        original = originals.get(bounce["original_message_id"])
+        if not original:
+            continue
+        for recipient in bounce["recipients"]:
+            if recipient["action"] == "delayed":
+                continue
+            events.append({
+                "campaign_id": original.get("campaign_id"),
+                "lead_id": original.get("lead_id"),
+                "sending_account_id": account["id"],
+                "sequence_id": original.get("sequence_id"),
+                "step_number": original.get("step_number"),
+                "event_type": "bounced",
+                "recipient_email": recipient["recipient"],
+                "error_message": recipient["diagnostic"],
+                "occurred_at": now,
+                "metadata": {
+                    "bounce_type": "hard" if recipient["hard"] else "soft",
+                    "status": recipient["status"],
+                    "original_message_id": bounce["original_message_id"]
+                }
+            })
+            if recipient["hard"] and original.get("lead_id"):
+                hard_by_lead[original["lead_id"]] = original
+
+    # The account's owner also owns the campaigns it sends for
+    redis_db.create_many("email_events", events, owners={account["user_id"]} if account.get("user_id") else None)
+
+    # Leads already marked bounced are not counted twice
+    leads = [
+        lead for lead in redis_db.get_many("leads", list(hard_by_lead))
+        if lead.get("status") != "bounced"
+    ]
+    redis_db.update_many("leads", {
+        lead["id"]: {"status": "bounced", "bounced_at": now} for lead in leads
+    })
+
+    per_campaign = Counter(hard_by_lead[lead["id"]].get("campaign_id") for lead in leads)
+    per_campaign.pop(None, None)
+    redis_db.increment_counters(
+        "campaigns",
+        {campaign_id: {"bounced_count": count} for campaign_id, count in per_campaign.items()},
+        owners={lead["user_id"] for lead in leads if lead.get("user_id")}
+    )
+
+    suppress_by_user = defaultdict(list)
+    for lead in leads:
+        suppress_by_user[lead.get("user_id")].append(lead.get("email"))
+    for user_id, emails in suppress_by_user.items():
+        if user_id:
+            redis_db.suppress_emails(user_id, emails, "bounced")
+
+    return [
+        {
+            "account": account["email_address"],
+            "status": "bounce_detected",
+            "lead_id": event["lead_id"],
+            "bounce_type": event["metadata"]["bounce_type"]
+        }
+        for event in events
+    ]
+
+
+# How each reply class is recorded: (event type, lead status, lead timestamp field, result status)
+REPLY_OUTCOMES = {
+    HUMAN_REPLY: ("replied", "replied", "replied_at", "reply_detected"),
+    AUTO_REPLY: ("auto_replied", None, None, "auto_reply_detected"),
+    UNSUBSCRIBE_REQUEST: ("unsubscribed", "unsubscribed", "unsubscribed_at", "unsubscribe_detected"),
+}
+
+
+def record_reply(redis_db, account: dict, msg: email.message.Message, original: dict, reply_type: str = HUMAN_REPLY) -> dict:
+    """
+    Record a reply event for a message answering one of our sent emails.
+    Only human replies mark the lead replied (which stops its sequence);
+    auto-replies are logged without touching the lead, and unsubscribe
+    requests go through unsubscribe_lead (status, suppression and list entry).
+    """
+    reply_to_id = original.get("message_id")
+    event_type, lead_status, timestamp_field, result_status = REPLY_OUTCOMES[reply_type]
+    now = datetime.utcnow().isoformat()
+
+    # Record reply event
+    reply_event = redis_db.create("email_events", {
+        "campaign_id": original.get("campaign_id"),
+        "lead_id": original.get("lead_id"),
+        "sending_account_id": account["id"],
+        "sequence_id": original.get("sequence_id"),
+        "step_number": original.get("step_number"),
+        "event_type": event_type,
+        "reply_type": reply_type,
+        "occurred_at": now,
+        "metadata": {
+            "reply_to_message_id": reply_to_id,
+            "subject": msg.get("Subject", "")
+        }
+    }, owners={account["user_id"]} if account.get("user_id") else None)
+
+    # Update lead status
+    if original.get("lead_id") and reply_type == UNSUBSCRIBE_REQUEST:
+        # Also suppresses the address and adds it to the owner's unsubscribe list
+        redis_db.unsubscribe_lead(original["lead_id"], reason="reply")
+    elif original.get("lead_id") and lead_status:
+        redis_db.update("leads", original["lead_id"], {
+            "status": lead_status,
+            timestamp_field: now
+        })
+
+    return {
+        "account": account["email_address"],
+        "status": result_status,
+        "lead_id": original.get("lead_id")
+    }
+
+
+async def poll_account(redis_db, account: dict, host_limits: Dict[str, asyncio.Semaphore]) -> List[dict]:
+    """
+    Poll one mailbox, holding a per-host connection slot while IMAP work runs.
+    The fetch enforces imap_poll_timeout_seconds itself; the slot is only
+    released once the worker thread has returned and closed its connection.
+    """
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+
+    try:
+        async with host_limits[account["imap_host"]]:
+            with IMAP_POLL_SECONDS.time(account["id"]):
+                fetch = loop.run_in_executor(
+                    get_imap_executor(),
+                    fetch_new_messages,
+                    account,
+                    redis_db.get_imap_sync_state(account["id"]),
+                    settings.imap_timeout_seconds,
+                    settings.imap_poll_timeout_seconds
+                )
+                try:
+                    messages, sync_state = await asyncio.shield(fetch)
+                except asyncio.CancelledError:
+                    # Keep the slot until the thread is done with its connection
+                    await asyncio.wait([fetch])
+                    raise
+    except Exception as e:
+        IMAP_POLL_ERRORS.inc(account["id"])
+        logger.warning(f"IMAP poll failed for {account.get('email_address')}: {e!r}")
+        return [{"account": account.get("email_address"), "error": str(e) or repr(e)}]
+
+    return record_fetched(redis_db, account, messages, sync_state)
+
+
+def record_fetched(redis_db, account: dict, messages: List[email.message.Message], sync_state: dict) -> List[dict]:
+    """Record fetched messages, then advance the account's sync state"""
+    IMAP_MESSAGES_FETCHED.inc(amount=len(messages))
+
+    results = process_messages(redis_db, account, messages)
+
+    # Only advance once the batch is recorded, so a failure refetches it
+    redis_db.set_imap_sync_state(account["id"], sync_state)
+    return results
 
 
 async def check_replies(redis_db):
     """
     Check for email replies via IMAP using Redis storage.
+    All active accounts are polled concurrently, with at most
+    imap_max_connections_per_host open connections to each server.
     """
     results = []
-    
+
     try:
+        settings = get_settings()
+
         # Get active sending accounts with IMAP configured
         accounts = redis_db.get_all("sending_accounts")
         accounts = [a for a in accounts if a.get("status") == "active" and a.get("imap_host")]
-        
-        for account in accounts:
-            try:
-                # Connect to IMAP
-                mail = imaplib.IMAP4_SSL(
-                    account["imap_host"],
-                    account.get("imap_port", 993)
-                )
-                
-                mail.login(
-                    account.get("imap_username") or account["email_address"],
-                    account.get("imap_password_encrypted", "")
-                )
-                
-                mail.select("INBOX")
-                
-                # Search for unread messages
-                status, messages = mail.search(None, "UNSEEN")
-                
-                for msg_num in messages[0].split():
-                    status, msg_data = mail.fetch(msg_num, "(RFC822)")
-                    
-                    for response_part in msg_data:
-                        if isinstance(response_part, tuple):
-                            msg = email.message_from_bytes(response_part[1])
-                            
-                            in_reply_to = msg.get("In-Reply-To", "")
-                            if not in_reply_to:
-                                continue
-                            
-                            reply_to_id = in_reply_to.strip("<>")
-                            
-                            # Find original sent event by message ID
-                            all_events = redis_db.get_all("email_events")
-                            original = next(
-                                (e for e in all_events 
-                                 if e.get("message_id") == reply_to_id and e.get("event_type") == "sent"),
-                                None
-                            )
-                            
-                            if not original:
-                                continue
-                            
-                            # Record reply event
-                            reply_event = redis_db.create("email_events", {
-                                "campaign_id": original.get("campaign_id"),
-                                "lead_id": original.get("lead_id"),
-                                "sending_account_id": account["id"],
-                                "sequence_id": original.get("sequence_id"),
-                                "step_number": original.get("step_number"),
-                                "event_type": "replied",
-                                "occurred_at": datetime.utcnow().isoformat(),
-                                "metadata": {
-                                    "reply_to_message_id": reply_to_id,
-                                    "subject": msg.get("Subject", "")
-                                }
-                            })
-                            
-                            # Index the event
-                            if original.get("lead_id"):
-                                redis_db.index_by_field("email_events", reply_event["id"], "lead_id", original["lead_id"])
-                            if original.get("campaign_id"):
-                                redis_db.index_by_field("email_events", reply_event["id"], "campaign_id", original["campaign_id"])
-                            
-                            # Update lead status
-                            if original.get("lead_id"):
-                                redis_db.update("leads", original["lead_id"], {
-                                    "status": "replied",
-                                    "replied_at": datetime.utcnow().isoformat()
-                                })
-                            
-                            results.append({
-                                "account": account["email_address"],
-                                "status": "reply_detected",
-                                "lead_id": original.get("lead_id")
-                            })
-                
-                mail.logout()
-                
-            except Exception as e:
-                results.append({
-                    "account": account.get("email_address"),
-                    "error": str(e)
-                })
-        
+
+        host_limits = defaultdict(lambda: asyncio.Semaphore(settings.imap_max_connections_per_host))
+
+        polled = await asyncio.gather(*(
+            poll_account(redis_db, account, host_limits) for account in accounts
+        ))
+        for account_results in polled:
+            results.extend(account_results)
+
         return {"success": True, "results": results}
-    
+
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -0,0 +1,109 @@
+"""
+Rule-based classification of inbound replies.
+
+Separates real human replies from autoresponders (out-of-office, vacation,
+ticket acknowledgements) and unsubscribe requests, using the standard
+autoresponder headers (RFC 3834 Auto-Submitted, X-Autoreply, Precedence)
+and precompiled subject/body phrase patterns. Unsubscribe requests must be
+short imperative lines; anything less clear is left as a human reply.
+"""
+import re
+from email.message import Message
+from typing import List
+
+HUMAN_REPLY = "human_reply"
+AUTO_REPLY = "auto_reply"
+UNSUBSCRIBE_REQUEST = "unsubscribe_request"
+
+_AUTO_HEADERS = ("X-Autoreply", "X-Autorespond", "X-Autoresponder", "X-Autogenerated")
+_AUTO_PRECEDENCE = {"auto_reply", "bulk", "junk", "list"}
+
+_AUTO_SUBJECT_RE = re.compile(
+    r"automatic reply|auto[- ]?reply|auto[- ]?response|autoresponse|out of (the )?office|\booo\b"
+    r"|away from (the )?office|on vacation|on holiday|on leave|annual leave"
+    r"|abwesenheit|r[ée]ponse automatique|respuesta autom[áa]tica|risposta automatica"
+    r"|automatisch antwoord|resposta autom[áa]tica|we('ve| have) received your (message|email|request)",
+    re.I
+)
+_AUTO_BODY_RE = re.compile(
+    r"\bI(?: am|'m) (?:currently )?(?:out of (?:the )?office|away|on (?:annual |parental |sick )?leave|on vacation|on holiday|travelling|traveling)"
+    r"|\bI will be (?:out of (?:the )?office|away|back|returning)"
+    r"|limited access to (?:my )?e-?mail"
+    r"|(?:reply|respond|get back to you) (?:to your (?:message|email) )?(?:when|upon|after) (?:I|my) return"
+    r"|this is an automated (?:reply|response|message)",
+    re.I
+)
+# A short, imperative request standing on its own line (or as the whole
+# subject). Mentions of unsubscribing inside longer sentences are left to a
+# person: suppression can't be undone, so anything ambiguous is a human reply.
+_UNSUBSCRIBE_RE = re.compile(
+    r"^[\W_]*(?:please[\s,]+)?"
+    r"(?:unsubscribe(?: me)?|remove me|take me off"
+    r"|stop (?:e-?mailing|contacting|sending|messaging)(?: me)?"
+    r"|(?:do not|don't|dont) (?:e-?mail|contact|message) me(?: again)?)"
+    r"(?: (?:from |off )?(?:your|the|this) (?:(?:mailing|e-?mail|contact) )?list)?"
+    r"(?:[\s,]+(?:please|thanks|thank you))?[\W_]*$",
+    re.I | re.M
+)
+_REPLY_PREFIX_RE = re.compile(r"^(?:(?:re|aw|fwd?|sv)\s*:\s*)+", re.I)
+# Start of the quoted original in common clients; everything after it is ignored
+_QUOTE_START_RE = re.compile(
+    r"^(?:On .{0,200}wrote:|-----\s*Original Message\s*-----|From:\s.+|_{10,}|Sent from my )",
+    re.I | re.M
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _decoded_text(msg: Message) -> str:
+    """Best-effort plain text of a (possibly truncated) message body"""
+    html = ""
+    for part in msg.walk():
+        content_type = part.get_content_type()
+        if content_type not in ("text/plain", "text/html"):
+            continue
+        try:
+            payload = part.get_payload(decode=True) or b""
+            text = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+        except Exception:
+            continue
+        if content_type == "text/plain":
+            return text
+        html = html or _TAG_RE.sub(" ", text)
+    return html
+
+
+def reply_text(msg: Message) -> str:
+    """The newly written part of a reply, without the quoted original"""
+    text = _decoded_text(msg)
+    match = _QUOTE_START_RE.search(text)
+    if match:
+        text = text[:match.start()]
+    return "\n".join(line for line in text.splitlines() if not line.lstrip().startswith(">"))
+
+
+def classify_reply(msg: Message) -> str:
+    """Classify one reply as HUMAN_REPLY, AUTO_REPLY or UNSUBSCRIBE_REQUEST"""
+    auto_submitted = (msg.get("Auto-Submitted") or "").strip().lower()
+    if auto_submitted and auto_submitted != "no":
+        return AUTO_REPLY
+    if any(msg.get(header) for header in _AUTO_HEADERS):
+        return AUTO_REPLY
+    if (msg.get("Precedence") or "").strip().lower() in _AUTO_PRECEDENCE:
+        return AUTO_REPLY
+
+    subject = msg.get("Subject") or ""
+    if _AUTO_SUBJECT_RE.search(subject):
+        return AUTO_REPLY
+
+    text = reply_text(msg)
+    if _UNSUBSCRIBE_RE.match(_REPLY_PREFIX_RE.sub("", subject).strip()) or _UNSUBSCRIBE_RE.search(text):
+        return UNSUBSCRIBE_REQUEST
+    if _AUTO_BODY_RE.search(text):
+        return AUTO_REPLY
+
+    return HUMAN_REPLY
+
+
+def classify_replies(messages: List[Message]) -> List[str]:
+    """Classify a batch of fetched replies"""
+    return [classify_reply(msg) for msg in messages]
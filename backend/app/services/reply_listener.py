@@ -0,0 +1,346 @@
+"""
+Reply listener service - push-based reply detection with IMAP IDLE.
+
+Run as a standalone process next to the API:
+
+    python -m app.services.reply_listener
+
+Keeps one connection per active sending account, idling in IDLE. When the
+server announces new mail (EXISTS), IDLE is ended and the new messages are
+fetched on the same connection, then recorded like check_replies does.
+"""
+import asyncio
+import email
+import logging
+import random
+import re
+import ssl
+from typing import Dict, List, Optional, Tuple
+from ..config import get_settings
+from ..database import get_redis_db
+from ..metrics import IMAP_POLL_SECONDS, IMAP_POLL_ERRORS
+from .bounce_parser import looks_like_bounce
+from .reply_checker import header_fetch_items, record_fetched, search_criteria
+
+logger = logging.getLogger(__name__)
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}$")
+_UID_RE = re.compile(r"\bUID (\d+)", re.I)
+_CODE_RE = re.compile(r"\[(UIDVALIDITY|UIDNEXT) (\d+)\]", re.I)
+
+
+class IMAPError(Exception):
+    """Raised when the IMAP server rejects a command or drops the connection"""
+
+
+def _quote(value: str) -> str:
+    """Quote a string argument for an IMAP command"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _connection_settings(account: dict) -> Tuple:
+    """What an account's IMAP connection depends on; other edits don't restart it"""
+    return (
+        account.get("imap_host"),
+        account.get("imap_port", 993),
+        account.get("imap_use_ssl", True),
+        account.get("imap_username") or account.get("email_address"),
+        account.get("imap_password_encrypted", ""),
+    )
+
+
+class IdleConnection:
+    """
+    Minimal asyncio IMAP client: just enough of the protocol to log in,
+    examine a mailbox, wait in IDLE and fetch new messages by UID.
+    """
+
+    def __init__(self, host: str, port: int, use_ssl: bool = True, timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self.capabilities: set = set()
+        self.uidvalidity: Optional[int] = None
+        self.uidnext: Optional[int] = None
+        # Set by any untagged EXISTS, including those arriving during a fetch
+        self.new_mail = False
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._tag = 0
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(
+                self.host, self.port,
+                ssl=ssl.create_default_context() if self.use_ssl else None
+            ),
+            timeout=self.timeout
+        )
+        greeting, _ = await self._read_response()
+        if not greeting.startswith("* OK"):
+            raise IMAPError(f"Unexpected greeting: {greeting}")
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._writer = None
+
+    async def _read_response(self, timeout: Optional[float] = None) -> Tuple[str, List[bytes]]:
+        """One response: its text without the literals, and the literals ({n} strings) it carried"""
+        timeout = timeout or self.timeout
+        text = b""
+        literals = []
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), timeout=timeout)
+            if not line:
+                raise IMAPError("Connection closed by server")
+            line = line.rstrip(b"\r\n")
+            match = _LITERAL_RE.search(line)
+            if not match:
+                break
+            text += line[:match.start()]
+            literals.append(await asyncio.wait_for(self._reader.readexactly(int(match.group(1))), timeout=timeout))
+        response = (text + line).decode("utf-8", errors="replace")
+        parts = response.split()
+        if len(parts) >= 3 and parts[0] == "*" and parts[2].upper() == "EXISTS":
+            self.new_mail = True
+        return response, literals
+
+    async def _send(self, line: str):
+        self._writer.write(line.encode() + b"\r\n")
+        await self._writer.drain()
+
+    def _next_tag(self) -> str:
+        self._tag += 1
+        return f"A{self._tag:04d}"
+
+    async def command(self, command: str) -> List[Tuple[str, List[bytes]]]:
+        """Send a command and return its untagged responses, raising on NO/BAD"""
+        tag = self._next_tag()
+        await self._send(f"{tag} {command}")
+        return await self._read_until_tagged(tag)
+
+    async def _read_until_tagged(self, tag: str) -> List[Tuple[str, List[bytes]]]:
+        untagged = []
+        while True:
+            response = await self._read_response()
+            line = response[0]
+            if line.startswith(tag + " "):
+                if line[len(tag) + 1:].upper().startswith("OK"):
+                    return untagged
+                raise IMAPError(line)
+            untagged.append(response)
+
+    async def login(self, username: str, password: str):
+        await self.command(f"LOGIN {_quote(username)} {_quote(password)}")
+        for line, _ in await self.command("CAPABILITY"):
+            if line.upper().startswith("* CAPABILITY"):
+                self.capabilities = set(line.upper().split()[2:])
+
+    async def select(self, mailbox: str = "INBOX"):
+        """EXAMINE a mailbox (read-only), keeping its UIDVALIDITY and UIDNEXT"""
+        for line, _ in await self.command(f"EXAMINE {_quote(mailbox)}"):
+            for code, value in _CODE_RE.findall(line):
+                setattr(self, code.lower(), int(value))
+        # Already-present messages are caught up on separately
+        self.new_mail = False
+
+    async def uid_search(self, *criteria: str) -> List[int]:
+        uids = []
+        for line, _ in await self.command("UID SEARCH " + " ".join(criteria)):
+            if line.upper().startswith("* SEARCH"):
+                uids.extend(int(uid) for uid in line.split()[2:])
+        return uids
+
+    async def uid_fetch(self, uids: List[int], items: str, batch_size: int) -> Dict[int, email.message.Message]:
+        """
+        UID FETCH data items for many messages, batch_size UIDs per command.
+        The literals returned for each message are concatenated and parsed as one message.
+        """
+        messages = {}
+        for start in range(0, len(uids), batch_size):
+            batch = ",".join(str(uid) for uid in uids[start:start + batch_size])
+            for line, literals in await self.command(f"UID FETCH {batch} (UID {items})"):
+                match = _UID_RE.search(line)
+                if " FETCH " in line.upper() and match and literals:
+                    messages[int(match.group(1))] = email.message_from_bytes(b"".join(literals))
+        return messages
+
+    async def idle(self, timeout: float) -> bool:
+        """
+        Wait in IDLE for up to `timeout` seconds in total; untagged keepalives
+        don't extend it. Returns True when the server reported new messages,
+        straight away if one was reported since the last call.
+        """
+        if self.new_mail:
+            self.new_mail = False
+            return True
+
+        tag = self._next_tag()
+        await self._send(f"{tag} IDLE")
+        line, _ = await self._read_response()
+        if not line.startswith("+"):
+            raise IMAPError(f"IDLE rejected: {line}")
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        try:
+            while not self.new_mail:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                await self._read_response(timeout=remaining)
+        except asyncio.TimeoutError:
+            pass
+
+        await self._send("DONE")
+        await self._read_until_tagged(tag)
+        has_new, self.new_mail = self.new_mail, False
+        return has_new
+
+
+class ReplyListener:
+    """
+    Supervises one IDLE task per active sending account, reconnecting with
+    exponential backoff and picking up added, changed or removed accounts.
+    """
+
+    def __init__(self, redis_db):
+        self.redis_db = redis_db
+        self.settings = get_settings()
+        self.tasks: Dict[str, asyncio.Task] = {}
+        # Latest record of each watched account; tasks read it on every sync
+        self.accounts: Dict[str, dict] = {}
+
+    def _active_accounts(self) -> Dict[str, dict]:
+        accounts = self.redis_db.get_all("sending_accounts")
+        return {
+            a["id"]: a for a in accounts
+            if a.get("status") == "active" and a.get("imap_host")
+        }
+
+    async def run(self):
+        """Run until cancelled, refreshing the account list periodically"""
+        try:
+            while True:
+                self._refresh()
+                await asyncio.sleep(self.settings.reply_listener_refresh_seconds)
+        finally:
+            for task in self.tasks.values():
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def _refresh(self):
+        accounts = self._active_accounts()
+
+        # Only a new server or new credentials restart a connection
+        for account_id in list(self.tasks):
+            account = accounts.get(account_id)
+            if (
+                account is None
+                or _connection_settings(account) != _connection_settings(self.accounts[account_id])
+                or self.tasks[account_id].done()
+            ):
+                self.tasks.pop(account_id).cancel()
+                del self.accounts[account_id]
+
+        for account_id, account in accounts.items():
+            self.accounts[account_id] = account
+            if account_id not in self.tasks:
+                self.tasks[account_id] = asyncio.create_task(self.watch_account(account))
+
+        logger.info(f"Reply listener watching {len(self.tasks)} account(s)")
+
+    async def watch_account(self, account: dict):
+        """Keep an IDLE session open for one account, syncing on every new message"""
+        failures = 0
+        while True:
+            conn = IdleConnection(
+                account["imap_host"],
+                account.get("imap_port", 993),
+                use_ssl=account.get("imap_use_ssl", True),
+                timeout=self.settings.imap_timeout_seconds
+            )
+            try:
+                await conn.connect()
+                await conn.login(
+                    account.get("imap_username") or account["email_address"],
+                    account.get("imap_password_encrypted", "")
+                )
+                await conn.select("INBOX")
+
+                # Catch up on anything that arrived while disconnected
+                await self._sync(conn, account["id"])
+                failures = 0
+
+                while True:
+                    if "IDLE" in conn.capabilities:
+                        has_new = await conn.idle(self.settings.imap_idle_timeout_seconds)
+                    else:
+                        await asyncio.sleep(self.settings.imap_poll_fallback_seconds)
+                        await conn.command("NOOP")
+                        has_new, conn.new_mail = conn.new_mail, False
+                    if has_new:
+                        await self._sync(conn, account["id"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                IMAP_POLL_ERRORS.inc(account["id"])
+                failures += 1
+                delay = min(
+                    self.settings.imap_reconnect_max_backoff_seconds,
+                    2 ** min(failures, 10)
+                ) * random.uniform(0.5, 1.0)
+                logger.warning(
+                    f"IMAP listener for {account.get('email_address')} failed ({e!r}); "
+                    f"reconnecting in {delay:.0f}s"
+                )
+                await asyncio.sleep(delay)
+            finally:
+                await conn.close()
+
+    async def _sync(self, conn: IdleConnection, account_id: str):
+        """Fetch and record the messages after the stored sync state, on the IDLE connection"""
+        account = self.accounts.get(account_id) or {"id": account_id}
+        batch_size = self.settings.imap_fetch_batch_size
+
+        with IMAP_POLL_SECONDS.time(account_id):
+            last_uid, criteria = search_criteria(
+                self.redis_db.get_imap_sync_state(account_id), conn.uidvalidity
+            )
+            # "n:*" always matches the newest message, even when its UID is below n
+            uids = sorted(uid for uid in await conn.uid_search(*criteria) if uid > last_uid)
+
+            headers = await conn.uid_fetch(uids, header_fetch_items(), batch_size)
+            bounce_uids = [uid for uid, msg in headers.items() if looks_like_bounce(msg)]
+            if bounce_uids:
+                headers.update(await conn.uid_fetch(bounce_uids, "BODY.PEEK[]", batch_size))
+
+        # UIDNEXT is only known as of EXAMINE; later syncs go by the UIDs they saw
+        floor = (conn.uidnext or 1) - 1 if last_uid == 0 else 0
+        sync_state = {"uidvalidity": conn.uidvalidity, "last_uid": max([last_uid, floor, *uids])}
+
+        messages = [headers[uid] for uid in sorted(headers)]
+        for result in record_fetched(self.redis_db, account, messages, sync_state):
+            logger.info(f"Reply detected for lead {result.get('lead_id')} via {account.get('email_address')}")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    listener = ReplyListener(get_redis_db())
+    try:
+        asyncio.run(listener.run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
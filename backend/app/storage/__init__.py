@@ -0,0 +1,7 @@
+"""
+Storage engines for RedisDB
+"""
+from .base import StorageEngine, StorageBatch, StorageTransaction
+from .redis_engine import RedisEngine
+from .memory import MemoryEngine
+from .archive import SQLiteArchive
@@ -0,0 +1,136 @@
+"""
+Cold tier for records moved out of the storage engine.
+
+High-volume entities (email events) are kept in the engine only for a
+retention window; older records are moved here by
+app.services.event_retention. The archive is a SQLite file on local disk with
+one table per entity: the record's field-index columns (INDEXED_FIELDS) for
+lookups plus the record itself, zlib-compressed. RedisDB consults it for
+reads of archived entities, so queries span both tiers.
+
+Every process on a node opens the same file (WAL mode allows concurrent
+readers with one writer); deployments across several nodes need the file on
+shared storage, or leave archiving off.
+"""
+import sqlite3
+import threading
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# Rows fetched per query when iterating
+_FETCH_SIZE = 1000
+
+# (entity, record) -> bytes and back; RedisDB passes its compact record encoding
+Encoder = Callable[[str, Dict[str, Any]], bytes]
+Decoder = Callable[[str, bytes], Dict[str, Any]]
+
+
+class SQLiteArchive:
+    """Archived records of a few entities, indexed by their fields"""
+
+    def __init__(self, path: str, indexed_fields: Dict[str, Sequence[str]], encode: Encoder, decode: Decoder):
+        self.path = path
+        self.indexed_fields = {entity: tuple(fields) for entity, fields in indexed_fields.items()}
+        self._encode = encode
+        self._decode = decode
+        self._local = threading.local()
+        self._create_tables()
+
+    def archives(self, entity: str) -> bool:
+        return entity in self.indexed_fields
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread; routes run on the loop and in the threadpool
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _create_tables(self):
+        with self._db as db:
+            for entity, fields in self.indexed_fields.items():
+                columns = "".join(f", {field} TEXT" for field in fields)
+                db.execute(f"CREATE TABLE IF NOT EXISTS {entity} (id TEXT PRIMARY KEY{columns}, data BLOB NOT NULL)")
+                for field in fields:
+                    db.execute(f"CREATE INDEX IF NOT EXISTS {entity}_{field} ON {entity} ({field})")
+
+    def _field(self, entity: str, field: str) -> str:
+        if field not in self.indexed_fields[entity]:
+            raise ValueError(f"{entity}.{field} is not indexed in the archive")
+        return field
+
+    def _records(self, entity: str, cursor: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        return [self._decode(entity, zlib.decompress(row[0])) for row in cursor]
+
+    def put_many(self, entity: str, records: List[Dict[str, Any]]):
+        """Store records (replacing any archived copy with the same ID) in one transaction"""
+        fields = self.indexed_fields[entity]
+        placeholders = ", ".join("?" * (len(fields) + 2))
+        rows = [
+            (record["id"], *(record.get(field) for field in fields), zlib.compress(self._encode(entity, record)))
+            for record in records
+        ]
+        with self._db as db:
+            db.executemany(
+                f"INSERT OR REPLACE INTO {entity} (id, {', '.join(fields)}, data) VALUES ({placeholders})"
+                if fields else f"INSERT OR REPLACE INTO {entity} (id, data) VALUES ({placeholders})",
+                rows
+            )
+
+    def get_many(self, entity: str, entity_ids: List[str]) -> List[Dict[str, Any]]:
+        results = []
+        for start in range(0, len(entity_ids), _FETCH_SIZE):
+            chunk = entity_ids[start:start + _FETCH_SIZE]
+            cursor = self._db.execute(
+                f"SELECT data FROM {entity} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            results.extend(self._records(entity, cursor))
+        return results
+
+    def find(self, entity: str, field: str, value: str) -> List[Dict[str, Any]]:
+        """Archived records whose field equals value"""
+        return [record for batch in self.iter_batches(entity, field, value) for record in batch]
+
+    def find_many(self, entity: str, field: str, values: List[str]) -> List[Dict[str, Any]]:
+        """Archived records whose field is one of values"""
+        column = self._field(entity, field)
+        results = []
+        for start in range(0, len(values), _FETCH_SIZE):
+            chunk = values[start:start + _FETCH_SIZE]
+            cursor = self._db.execute(
+                f"SELECT data FROM {entity} WHERE {column} IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            results.extend(self._records(entity, cursor))
+        return results
+
+    def iter_batches(
+        self,
+        entity: str,
+        field: Optional[str] = None,
+        value: Optional[str] = None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield archived records (all, or those with field=value) in batches, paging by ID"""
+        where, params = "", []
+        if field:
+            where, params = f"{self._field(entity, field)} = ? AND ", [value]
+        last_id = ""
+        while True:
+            rows = self._db.execute(
+                f"SELECT id, data FROM {entity} WHERE {where}id > ? ORDER BY id LIMIT {_FETCH_SIZE}",
+                [*params, last_id]
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [self._decode(entity, zlib.decompress(data)) for _, data in rows]
+
+    def delete_where(self, entity: str, field: str, value: str) -> int:
+        """Remove archived records whose field equals value; returns how many"""
+        with self._db as db:
+            return db.execute(f"DELETE FROM {entity} WHERE {self._field(entity, field)} = ?", [value]).rowcount
+
+    def count(self, entity: str) -> int:
+        return self._db.execute(f"SELECT COUNT(*) FROM {entity}").fetchone()[0]
@@ -0,0 +1,250 @@
+"""
+Storage engine interface.
+
+RedisDB keeps records and their indexes in a handful of data structures:
+string values (JSON records, counters), sets (ID indexes, suppression lists),
+hashes (email lookups, sync state), lists (link tables), sorted sets
+(finished jobs by time) and streams (the event log), plus pub/sub channels
+for cache invalidation. A StorageEngine provides exactly those operations,
+so RedisDB can run on Redis or on an in-process engine.
+
+Commands available on the engine run immediately. The same commands on a
+batch are queued and run together by execute(), which returns their results
+in order - one round trip on Redis, one lock acquisition in memory.
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+
+class StorageCommands(ABC):
+    """Operations available both immediately and inside a batch"""
+
+    # Values and counters
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Value stored at key"""
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Values for several keys, None where missing"""
+
+    @abstractmethod
+    def set(self, key: str, value: str):
+        """Store a value"""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> int:
+        """Remove keys of any type; returns how many existed"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1) -> int:
+        """Increment an integer counter, starting from 0"""
+
+    # Sets
+
+    @abstractmethod
+    def members(self, key: str) -> Set[str]:
+        """All members of a set"""
+
+    @abstractmethod
+    def is_member(self, key: str, member: str) -> bool:
+        """Whether member is in the set"""
+
+    @abstractmethod
+    def are_members(self, key: str, members: List[str]) -> List[bool]:
+        """Membership of several values at once"""
+
+    @abstractmethod
+    def count_members(self, key: str) -> int:
+        """Size of a set"""
+
+    @abstractmethod
+    def add_members(self, key: str, *members: str) -> int:
+        """Add members to a set; returns how many were new"""
+
+    @abstractmethod
+    def remove_members(self, key: str, *members: str) -> int:
+        """Remove members from a set; returns how many were present"""
+
+    # Hashes
+
+    @abstractmethod
+    def hash_get_many(self, key: str, fields: List[str]) -> List[Optional[str]]:
+        """Values of several hash fields, None where missing"""
+
+    @abstractmethod
+    def hash_get_all(self, key: str) -> Dict[str, str]:
+        """Every field of a hash"""
+
+    @abstractmethod
+    def hash_set(self, key: str, mapping: Dict[str, Any]) -> int:
+        """Set hash fields; returns how many were new"""
+
+    @abstractmethod
+    def hash_delete(self, key: str, *fields: str) -> int:
+        """Remove hash fields; returns how many were present"""
+
+    @abstractmethod
+    def hash_incr(self, key: str, field: str, amount: int = 1) -> int:
+        """Increment an integer hash field"""
+
+    @abstractmethod
+    def hash_decr_remove(self, key: str, field: str) -> int:
+        """Decrement an integer hash field, removing it once it reaches zero"""
+
+    # Lists
+
+    @abstractmethod
+    def list_get(self, key: str, index: int) -> Optional[str]:
+        """Element of a list by position"""
+
+    # Sorted sets
+
+    @abstractmethod
+    def sorted_add(self, key: str, mapping: Dict[str, float]) -> int:
+        """Add or re-score members of a sorted set; returns how many were new"""
+
+    @abstractmethod
+    def sorted_remove(self, key: str, *members: str) -> int:
+        """Remove members from a sorted set"""
+
+    @abstractmethod
+    def sorted_range_by_score(
+        self,
+        key: str,
+        min_score: float = float("-inf"),
+        max_score: float = float("inf"),
+        offset: int = 0,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        with_scores: bool = False
+    ) -> List[Union[str, Tuple[str, float]]]:
+        """A page of the members scored within [min_score, max_score]"""
+
+    # Streams
+
+    @abstractmethod
+    def stream_add(self, key: str, fields: Dict[str, str], max_length: Optional[int] = None) -> str:
+        """Append an entry and return its ID, trimming to about max_length entries"""
+
+    @abstractmethod
+    def stream_ack(self, key: str, group: str, *entry_ids: str) -> int:
+        """Acknowledge entries delivered to a consumer group; returns how many were pending"""
+
+    @abstractmethod
+    def stream_length(self, key: str) -> int:
+        """Number of entries in a stream"""
+
+    # Pub/sub
+
+    @abstractmethod
+    def publish(self, channel: str, message: str) -> int:
+        """Send a message to the channel's subscribers; returns how many received it"""
+
+
+class StorageBatch(StorageCommands):
+    """Commands queued until execute()"""
+
+    @abstractmethod
+    def execute(self) -> List[Any]:
+        """Run the queued commands and return their results in order"""
+
+
+class StorageTransaction(StorageCommands):
+    """
+    Optimistic transaction passed to StorageEngine.transaction().
+    Commands run immediately until multi(); after it they are queued and
+    applied atomically when the callable returns, unless a watched key was
+    changed in the meantime, in which case the callable is run again.
+    """
+
+    @abstractmethod
+    def watch(self, *keys: str):
+        """Also retry if these keys change before the commit"""
+
+    @abstractmethod
+    def multi(self):
+        """Start queueing the writes to commit"""
+
+
+class StorageEngine(StorageCommands):
+    """A storage backend for RedisDB"""
+
+    @abstractmethod
+    def batch(self) -> StorageBatch:
+        """Start a batch of commands"""
+
+    @abstractmethod
+    def transaction(self, func: Callable[[StorageTransaction], Any], *watch_keys: str) -> Any:
+        """Run func(transaction) until it commits; returns what func returned"""
+
+    @abstractmethod
+    def subscribe(
+        self,
+        channel: str,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> Callable[[], None]:
+        """
+        Call on_message(message) for every message published to channel, possibly
+        from another thread. on_connect runs each time the subscription is
+        (re)established, since messages sent while disconnected are lost.
+        Returns a function that ends the subscription.
+        """
+
+    @abstractmethod
+    def stream_create_group(self, key: str, group: str, start_id: str = "0") -> bool:
+        """
+        Create a consumer group on a stream (creating the stream if needed),
+        delivering entries after start_id: "0" for all, "$" for new ones only.
+        Returns False if the group already exists.
+        """
+
+    @abstractmethod
+    def stream_set_group_position(self, key: str, group: str, entry_id: str):
+        """Move a group's position so entries after entry_id are delivered (again)"""
+
+    @abstractmethod
+    def stream_read_group(
+        self,
+        group: str,
+        consumer: str,
+        keys: List[str],
+        count: int = 100,
+        block_ms: Optional[int] = None,
+        pending: bool = False
+    ) -> List[Tuple[str, List[Tuple[str, Dict[str, str]]]]]:
+        """
+        Read entries for one consumer of a group from several streams: up to
+        count new entries per stream, waiting up to block_ms for any to arrive,
+        or with pending=True those delivered to this consumer but not yet
+        acknowledged. Returns [(key, [(entry ID, fields)])] for non-empty streams.
+        """
+
+    @abstractmethod
+    def stream_groups(self, key: str) -> Dict[str, Dict[str, Optional[int]]]:
+        """
+        Progress of every consumer group on a stream: group -> {"pending":
+        delivered but not acknowledged, "lag": not delivered yet, or None when
+        the server cannot tell without reading the stream}.
+        """
+
+    @abstractmethod
+    def scan_members(self, key: str, count: int = 1000) -> Iterator[str]:
+        """Iterate a set's members incrementally (about count per round trip)"""
+
+    @abstractmethod
+    def append_unique(self, list_key: str, index_key: str, values: List[str]) -> List[int]:
+        """
+        Atomically return each value's position in an append-only list,
+        appending values not seen before (index_key maps value -> position).
+        """
+
+    @abstractmethod
+    def size(self) -> int:
+        """Number of keys stored"""
+
+    @abstractmethod
+    def flush(self):
+        """Remove every key"""
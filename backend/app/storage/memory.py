@@ -0,0 +1,563 @@
+"""
+In-process storage engine.
+
+Keeps every key in a dict: strings, Python sets, dicts, lists, a sorted
+set built from a score map plus a bisect-ordered list, and streams with
+consumer groups. A single lock makes each command, batch and transaction
+atomic, so results match Redis for the operations RedisDB uses. Data lives
+only in this process and is lost on exit; use it for tests, benchmarks and
+single-process deployments.
+"""
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .base import StorageBatch, StorageCommands, StorageEngine, StorageTransaction
+
+# Plain values (records, counters) may be text or encoded bytes
+_VALUE = (str, bytes)
+
+
+class SortedSet:
+    """Members ordered by (score, member), like a Redis ZSET"""
+
+    __slots__ = ("scores", "order")
+
+    def __init__(self):
+        self.scores: Dict[str, float] = {}
+        self.order: List[Tuple[float, str]] = []
+
+    def __len__(self):
+        return len(self.scores)
+
+    def add(self, member: str, score: float) -> bool:
+        old = self.scores.get(member)
+        if old is not None:
+            if old == score:
+                return False
+            del self.order[bisect.bisect_left(self.order, (old, member))]
+        self.scores[member] = score
+        bisect.insort(self.order, (score, member))
+        return old is None
+
+    def remove(self, member: str) -> bool:
+        score = self.scores.pop(member, None)
+        if score is None:
+            return False
+        del self.order[bisect.bisect_left(self.order, (score, member))]
+        return True
+
+    def score_bounds(self, min_score: float, max_score: float) -> Tuple[int, int]:
+        """Positions [start, stop) of the members scored within [min_score, max_score]"""
+        start = bisect.bisect_left(self.order, (min_score,))
+        stop = bisect.bisect_left(self.order, (max_score, chr(0x10FFFF)))
+        while stop < len(self.order) and self.order[stop][0] <= max_score:
+            stop += 1
+        return start, stop
+
+
+StreamID = Tuple[int, int]
+
+
+def _parse_stream_id(entry_id: str) -> StreamID:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def _format_stream_id(entry_id: StreamID) -> str:
+    return f"{entry_id[0]}-{entry_id[1]}"
+
+
+class StreamGroup:
+    """A consumer group: its position and the entries delivered but not acknowledged"""
+
+    __slots__ = ("position", "pending")
+
+    def __init__(self, position: StreamID):
+        self.position = position
+        # entry ID -> consumer it was delivered to, in delivery order
+        self.pending: Dict[StreamID, str] = {}
+
+
+class Stream:
+    """Entries ordered by ID ("milliseconds-sequence"), like a Redis stream"""
+
+    __slots__ = ("ids", "entries", "last_id", "groups")
+
+    def __init__(self):
+        self.ids: List[StreamID] = []
+        self.entries: Dict[StreamID, Dict[str, str]] = {}
+        self.last_id: StreamID = (0, 0)
+        self.groups: Dict[str, StreamGroup] = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, fields: Dict[str, str], max_length: Optional[int]) -> StreamID:
+        ms = int(time.time() * 1000)
+        entry_id = (ms, 0) if ms > self.last_id[0] else (self.last_id[0], self.last_id[1] + 1)
+        self.ids.append(entry_id)
+        self.entries[entry_id] = {
+            field: value if isinstance(value, _VALUE) else str(value) for field, value in fields.items()
+        }
+        self.last_id = entry_id
+        if max_length is not None and len(self.ids) > max_length:
+            for trimmed in self.ids[:len(self.ids) - max_length]:
+                del self.entries[trimmed]
+            del self.ids[:len(self.ids) - max_length]
+        return entry_id
+
+    def after(self, position: StreamID) -> int:
+        """Index of the first entry after position"""
+        return bisect.bisect_right(self.ids, position)
+
+
+def _page(entries: List[Tuple[float, str]], offset: int, limit: Optional[int], reverse: bool, with_scores: bool):
+    if reverse:
+        entries = entries[::-1]
+    entries = entries[offset:] if limit is None else entries[offset:offset + limit]
+    if with_scores:
+        return [(member, score) for score, member in entries]
+    return [member for _, member in entries]
+
+
+class _MemoryCommands(StorageCommands):
+    """
+    Every command is funnelled through _call(name, *args): the engine runs it
+    under the lock, a batch queues it.
+    """
+
+    def __init__(self, engine: "MemoryEngine"):
+        self._engine = engine
+
+    def _call(self, name: str, *args):
+        raise NotImplementedError
+
+    def get(self, key):
+        return self._call("get", key)
+
+    def get_many(self, keys):
+        return self._call("get_many", list(keys))
+
+    def set(self, key, value):
+        return self._call("set", key, value)
+
+    def delete(self, *keys):
+        return self._call("delete", *keys)
+
+    def incr(self, key, amount=1):
+        return self._call("incr", key, amount)
+
+    def members(self, key):
+        return self._call("members", key)
+
+    def is_member(self, key, member):
+        return self._call("is_member", key, member)
+
+    def are_members(self, key, members):
+        return self._call("are_members", key, list(members))
+
+    def count_members(self, key):
+        return self._call("count_members", key)
+
+    def add_members(self, key, *members):
+        return self._call("add_members", key, *members)
+
+    def remove_members(self, key, *members):
+        return self._call("remove_members", key, *members)
+
+    def hash_get_many(self, key, fields):
+        return self._call("hash_get_many", key, list(fields))
+
+    def hash_get_all(self, key):
+        return self._call("hash_get_all", key)
+
+    def hash_set(self, key, mapping):
+        return self._call("hash_set", key, dict(mapping))
+
+    def hash_delete(self, key, *fields):
+        return self._call("hash_delete", key, *fields)
+
+    def hash_incr(self, key, field, amount=1):
+        return self._call("hash_incr", key, field, amount)
+
+    def hash_decr_remove(self, key, field):
+        return self._call("hash_decr_remove", key, field)
+
+    def list_get(self, key, index):
+        return self._call("list_get", key, index)
+
+    def sorted_add(self, key, mapping):
+        return self._call("sorted_add", key, dict(mapping))
+
+    def sorted_remove(self, key, *members):
+        return self._call("sorted_remove", key, *members)
+
+    def sorted_range_by_score(self, key, min_score=float("-inf"), max_score=float("inf"),
+                              offset=0, limit=None, reverse=False, with_scores=False):
+        return self._call("sorted_range_by_score", key, min_score, max_score, offset, limit, reverse, with_scores)
+
+    def stream_add(self, key, fields, max_length=None):
+        return self._call("stream_add", key, dict(fields), max_length)
+
+    def stream_ack(self, key, group, *entry_ids):
+        return self._call("stream_ack", key, group, *entry_ids)
+
+    def stream_length(self, key):
+        return self._call("stream_length", key)
+
+    def publish(self, channel, message):
+        return self._call("publish", channel, message)
+
+
+class MemoryBatch(_MemoryCommands, StorageBatch):
+    def __init__(self, engine: "MemoryEngine"):
+        super().__init__(engine)
+        self._queue: List[tuple] = []
+
+    def _call(self, name, *args):
+        self._queue.append((name, args))
+        return self
+
+    def execute(self) -> List[Any]:
+        queue, self._queue = self._queue, []
+        with self._engine._lock:
+            return [self._engine._apply(name, args) for name, args in queue]
+
+
+class MemoryTransaction(_MemoryCommands, StorageTransaction):
+    """Runs with the engine lock held, so watched keys cannot change underneath it"""
+
+    def __init__(self, engine: "MemoryEngine"):
+        super().__init__(engine)
+        self._queue: Optional[List[tuple]] = None
+
+    def _call(self, name, *args):
+        if self._queue is None:
+            return self._engine._apply(name, args)
+        self._queue.append((name, args))
+        return self
+
+    def watch(self, *keys):
+        pass
+
+    def multi(self):
+        self._queue = []
+
+    def commit(self):
+        for name, args in self._queue or ():
+            self._engine._apply(name, args)
+
+
+class MemoryEngine(_MemoryCommands, StorageEngine):
+    """StorageEngine keeping all data in this process"""
+
+    def __init__(self):
+        super().__init__(self)
+        self._data: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        # Notified (with the lock held) whenever an entry is added to a stream
+        self._stream_added = threading.Condition(self._lock)
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+
+    def _call(self, name, *args):
+        with self._lock:
+            return self._apply(name, args)
+
+    def _apply(self, name: str, args: tuple):
+        return getattr(self, f"_op_{name}")(*args)
+
+    def _typed(self, key: str, kind, create: bool = False):
+        value = self._data.get(key)
+        if value is None:
+            if not create:
+                return None
+            value = self._data[key] = kind()
+        elif not isinstance(value, kind):
+            raise TypeError(f"{key} holds a {type(value).__name__} value")
+        return value
+
+    def _drop_if_empty(self, key: str):
+        if not self._data.get(key, True):
+            del self._data[key]
+
+    # Values and counters
+
+    def _op_get(self, key):
+        return self._typed(key, _VALUE)
+
+    def _op_get_many(self, keys):
+        return [self._op_get(key) for key in keys]
+
+    def _op_set(self, key, value):
+        self._data[key] = value
+        return True
+
+    def _op_delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    def _op_incr(self, key, amount):
+        value = int(self._typed(key, _VALUE) or 0) + amount
+        self._data[key] = str(value)
+        return value
+
+    # Sets
+
+    def _op_members(self, key):
+        return set(self._typed(key, set) or ())
+
+    def _op_is_member(self, key, member):
+        return member in (self._typed(key, set) or ())
+
+    def _op_are_members(self, key, members):
+        values = self._typed(key, set) or ()
+        return [member in values for member in members]
+
+    def _op_count_members(self, key):
+        return len(self._typed(key, set) or ())
+
+    def _op_add_members(self, key, *members):
+        values = self._typed(key, set, create=True)
+        before = len(values)
+        values.update(members)
+        return len(values) - before
+
+    def _op_remove_members(self, key, *members):
+        values = self._typed(key, set)
+        if not values:
+            return 0
+        before = len(values)
+        values.difference_update(members)
+        self._drop_if_empty(key)
+        return before - len(values)
+
+    # Hashes
+
+    def _op_hash_get_many(self, key, fields):
+        values = self._typed(key, dict) or {}
+        return [values.get(field) for field in fields]
+
+    def _op_hash_get_all(self, key):
+        return dict(self._typed(key, dict) or {})
+
+    def _op_hash_set(self, key, mapping):
+        values = self._typed(key, dict, create=True)
+        added = sum(field not in values for field in mapping)
+        values.update({field: str(value) for field, value in mapping.items()})
+        return added
+
+    def _op_hash_delete(self, key, *fields):
+        values = self._typed(key, dict)
+        if not values:
+            return 0
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        self._drop_if_empty(key)
+        return removed
+
+    def _op_hash_incr(self, key, field, amount):
+        values = self._typed(key, dict, create=True)
+        value = int(values.get(field, 0)) + amount
+        values[field] = str(value)
+        return value
+
+    def _op_hash_decr_remove(self, key, field):
+        value = self._op_hash_incr(key, field, -1)
+        if value <= 0:
+            self._op_hash_delete(key, field)
+        return value
+
+    # Lists
+
+    def _op_list_get(self, key, index):
+        values = self._typed(key, list) or []
+        try:
+            return values[index]
+        except IndexError:
+            return None
+
+    # Sorted sets
+
+    def _op_sorted_add(self, key, mapping):
+        zset = self._typed(key, SortedSet, create=True)
+        return sum(zset.add(member, float(score)) for member, score in mapping.items())
+
+    def _op_sorted_remove(self, key, *members):
+        zset = self._typed(key, SortedSet)
+        if not zset:
+            return 0
+        removed = sum(zset.remove(member) for member in members)
+        self._drop_if_empty(key)
+        return removed
+
+    def _op_sorted_range_by_score(self, key, min_score, max_score, offset, limit, reverse, with_scores):
+        zset = self._typed(key, SortedSet)
+        if not zset:
+            return []
+        start, stop = zset.score_bounds(float(min_score), float(max_score))
+        return _page(zset.order[start:stop], offset, limit, reverse, with_scores)
+
+    # Streams
+
+    def _op_stream_add(self, key, fields, max_length):
+        entry_id = self._typed(key, Stream, create=True).add(fields, max_length)
+        self._stream_added.notify_all()
+        return _format_stream_id(entry_id)
+
+    def _op_stream_ack(self, key, group, *entry_ids):
+        stream = self._typed(key, Stream)
+        consumer_group = stream.groups.get(group) if stream else None
+        if consumer_group is None:
+            return 0
+        return sum(
+            consumer_group.pending.pop(_parse_stream_id(entry_id), None) is not None
+            for entry_id in entry_ids
+        )
+
+    def _op_stream_length(self, key):
+        return len(self._typed(key, Stream) or ())
+
+    def _group(self, key: str, group: str) -> StreamGroup:
+        stream = self._typed(key, Stream)
+        if stream is None or group not in stream.groups:
+            raise KeyError(f"No consumer group {group} on {key}")
+        return stream.groups[group]
+
+    def _read_group(self, group, consumer, keys, count, pending):
+        result = []
+        for key in keys:
+            stream = self._typed(key, Stream)
+            consumer_group = self._group(key, group)
+            if pending:
+                entries = []
+                for entry_id, owner in list(consumer_group.pending.items()):
+                    if owner != consumer:
+                        continue
+                    if entry_id not in stream.entries:
+                        # Trimmed before it was acknowledged; nothing left to deliver
+                        del consumer_group.pending[entry_id]
+                        continue
+                    entries.append(entry_id)
+                    if len(entries) >= count:
+                        break
+            else:
+                start = stream.after(consumer_group.position)
+                entries = stream.ids[start:start + count]
+                for entry_id in entries:
+                    consumer_group.pending[entry_id] = consumer
+                if entries:
+                    consumer_group.position = entries[-1]
+            if entries:
+                result.append((key, [(_format_stream_id(i), dict(stream.entries[i])) for i in entries]))
+        return result
+
+    # Pub/sub (subscribers run synchronously, in the publishing thread)
+
+    def _op_publish(self, channel, message):
+        subscribers = list(self._subscribers.get(channel, ()))
+        for on_message in subscribers:
+            on_message(message)
+        return len(subscribers)
+
+    # Engine operations
+
+    def batch(self) -> MemoryBatch:
+        return MemoryBatch(self)
+
+    def transaction(self, func: Callable[[StorageTransaction], Any], *watch_keys: str) -> Any:
+        with self._lock:
+            transaction = MemoryTransaction(self)
+            result = func(transaction)
+            transaction.commit()
+            return result
+
+    def subscribe(
+        self,
+        channel: str,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> Callable[[], None]:
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(on_message)
+        if on_connect:
+            on_connect()
+
+        def unsubscribe():
+            with self._lock:
+                subscribers = self._subscribers.get(channel, [])
+                if on_message in subscribers:
+                    subscribers.remove(on_message)
+
+        return unsubscribe
+
+    def stream_create_group(self, key: str, group: str, start_id: str = "0") -> bool:
+        with self._lock:
+            stream = self._typed(key, Stream, create=True)
+            if group in stream.groups:
+                return False
+            position = stream.last_id if start_id == "$" else _parse_stream_id(start_id)
+            stream.groups[group] = StreamGroup(position)
+            return True
+
+    def stream_set_group_position(self, key: str, group: str, entry_id: str):
+        with self._lock:
+            stream = self._typed(key, Stream)
+            self._group(key, group).position = stream.last_id if entry_id == "$" else _parse_stream_id(entry_id)
+
+    def stream_read_group(
+        self,
+        group: str,
+        consumer: str,
+        keys: List[str],
+        count: int = 100,
+        block_ms: Optional[int] = None,
+        pending: bool = False
+    ) -> List[Tuple[str, List[Tuple[str, Dict[str, str]]]]]:
+        # block_ms=0 waits indefinitely, as with XREADGROUP BLOCK 0
+        deadline = None if not block_ms else time.monotonic() + block_ms / 1000
+        with self._stream_added:
+            while True:
+                result = self._read_group(group, consumer, keys, count, pending)
+                if result or pending or block_ms is None:
+                    return result
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    return []
+                self._stream_added.wait(timeout)
+
+    def stream_groups(self, key: str) -> Dict[str, Dict[str, Optional[int]]]:
+        with self._lock:
+            stream = self._typed(key, Stream)
+            if stream is None:
+                return {}
+            return {
+                name: {"pending": len(group.pending), "lag": len(stream) - stream.after(group.position)}
+                for name, group in stream.groups.items()
+            }
+
+    def scan_members(self, key: str, count: int = 1000) -> Iterator[str]:
+        # Iterates a snapshot; members added meanwhile may be missed, as with SSCAN
+        with self._lock:
+            snapshot = list(self._typed(key, set) or ())
+        return iter(snapshot)
+
+    def append_unique(self, list_key: str, index_key: str, values: List[str]) -> List[int]:
+        with self._lock:
+            links = self._typed(list_key, list, create=True)
+            positions = self._typed(index_key, dict, create=True)
+            result = []
+            for value in values:
+                if value not in positions:
+                    links.append(value)
+                    positions[value] = str(len(links) - 1)
+                result.append(int(positions[value]))
+            self._drop_if_empty(list_key)
+            self._drop_if_empty(index_key)
+            return result
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def flush(self):
+        with self._lock:
+            self._data.clear()
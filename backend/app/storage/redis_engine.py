@@ -0,0 +1,247 @@
+"""
+Redis storage engine.
+
+Each StorageEngine command maps to one Redis command; batches are
+non-transactional pipelines and transactions use WATCH/MULTI/EXEC.
+Subscriptions each hold one pub/sub connection in a daemon thread that
+reconnects with backoff. Streams map to XADD/XREADGROUP/XACK.
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import redis
+from .base import StorageBatch, StorageCommands, StorageEngine, StorageTransaction
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between attempts to re-establish a lost subscription
+_SUBSCRIBE_MAX_BACKOFF = 30.0
+
+# Decrement a hash counter, removing the field once it reaches zero
+_HDECR_SCRIPT = """
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if n <= 0 then redis.call('HDEL', KEYS[1], ARGV[1]) end
+return n
+"""
+
+# Append-only link table: return each URL's index, adding unseen URLs
+_LINK_INDEX_SCRIPT = """
+local result = {}
+for i, url in ipairs(ARGV) do
+    local idx = redis.call('HGET', KEYS[2], url)
+    if not idx then
+        idx = redis.call('RPUSH', KEYS[1], url) - 1
+        redis.call('HSET', KEYS[2], url, idx)
+    end
+    result[i] = tonumber(idx)
+end
+return result
+"""
+
+
+class _RedisCommands(StorageCommands):
+    """Commands sent on a client (run immediately) or a pipeline (queued)"""
+
+    def __init__(self, conn, engine: "RedisEngine"):
+        self._conn = conn
+        self._engine = engine
+
+    def get(self, key):
+        return self._conn.get(key)
+
+    def get_many(self, keys):
+        return self._conn.mget(keys)
+
+    def set(self, key, value):
+        return self._conn.set(key, value)
+
+    def delete(self, *keys):
+        # UNLINK frees large values in the background
+        return self._conn.unlink(*keys)
+
+    def incr(self, key, amount=1):
+        return self._conn.incrby(key, amount)
+
+    def members(self, key):
+        return self._conn.smembers(key)
+
+    def is_member(self, key, member):
+        return self._conn.sismember(key, member)
+
+    def are_members(self, key, members):
+        return self._conn.smismember(key, members)
+
+    def count_members(self, key):
+        return self._conn.scard(key)
+
+    def add_members(self, key, *members):
+        return self._conn.sadd(key, *members)
+
+    def remove_members(self, key, *members):
+        return self._conn.srem(key, *members)
+
+    def hash_get_many(self, key, fields):
+        return self._conn.hmget(key, fields)
+
+    def hash_get_all(self, key):
+        return self._conn.hgetall(key)
+
+    def hash_set(self, key, mapping):
+        return self._conn.hset(key, mapping=mapping)
+
+    def hash_delete(self, key, *fields):
+        return self._conn.hdel(key, *fields)
+
+    def hash_incr(self, key, field, amount=1):
+        return self._conn.hincrby(key, field, amount)
+
+    def hash_decr_remove(self, key, field):
+        return self._engine._hdecr(keys=[key], args=[field], client=self._conn)
+
+    def list_get(self, key, index):
+        return self._conn.lindex(key, index)
+
+    def sorted_add(self, key, mapping):
+        return self._conn.zadd(key, mapping)
+
+    def sorted_remove(self, key, *members):
+        return self._conn.zrem(key, *members)
+
+    def sorted_range_by_score(self, key, min_score=float("-inf"), max_score=float("inf"),
+                              offset=0, limit=None, reverse=False, with_scores=False):
+        page = {"start": offset, "num": -1 if limit is None else limit}
+        if reverse:
+            return self._conn.zrevrangebyscore(key, max_score, min_score, withscores=with_scores, **page)
+        return self._conn.zrangebyscore(key, min_score, max_score, withscores=with_scores, **page)
+
+    def stream_add(self, key, fields, max_length=None):
+        return self._conn.xadd(key, fields, maxlen=max_length, approximate=True)
+
+    def stream_ack(self, key, group, *entry_ids):
+        return self._conn.xack(key, group, *entry_ids)
+
+    def stream_length(self, key):
+        return self._conn.xlen(key)
+
+    def publish(self, channel, message):
+        return self._conn.publish(channel, message)
+
+
+class RedisBatch(_RedisCommands, StorageBatch):
+    def execute(self) -> List[Any]:
+        return self._conn.execute()
+
+
+class RedisTransaction(_RedisCommands, StorageTransaction):
+    def watch(self, *keys):
+        self._conn.watch(*keys)
+
+    def multi(self):
+        self._conn.multi()
+
+
+class RedisEngine(_RedisCommands, StorageEngine):
+    """StorageEngine backed by a redis-py client (decode_responses=True)"""
+
+    def __init__(self, client: redis.Redis):
+        super().__init__(client, self)
+        self.client = client
+        self._hdecr = client.register_script(_HDECR_SCRIPT)
+        self._link_index = client.register_script(_LINK_INDEX_SCRIPT)
+
+    def batch(self) -> RedisBatch:
+        return RedisBatch(self.client.pipeline(transaction=False), self)
+
+    def transaction(self, func: Callable[[StorageTransaction], Any], *watch_keys: str) -> Any:
+        return self.client.transaction(
+            lambda pipe: func(RedisTransaction(pipe, self)), *watch_keys, value_from_callable=True
+        )
+
+    def subscribe(
+        self,
+        channel: str,
+        on_message: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None
+    ) -> Callable[[], None]:
+        stopped = threading.Event()
+
+        def listen():
+            backoff = 1.0
+            while not stopped.is_set():
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                try:
+                    pubsub.subscribe(channel)
+                    backoff = 1.0
+                    if on_connect:
+                        on_connect()
+                    while not stopped.is_set():
+                        message = pubsub.get_message(timeout=1.0)
+                        if message:
+                            try:
+                                on_message(message["data"])
+                            except Exception:
+                                logger.exception(f"Subscriber of {channel} failed")
+                except redis.RedisError as e:
+                    logger.warning(f"Subscription to {channel} lost ({e}); retrying in {backoff:.0f}s")
+                    stopped.wait(backoff)
+                    backoff = min(backoff * 2, _SUBSCRIBE_MAX_BACKOFF)
+                finally:
+                    pubsub.close()
+
+        threading.Thread(target=listen, name=f"subscribe:{channel}", daemon=True).start()
+        return stopped.set
+
+    def stream_create_group(self, key: str, group: str, start_id: str = "0") -> bool:
+        try:
+            return self.client.xgroup_create(key, group, id=start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" in str(e):
+                return False
+            raise
+
+    def stream_set_group_position(self, key: str, group: str, entry_id: str):
+        self.client.xgroup_setid(key, group, entry_id)
+
+    def stream_read_group(
+        self,
+        group: str,
+        consumer: str,
+        keys: List[str],
+        count: int = 100,
+        block_ms: Optional[int] = None,
+        pending: bool = False
+    ) -> List[Tuple[str, List[Tuple[str, Dict[str, str]]]]]:
+        streams = {key: "0" if pending else ">" for key in keys}
+        replies = self.client.xreadgroup(group, consumer, streams, count=count, block=None if pending else block_ms)
+        result = []
+        for key, entries in replies or ():
+            # Pending entries trimmed from the stream come back without fields
+            trimmed = [entry_id for entry_id, fields in entries if not fields]
+            if trimmed:
+                self.client.xack(key, group, *trimmed)
+            entries = [(entry_id, fields) for entry_id, fields in entries if fields]
+            if entries:
+                result.append((key, entries))
+        return result
+
+    def stream_groups(self, key: str) -> Dict[str, Dict[str, Optional[int]]]:
+        try:
+            groups = self.client.xinfo_groups(key)
+        except redis.ResponseError:
+            return {}
+        # Redis reports no lag before 7.0, or after trims and deletions it can't account for
+        return {info["name"]: {"pending": info["pending"], "lag": info.get("lag")} for info in groups}
+
+    def scan_members(self, key: str, count: int = 1000) -> Iterator[str]:
+        return self.client.sscan_iter(key, count=count)
+
+    def append_unique(self, list_key: str, index_key: str, values: List[str]) -> List[int]:
+        if not values:
+            return []
+        return self._link_index(keys=[list_key, index_key], args=values)
+
+    def size(self) -> int:
+        return self.client.dbsize()
+
+    def flush(self):
+        self.client.flushdb()
@@ -0,0 +1,11 @@
+"""
+Benchmarks for the backend.
+
+    python -m benchmarks.run --scales small,medium --output results.json
+    python -m benchmarks.loadgen --scenario mixed --duration 30
+
+Benchmarks seed a synthetic dataset (benchmarks.dataset) into Redis. Pass
+--redis-url memory:// to run on the in-process MemoryEngine, or
+fakeredis:// for an in-process fakeredis server that still counts Redis
+commands (requires `pip install fakeredis[lua]`).
+"""
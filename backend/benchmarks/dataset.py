@@ -0,0 +1,264 @@
+"""
+Synthetic dataset generator.
+
+Seeds users, sending accounts, lead lists, leads, campaigns with sequences and
+variants, and email events through RedisDB.create_many, so every record
+carries the same indexes the API maintains. Generation is deterministic for
+a given scale and seed.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+from passlib.hash import bcrypt
+from app import database
+from app.instrumentation import InstrumentedRedis
+from app.storage import StorageEngine, MemoryEngine, RedisEngine
+from app.routers.auth import create_access_token
+from app.services.tracking_tokens import encode_token
+
+# Records per user at each scale; total leads = users * lists_per_user * leads_per_list
+SCALES = {
+    "small": {
+        "users": 2, "lists_per_user": 2, "leads_per_list": 250,
+        "campaigns_per_user": 2, "steps_per_campaign": 3, "variants_per_step": 2,
+        "events_per_lead": 2
+    },
+    "medium": {
+        "users": 4, "lists_per_user": 4, "leads_per_list": 1000,
+        "campaigns_per_user": 4, "steps_per_campaign": 3, "variants_per_step": 2,
+        "events_per_lead": 3
+    },
+    "large": {
+        "users": 8, "lists_per_user": 5, "leads_per_list": 2500,
+        "campaigns_per_user": 5, "steps_per_campaign": 3, "variants_per_step": 2,
+        "events_per_lead": 3
+    },
+}
+
+PASSWORD = "benchmark-password"
+SEQUENCE_BODY = (
+    'Hi {{first_name}}, a quick note about {{company}}. '
+    '<a href="https://example.com/pricing">Pricing</a> '
+    '<a href="https://example.com/case-study?ref=email">Case study</a>'
+)
+_EVENT_FOLLOW_UPS = ("opened", "clicked", "replied")
+_FIRST_NAMES = ("Ada", "Alan", "Grace", "Linus", "Barbara", "Ken", "Margaret", "Dennis")
+_COMPANIES = ("Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka")
+
+
+def connect_storage(url: str) -> StorageEngine:
+    """
+    Point the app at the benchmark storage and return the engine.
+    "memory://" uses the in-process MemoryEngine, "fakeredis://" an in-process
+    fakeredis server (Redis commands, counted in Server-Timing), anything else
+    is a Redis URL.
+    """
+    if url == "memory://":
+        engine = MemoryEngine()
+    elif url == "fakeredis://":
+        try:
+            import fakeredis
+        except ImportError:
+            raise SystemExit("--redis-url fakeredis:// needs fakeredis: pip install 'fakeredis[lua]'")
+        pool = fakeredis.FakeRedis(decode_responses=True).connection_pool
+        engine = RedisEngine(InstrumentedRedis(connection_pool=pool))
+    else:
+        engine = RedisEngine(InstrumentedRedis.from_url(url, decode_responses=True))
+
+    # get_db() and get_redis_db() resolve the engine through this function
+    database.get_storage_engine = lambda: engine
+    return engine
+
+
+def seed_dataset(
+    redis_db,
+    scale: str = "small",
+    seed: int = 0,
+    smtp_host: str = "127.0.0.1",
+    smtp_port: int = 2525
+) -> Dict[str, Any]:
+    """
+    Seed one scale of data. Returns the created IDs per user plus an access
+    token and an open-tracking token, for the benchmarks to address.
+    """
+    params = SCALES[scale]
+    rng = random.Random(seed)
+    password_hash = bcrypt.using(rounds=4).hash(PASSWORD)
+    start = datetime.utcnow() - timedelta(days=30)
+    users = []
+
+    for u in range(params["users"]):
+        user = redis_db.create_user(
+            email=f"bench{seed}-{scale}-{u}@example.com",
+            password_hash=password_hash,
+            full_name=f"Benchmark User {u}"
+        )
+        user_id = user["id"]
+
+        account = redis_db.create("sending_accounts", {
+            "email_address": f"sender{u}@example.com",
+            "display_name": f"Sender {u}",
+            "provider": "smtp",
+            "smtp_host": smtp_host,
+            "smtp_port": smtp_port,
+            "smtp_username": f"sender{u}@example.com",
+            "smtp_password_encrypted": "x",
+            "smtp_use_tls": False,
+            "daily_send_limit": 50,
+            "status": "active"
+        }, user_id=user_id)
+
+        lead_lists = redis_db.create_many("lead_lists", [
+            {"name": f"List {l}", "description": None, "lead_count": params["leads_per_list"]}
+            for l in range(params["lists_per_user"])
+        ], user_id=user_id)
+
+        campaigns = redis_db.create_many("campaigns", [
+            {
+                "name": f"Campaign {c}",
+                "status": "paused",
+                "lead_list_id": lead_lists[c % len(lead_lists)]["id"],
+                "sending_account_id": account["id"],
+                "daily_send_limit": 50,
+                "sent_count": 0,
+                "opened_count": 0,
+                "replied_count": 0,
+                "bounced_count": 0
+            }
+            for c in range(params["campaigns_per_user"])
+        ], user_id=user_id)
+        campaign_by_list = {}
+        for campaign in campaigns:
+            campaign_by_list.setdefault(campaign["lead_list_id"], campaign)
+
+        sequences = redis_db.create_many("email_sequences", [
+            {
+                "campaign_id": campaign["id"],
+                "step_number": step + 1,
+                "subject": f"Step {step + 1} for {{{{first_name}}}}",
+                "body": SEQUENCE_BODY,
+                "delay_days": step * 2,
+                "delay_hours": 0,
+                "delay_minutes": 0,
+                "is_reply": step > 0
+            }
+            for campaign in campaigns
+            for step in range(params["steps_per_campaign"])
+        ])
+        redis_db.create_many("email_sequence_variants", [
+            {
+                "sequence_id": sequence["id"],
+                "subject": f"Variant {v} - {sequence['subject']}",
+                "body": SEQUENCE_BODY,
+                "weight": 50,
+                "sent_count": 0,
+                "opened_count": 0,
+                "replied_count": 0,
+                "clicked_count": 0
+            }
+            for sequence in sequences
+            for v in range(params["variants_per_step"])
+        ])
+        first_steps = {s["campaign_id"]: s for s in sequences if s["step_number"] == 1}
+
+        leads = []
+        for lead_list in lead_lists:
+            campaign = campaign_by_list.get(lead_list["id"])
+            leads.extend(redis_db.create_many("leads", [
+                {
+                    "lead_list_id": lead_list["id"],
+                    "campaign_id": campaign["id"] if campaign else None,
+                    "email": f"lead{n}.{lead_list['id'][:8]}@example{u}.com",
+                    "first_name": rng.choice(_FIRST_NAMES),
+                    "last_name": f"Tester{n}",
+                    "company": rng.choice(_COMPANIES),
+                    "status": "active",
+                    "custom_fields": {"source": "benchmark"}
+                }
+                for n in range(params["leads_per_list"])
+            ], user_id=user_id))
+
+        events = []
+        for lead in leads:
+            if not lead["campaign_id"]:
+                continue
+            occurred = start + timedelta(minutes=rng.randrange(30 * 24 * 60))
+            base = {
+                "campaign_id": lead["campaign_id"],
+                "lead_id": lead["id"],
+                "sending_account_id": account["id"],
+                "sequence_id": first_steps[lead["campaign_id"]]["id"],
+                "step_number": 1
+            }
+            events.append({
+                **base,
+                "event_type": "sent",
+                "recipient_email": lead["email"],
+                "message_id": f"{lead['id']}@bench.example.com",
+                "occurred_at": occurred.isoformat()
+            })
+            for follow_up in _EVENT_FOLLOW_UPS[:params["events_per_lead"] - 1]:
+                if rng.random() < 0.5:
+                    break
+                occurred += timedelta(minutes=rng.randrange(1, 600))
+                events.append({**base, "event_type": follow_up, "occurred_at": occurred.isoformat()})
+        for offset in range(0, len(events), database.BATCH_SIZE):
+            redis_db.create_many("email_events", events[offset:offset + database.BATCH_SIZE])
+
+        sample_lead = leads[0]
+        users.append({
+            "user_id": user_id,
+            "email": user["email"],
+            "token": create_access_token(user_id),
+            "sending_account_id": account["id"],
+            "lead_list_ids": [l["id"] for l in lead_lists],
+            "campaign_ids": [c["id"] for c in campaigns],
+            "lead_ids": [l["id"] for l in leads],
+            "open_token": encode_token(
+                "open",
+                campaign_id=sample_lead["campaign_id"],
+                lead_id=sample_lead["id"],
+                sequence_id=first_steps[sample_lead["campaign_id"]]["id"],
+                sending_account_id=account["id"],
+                step_number=1
+            ),
+            "events": len(events)
+        })
+
+    return {
+        "scale": scale,
+        "seed": seed,
+        "params": params,
+        "users": users,
+        "totals": {
+            "users": len(users),
+            "leads": sum(len(u["lead_ids"]) for u in users),
+            "email_events": sum(u["events"] for u in users)
+        }
+    }
+
+
+def create_send_campaign(redis_db, user: Dict[str, Any], lead_list_id: str, daily_send_limit: int) -> Dict[str, Any]:
+    """A fresh active campaign over an existing list, so every send run has unsent leads"""
+    campaign = redis_db.create("campaigns", {
+        "name": "Send benchmark",
+        "status": "active",
+        "lead_list_id": lead_list_id,
+        "sending_account_id": user["sending_account_id"],
+        "daily_send_limit": daily_send_limit,
+        "sent_count": 0
+    }, user_id=user["user_id"])
+    redis_db.create_many("email_sequences", [{
+        "campaign_id": campaign["id"],
+        "step_number": 1,
+        "subject": "Hello {{first_name}}",
+        "body": SEQUENCE_BODY,
+        "delay_days": 0,
+        "is_reply": False
+    }])
+    return campaign
+
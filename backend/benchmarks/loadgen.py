@@ -0,0 +1,391 @@
+"""
+Load generator for the ASGI app under scripted traffic mixes.
+
+    python -m benchmarks.loadgen --scenario mixed --duration 30 --concurrency 32
+    python -m benchmarks.loadgen --scenario pixel --rate 2000 --duration 30
+    python -m benchmarks.loadgen --scenario dashboard --find-max --slo-p99-ms 250
+    python -m benchmarks.loadgen --url http://localhost:8000 --redis-url redis://localhost:6379/15 --flush
+
+Runs in-process against app.main:app by default, or over HTTP with --url (the
+server must use the same --redis-url so it sees the seeded data). Closed loop
+by default: --concurrency workers issue requests back to back. With --rate
+requests are started on a fixed schedule (open loop) and latency is measured
+from the scheduled start, so a stalled server is not hidden by fewer requests.
+--find-max doubles the concurrency until p99 breaks the SLO or errors pass 1%
+and reports the highest throughput that held.
+
+Reports per operation: requests, errors, throughput, p50/p90/p99/max latency,
+a latency histogram and Redis commands per second (from Server-Timing).
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import random
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# dataset sets the defaults the app's settings need, so it is imported first
+from .dataset import SCALES, connect_storage, create_send_campaign, seed_dataset
+from .smtp_sink import SMTPSink
+
+import httpx
+from app.database import get_redis_db
+
+_SERVER_TIMING_RE = re.compile(r'desc="(\d+) cmds/')
+# Histogram bucket upper bounds in milliseconds
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+IMPORT_ROWS = 100
+
+
+class Context:
+    """Seeded data and counters shared by the operations"""
+
+    def __init__(self, dataset: Dict[str, Any], send_campaign_ids: List[str], seed: int):
+        self.dataset = dataset
+        self.send_campaign_ids = send_campaign_ids
+        self.rng = random.Random(seed)
+        self.import_batches = 0
+
+    def user(self) -> Dict[str, Any]:
+        return self.rng.choice(self.dataset["users"])
+
+    def auth(self, user: Dict[str, Any]) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {user['token']}"}
+
+
+# Operations: (method, url, headers, body) for a random user
+
+def op_track_open(ctx: Context):
+    user = ctx.user()
+    return "GET", f"/api/email-events/track-open?t={user['open_token']}", {}, None
+
+
+def op_me(ctx: Context):
+    return "GET", "/api/auth/me", ctx.auth(ctx.user()), None
+
+
+def op_list_campaigns(ctx: Context):
+    return "GET", "/api/campaigns/", ctx.auth(ctx.user()), None
+
+
+def op_list_leads(ctx: Context):
+    user = ctx.user()
+    return "GET", f"/api/leads/?lead_list_id={ctx.rng.choice(user['lead_list_ids'])}", ctx.auth(user), None
+
+
+def op_list_email_events(ctx: Context):
+    user = ctx.user()
+    return "GET", f"/api/email-events/?campaign_id={ctx.rng.choice(user['campaign_ids'])}", ctx.auth(user), None
+
+
+def op_list_threads(ctx: Context):
+    return "GET", "/api/inbox/threads", ctx.auth(ctx.user()), None
+
+
+def op_import_leads(ctx: Context):
+    user = ctx.user()
+    ctx.import_batches += 1
+    batch = ctx.import_batches
+    body = "email,first_name,company\n" + "".join(
+        f"import{batch}.{n}@load.example.com,Load{n},LoadCo\n" for n in range(IMPORT_ROWS)
+    )
+    url = f"/api/leads/import?lead_list_id={ctx.rng.choice(user['lead_list_ids'])}"
+    return "POST", url, {**ctx.auth(user), "Content-Type": "text/csv"}, body.encode()
+
+
+def op_send_campaign(ctx: Context):
+    # Seeded send campaigns belong to the first user
+    user = ctx.dataset["users"][0]
+    campaign_id = ctx.rng.choice(ctx.send_campaign_ids)
+    return "POST", f"/api/emails/send-campaign?campaign_id={campaign_id}", ctx.auth(user), None
+
+
+OPERATIONS: Dict[str, Callable[[Context], Tuple]] = {
+    "track_open": op_track_open,
+    "me": op_me,
+    "list_campaigns": op_list_campaigns,
+    "list_leads": op_list_leads,
+    "list_email_events": op_list_email_events,
+    "list_threads": op_list_threads,
+    "import_leads": op_import_leads,
+    "send_campaign": op_send_campaign,
+}
+
+# Scenario -> operation weights
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "pixel": {"track_open": 1},
+    "dashboard": {
+        "me": 2, "list_campaigns": 3, "list_leads": 3, "list_email_events": 2, "list_threads": 1
+    },
+    "import": {"import_leads": 1},
+    "send": {"send_campaign": 1},
+    "mixed": {
+        "track_open": 80, "me": 4, "list_campaigns": 4, "list_leads": 4,
+        "list_email_events": 4, "list_threads": 1, "import_leads": 2, "send_campaign": 1
+    },
+}
+
+
+class OperationStats:
+    __slots__ = ("latencies", "errors", "redis_commands", "histogram")
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.redis_commands = 0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def record(self, seconds: float, ok: bool, redis_commands: int):
+        self.latencies.append(seconds)
+        self.errors += not ok
+        self.redis_commands += redis_commands
+        self.histogram[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000)] += 1
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def _execute(client: httpx.AsyncClient, ctx: Context, name: str, stats: Dict[str, OperationStats],
+                   started_at: Optional[float] = None):
+    method, url, headers, body = OPERATIONS[name](ctx)
+    if started_at is None:
+        started_at = time.perf_counter()
+    try:
+        response = await client.request(method, url, headers=headers, content=body)
+        ok = response.status_code < 400
+        match = _SERVER_TIMING_RE.search(response.headers.get("server-timing", ""))
+        commands = int(match.group(1)) if match else 0
+    except httpx.HTTPError:
+        ok, commands = False, 0
+    stats[name].record(time.perf_counter() - started_at, ok, commands)
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    ctx: Context,
+    scenario: str,
+    duration: float,
+    concurrency: int,
+    rate: Optional[float] = None
+) -> Dict[str, Any]:
+    """Drive one scenario for `duration` seconds and summarize it"""
+    weights = SCENARIOS[scenario]
+    names, cumulative = list(weights), []
+    total = 0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+
+    def pick() -> str:
+        return names[bisect.bisect_right(cumulative, ctx.rng.random() * total)]
+
+    stats = {name: OperationStats() for name in names}
+    started_at = time.perf_counter()
+    deadline = started_at + duration
+    dropped = 0
+
+    if rate:
+        # Open loop: start requests on schedule, at most `concurrency` in flight
+        in_flight = asyncio.Semaphore(concurrency)
+        tasks = set()
+        interval = 1.0 / rate
+        scheduled = started_at
+
+        async def fire(name: str, at: float):
+            async with in_flight:
+                await _execute(client, ctx, name, stats, started_at=at)
+
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if in_flight.locked():
+                dropped += 1
+            else:
+                task = asyncio.create_task(fire(pick(), scheduled))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            scheduled += interval
+        await asyncio.gather(*tasks)
+    else:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await _execute(client, ctx, pick(), stats)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    elapsed = time.perf_counter() - started_at
+    return summarize(scenario, stats, elapsed, concurrency, rate, dropped)
+
+
+def summarize(scenario: str, stats: Dict[str, OperationStats], elapsed: float, concurrency: int,
+              rate: Optional[float], dropped: int) -> Dict[str, Any]:
+    operations = {}
+    all_latencies = []
+    errors = commands = 0
+    for name, op in stats.items():
+        if not op.latencies:
+            continue
+        latencies = sorted(op.latencies)
+        all_latencies.extend(latencies)
+        errors += op.errors
+        commands += op.redis_commands
+        operations[name] = {
+            "requests": len(latencies),
+            "errors": op.errors,
+            "error_rate": round(op.errors / len(latencies), 4),
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+            "redis_commands_per_second": round(op.redis_commands / elapsed, 1),
+            "histogram_ms": {
+                (f"<={bound}" if i < len(HISTOGRAM_BOUNDS_MS) else f">{HISTOGRAM_BOUNDS_MS[-1]}"): count
+                for i, (bound, count) in enumerate(zip(HISTOGRAM_BOUNDS_MS + (None,), op.histogram))
+                if count
+            }
+        }
+    all_latencies.sort()
+    requests = len(all_latencies)
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "target_rps": rate,
+        "duration_s": round(elapsed, 2),
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "dropped": dropped,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 2),
+        "max_ms": round(all_latencies[-1] * 1000, 2) if all_latencies else 0.0,
+        "redis_commands_per_second": round(commands / elapsed, 1),
+        "operations": operations
+    }
+
+
+async def find_max(client, ctx, scenario: str, duration: float, max_concurrency: int, slo_p99_ms: float) -> Dict[str, Any]:
+    """Double concurrency until p99 exceeds the SLO or errors pass 1%; keep the best run that held"""
+    best, runs = None, []
+    concurrency = 1
+    while concurrency <= max_concurrency:
+        report = await run_load(client, ctx, scenario, duration, concurrency)
+        runs.append({key: report[key] for key in ("concurrency", "rps", "p50_ms", "p99_ms", "error_rate")})
+        print(f"  concurrency {concurrency:>4}: {report['rps']:>9.1f} rps  p99 {report['p99_ms']:>8.2f} ms  "
+              f"errors {report['error_rate']:.2%}")
+        if report["p99_ms"] > slo_p99_ms or report["error_rate"] > 0.01:
+            break
+        if best is None or report["rps"] > best["rps"]:
+            best = report
+        concurrency *= 2
+    return {"scenario": scenario, "slo_p99_ms": slo_p99_ms, "max_sustainable": best, "steps": runs}
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['scenario']}: {report['requests']} requests in {report['duration_s']}s, "
+          f"{report['rps']} rps, p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, "
+          f"errors {report['error_rate']:.2%}, dropped {report['dropped']}, "
+          f"redis {report['redis_commands_per_second']} cmds/s")
+    for name, op in sorted(report["operations"].items(), key=lambda item: -item[1]["requests"]):
+        print(f"  {name:<18} {op['requests']:>7} req {op['rps']:>8.1f} rps  p50 {op['p50_ms']:>8.2f}  "
+              f"p90 {op['p90_ms']:>8.2f}  p99 {op['p99_ms']:>8.2f}  max {op['max_ms']:>8.2f} ms  "
+              f"err {op['error_rate']:.2%}  redis {op['redis_commands_per_second']:>9.1f} cmds/s")
+        print(f"  {'':<18} {op['histogram_ms']}")
+
+
+async def main_async(args) -> Dict[str, Any]:
+    engine = connect_storage(args.redis_url)
+    if engine.size() and not args.flush:
+        raise SystemExit(f"{args.redis_url} is not empty; pass --flush to clear it")
+    engine.flush()
+
+    sink = await SMTPSink().start()
+    redis_db = get_redis_db(engine)
+    dataset = seed_dataset(redis_db, args.scale, seed=args.seed, smtp_port=sink.port)
+    first_user = dataset["users"][0]
+    send_campaign_ids = [
+        create_send_campaign(redis_db, first_user, lead_list_id, 50)["id"]
+        for lead_list_id in first_user["lead_list_ids"]
+    ]
+    ctx = Context(dataset, send_campaign_ids, args.seed)
+    print(f"Seeded {args.scale}: {dataset['totals']}")
+
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        from app.main import app
+        transport, base_url = httpx.ASGITransport(app=app), "http://loadgen"
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, limits=limits, timeout=30.0) as client:
+            scenarios = args.scenario.split(",")
+            results = []
+            for scenario in scenarios:
+                if args.find_max:
+                    print(f"\nFinding max sustainable load for {scenario} (p99 <= {args.slo_p99_ms} ms)")
+                    result = await find_max(client, ctx, scenario, args.duration, args.concurrency, args.slo_p99_ms)
+                    best = result["max_sustainable"]
+                    print(f"  max sustainable: {best['rps'] if best else 0} rps "
+                          f"at concurrency {best['concurrency'] if best else '-'}")
+                else:
+                    result = await run_load(client, ctx, scenario, args.duration, args.concurrency, args.rate)
+                    print_report(result)
+                results.append(result)
+    finally:
+        await sink.stop()
+
+    return {
+        "target": args.url or "in-process",
+        "scale": args.scale,
+        "emails_delivered_to_sink": sink.messages,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the tracking and dashboard endpoints")
+    parser.add_argument("--scenario", default="mixed", help=f"Comma-separated: {', '.join(SCENARIOS)}")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario (per step with --find-max)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Workers (closed loop), max in flight (--rate) or upper bound (--find-max)")
+    parser.add_argument("--rate", type=float, help="Open loop: requests started per second")
+    parser.add_argument("--find-max", action="store_true", help="Search for the max RPS that meets --slo-p99-ms")
+    parser.add_argument("--slo-p99-ms", type=float, default=200.0)
+    parser.add_argument("--url", help="Base URL of a running server (default: in-process app)")
+    parser.add_argument("--redis-url", default="memory://",
+                        help="Redis to seed, or memory:// / fakeredis:// (in-process only)")
+    parser.add_argument("--flush", action="store_true", help="FLUSHDB a non-empty Redis database before seeding")
+    parser.add_argument("--scale", default="small", choices=list(SCALES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.url and args.redis_url in ("memory://", "fakeredis://"):
+        parser.error("--url needs --redis-url pointing at the server's Redis")
+    for scenario in args.scenario.split(","):
+        if scenario not in SCENARIOS:
+            parser.error(f"unknown scenario {scenario!r}")
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Listing endpoints under load are expected to trip the slow request log
+    logging.getLogger("app.instrumentation").setLevel(logging.ERROR)
+    report = asyncio.run(main_async(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
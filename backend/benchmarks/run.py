@@ -0,0 +1,296 @@
+"""
+Benchmark suite for RedisDB and the listing, tracking and send paths.
+
+    python -m benchmarks.run --redis-url memory:// --scales small,medium \
+        --output results.json [--compare baseline.json]
+
+Each scale is seeded into an empty database (real Redis needs --flush to
+clear the selected DB first), then every benchmark runs --repeat times.
+Router benchmarks go through the ASGI app with httpx, including middleware
+and response serialization. Results are written as JSON with min/median/p95
+per benchmark plus the Redis commands and round trips it made.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import re
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+# dataset sets the defaults the app's settings need, so it is imported first
+from .dataset import SCALES, connect_storage, create_send_campaign, seed_dataset
+from .smtp_sink import SMTPSink
+
+import httpx
+from app.codec import CODECS
+from app.database import encode_record, get_redis_db
+from app.instrumentation import RedisStats, current_redis_stats
+from app.main import app
+from app.responses import listing_cache
+from app.services.email_sender import send_campaign_emails
+
+_SERVER_TIMING_RE = re.compile(r'desc="(\d+) cmds/(\d+) trips"')
+
+
+def summarize(name: str, scale: str, samples: List[float], commands: int, round_trips: int, **extra) -> Dict[str, Any]:
+    samples_ms = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        "scale": scale,
+        "runs": len(samples_ms),
+        "min_ms": round(samples_ms[0], 3),
+        "median_ms": round(statistics.median(samples_ms), 3),
+        "p95_ms": round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 3),
+        "max_ms": round(samples_ms[-1], 3),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "redis_commands": commands,
+        "redis_round_trips": round_trips,
+        **extra
+    }
+
+
+async def bench_call(name: str, scale: str, repeat: int, func: Callable[[], Any]) -> Dict[str, Any]:
+    """Time a direct (sync) call, counting its Redis usage"""
+    samples = []
+    for _ in range(repeat):
+        stats = RedisStats()
+        token = current_redis_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            func()
+        finally:
+            samples.append(time.perf_counter() - started_at)
+            current_redis_stats.reset(token)
+    return summarize(name, scale, samples, stats.commands, stats.round_trips)
+
+
+async def bench_request(
+    name: str,
+    scale: str,
+    repeat: int,
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str] = None,
+    expected_status: int = 200
+) -> Dict[str, Any]:
+    """Time a request through the ASGI app; Redis usage comes from its Server-Timing header"""
+    samples = []
+    commands = round_trips = 0
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        response = await client.get(url, headers=headers)
+        samples.append(time.perf_counter() - started_at)
+        if response.status_code != expected_status:
+            raise RuntimeError(f"{name}: GET {url} returned {response.status_code}")
+        match = _SERVER_TIMING_RE.search(response.headers.get("server-timing", ""))
+        if match:
+            commands, round_trips = int(match.group(1)), int(match.group(2))
+    return summarize(name, scale, samples, commands, round_trips, response_bytes=len(response.content))
+
+
+async def bench_send(name: str, scale: str, repeat: int, redis_db, user: Dict[str, Any], sink: SMTPSink) -> Dict[str, Any]:
+    """Time send_campaign_emails for one daily batch into the SMTP sink"""
+    lead_list_id = user["lead_list_ids"][0]
+    list_lead_ids = [l["id"] for l in redis_db.get_by_field("leads", "lead_list_id", lead_list_id)]
+    batch = min(50, len(list_lead_ids))
+
+    samples = []
+    stats = RedisStats()
+    sent_before = sink.messages
+    for _ in range(repeat):
+        # Fresh campaign and re-activated leads so each run sends a full batch
+        redis_db.set_fields_many("leads", list_lead_ids, {"status": "active"}, user["user_id"])
+        campaign = create_send_campaign(redis_db, user, lead_list_id, batch)
+
+        stats = RedisStats()
+        token = current_redis_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            result = await send_campaign_emails(redis_db, campaign["id"])
+        finally:
+            samples.append(time.perf_counter() - started_at)
+            current_redis_stats.reset(token)
+        if not result.get("success"):
+            raise RuntimeError(f"{name}: {result.get('error')}")
+
+    sent = sink.messages - sent_before
+    return summarize(
+        name, scale, samples, stats.commands, stats.round_trips,
+        emails_per_run=batch,
+        emails_sent=sent,
+        per_email_ms=round(statistics.median(samples) * 1000 / max(batch, 1), 3)
+    )
+
+
+def measure_record_sizes(redis_db, scale: str, entity: str = "email_events") -> Dict[str, Any]:
+    """
+    Bytes per stored record, compact (RECORD_LAYOUTS) vs the plain object, for
+    each codec over one batch of stored records. This is the value size only;
+    Redis's per-key overhead is the same either way, so the saving in used
+    memory is smaller than the saving shown here.
+    """
+    records = next(redis_db.iter_batches(entity), [])
+    sizes = {}
+    for codec_name, codec_class in CODECS.items():
+        codec = codec_class()
+        compact = sum(len(encode_record(entity, record, codec)) for record in records)
+        plain = sum(len(codec.dumps(record)) for record in records)
+        sizes[codec_name] = {
+            "compact_bytes": round(compact / max(len(records), 1), 1),
+            "object_bytes": round(plain / max(len(records), 1), 1),
+            "saving": round(1 - compact / plain, 3) if plain else 0.0
+        }
+    return {"name": f"storage.{entity}.record_bytes", "scale": scale, "records": len(records), "codecs": sizes}
+
+
+async def run_scale(engine, scale: str, repeat: int, seed: int, sink: SMTPSink) -> List[Dict[str, Any]]:
+    redis_db = get_redis_db(engine)
+    results = []
+    started_at = time.perf_counter()
+    dataset = seed_dataset(redis_db, scale, seed=seed, smtp_port=sink.port)
+    print(f"[{scale}] seeded {dataset['totals']} in {time.perf_counter() - started_at:.1f}s")
+
+    sizes = measure_record_sizes(redis_db, scale)
+    sizes["dataset"] = dataset["totals"]
+    results.append(sizes)
+    for codec_name, size in sizes["codecs"].items():
+        print(f"  {sizes['name'] + '.' + codec_name:<36} {size['compact_bytes']:>8.1f} B compact, "
+              f"{size['object_bytes']:.1f} B as objects ({size['saving']:.0%} smaller)")
+
+    user = dataset["users"][0]
+    auth = {"Authorization": f"Bearer {user['token']}"}
+    lead_list_id = user["lead_list_ids"][0]
+    campaign_id = user["campaign_ids"][0]
+
+    benchmarks: List[Callable[[], Awaitable[Dict[str, Any]]]] = [
+        lambda: bench_call("redis.get_all.leads_by_user", scale, repeat,
+                           lambda: redis_db.get_all("leads", user_id=user["user_id"])),
+        lambda: bench_call("redis.get_all.email_events", scale, repeat,
+                           lambda: redis_db.get_all("email_events")),
+        lambda: bench_call("redis.get_by_field.leads_by_list", scale, repeat,
+                           lambda: redis_db.get_by_field("leads", "lead_list_id", lead_list_id)),
+        lambda: bench_call("redis.get_many.leads", scale, repeat,
+                           lambda: redis_db.get_many("leads", user["lead_ids"][:1000])),
+    ]
+
+    # Record codecs on the same listing: response encoding and record decoding
+    leads = redis_db.get_all("leads", user_id=user["user_id"])
+    for codec_name, codec_class in CODECS.items():
+        codec = codec_class()
+        encoded = [codec.dumps(lead) for lead in leads]
+        benchmarks += [
+            lambda codec=codec: bench_call(f"codec.{codec.name}.dumps_listing", scale, repeat,
+                                           lambda: codec.dumps_bytes(leads)),
+            lambda codec=codec, encoded=encoded: bench_call(f"codec.{codec.name}.loads_records", scale, repeat,
+                                                            lambda: [codec.loads(v) for v in encoded]),
+        ]
+
+    # Listing benchmarks measure full builds, not bodies cached by ETag
+    listing_cache.max_bytes = 0
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        etag = (await http.get("/api/leads/", headers=auth)).headers["etag"]
+        benchmarks += [
+            lambda: bench_request("api.list_leads.by_list", scale, repeat, http,
+                                  f"/api/leads/?lead_list_id={lead_list_id}", auth),
+            lambda: bench_request("api.list_leads.all", scale, repeat, http, "/api/leads/", auth),
+            lambda: bench_request("api.list_leads.all.not_modified", scale, repeat, http, "/api/leads/",
+                                  {**auth, "If-None-Match": etag}, expected_status=304),
+            lambda: bench_request("api.list_email_events.by_campaign", scale, repeat, http,
+                                  f"/api/email-events/?campaign_id={campaign_id}", auth),
+            lambda: bench_request("api.list_email_events.all", scale, repeat, http, "/api/email-events/", auth),
+            lambda: bench_request("api.list_threads", scale, repeat, http, "/api/inbox/threads", auth),
+            lambda: bench_request("api.track_open", scale, repeat * 50, http,
+                                  f"/api/email-events/track-open?t={user['open_token']}"),
+            lambda: bench_send("send_campaign_emails", scale, repeat, redis_db, user, sink),
+        ]
+        for benchmark in benchmarks:
+            result = await benchmark()
+            result["dataset"] = dataset["totals"]
+            results.append(result)
+            print(f"  {result['name']:<36} median {result['median_ms']:>10.3f} ms  "
+                  f"p95 {result['p95_ms']:>10.3f} ms  redis {result['redis_commands']} cmds/"
+                  f"{result['redis_round_trips']} trips")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str):
+    """Print median ratios against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = {(r["name"], r["scale"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (median, >1.00 is slower):")
+    for result in results:
+        before = baseline.get((result["name"], result["scale"]))
+        if before and before.get("median_ms") and "median_ms" in result:
+            ratio = result["median_ms"] / before["median_ms"]
+            print(f"  {result['scale']:<7} {result['name']:<36} {ratio:6.2f}x  "
+                  f"({before['median_ms']:.3f} -> {result['median_ms']:.3f} ms)")
+
+
+async def main_async(args) -> Dict[str, Any]:
+    engine = connect_storage(args.redis_url)
+    sink = await SMTPSink().start()
+    if engine.size() and not args.flush:
+        raise SystemExit(f"{args.redis_url} is not empty; pass --flush to clear it")
+
+    results = []
+    try:
+        for scale in args.scales.split(","):
+            engine.flush()
+            results.extend(await run_scale(engine, scale, args.repeat, args.seed, sink))
+    finally:
+        await sink.stop()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "redis_url": args.redis_url,
+            "repeat": args.repeat,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend benchmark suite")
+    parser.add_argument("--redis-url", default="memory://",
+                        help="Redis URL, or memory:// (MemoryEngine) or fakeredis:// to run in-process")
+    parser.add_argument("--scales", default="small", help=f"Comma-separated scales: {', '.join(SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument("--seed", type=int, default=0, help="Dataset random seed")
+    parser.add_argument("--flush", action="store_true", help="FLUSHDB a non-empty Redis database before seeding")
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write JSON results")
+    parser.add_argument("--compare", help="Previous results JSON to compare medians against")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    # Large listings are expected to trip the slow request log
+    logging.getLogger("app.instrumentation").setLevel(logging.ERROR)
+    report = asyncio.run(main_async(args))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        compare(report["results"], args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Local SMTP sink for send benchmarks: accepts any AUTH, envelope and message
+and discards the data, counting messages. Plain text only (no STARTTLS), so
+benchmark sending accounts are seeded with smtp_use_tls=False.
+"""
+import asyncio
+from typing import Optional
+
+
+class SMTPSink:
+    """Minimal asyncio SMTP server (EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, hostname: str = "sink.local"):
+        self.host = host
+        self.port = port
+        self.hostname = hostname
+        self.messages = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "SMTPSink":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply(f"220 {self.hostname} ESMTP sink")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip().upper()
+
+                if command.startswith(("EHLO", "HELO")):
+                    await reply(f"250-{self.hostname}\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800")
+                elif command.startswith("AUTH LOGIN"):
+                    # Username and password prompts, unless given inline
+                    if len(command.split()) < 3:
+                        await reply("334 VXNlcm5hbWU6")
+                        await reader.readline()
+                    await reply("334 UGFzc3dvcmQ6")
+                    await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif command.startswith("AUTH"):
+                    if len(command.split()) < 3:
+                        await reply("334 ")
+                        await reader.readline()
+                    await reply("235 2.7.0 Authentication successful")
+                elif command.startswith("DATA"):
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.messages += 1
+                    await reply("250 2.0.0 Ok: queued")
+                elif command.startswith("QUIT"):
+                    await reply("221 2.0.0 Bye")
+                    break
+                elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                    await reply("250 2.0.0 Ok")
+                else:
+                    await reply("502 5.5.2 Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,32 @@
+"""
+Shared fixtures. Tests run on the in-memory storage engine; nothing here
+needs Redis, SMTP or IMAP.
+"""
+import os
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ["STORAGE_ENGINE"] = "memory"
+
+import pytest
+from app.database import RedisDB
+from app.storage import MemoryEngine
+
+
+@pytest.fixture
+def engine():
+    return MemoryEngine()
+
+
+@pytest.fixture
+def redis_db(engine):
+    return RedisDB(engine)
+
+
+@pytest.fixture
+def user(redis_db):
+    return redis_db.create_user("owner@example.com", "hash", "Owner")
+
+
+@pytest.fixture
+def campaign(redis_db, user):
+    return redis_db.create("campaigns", {"name": "Launch", "status": "draft"}, user_id=user["id"])
@@ -0,0 +1,132 @@
+"""
+Local IMAP stand-in for reply listener tests: one INBOX held in memory,
+any LOGIN accepted, plain text only (accounts use imap_use_ssl=False).
+Speaks just what IdleConnection and imaplib's fetch path send.
+"""
+import asyncio
+import re
+from typing import List, Optional
+
+_ITEM_RE = re.compile(r"BODY\.PEEK\[([^\]]*)\](?:<(\d+)\.(\d+)>)?", re.I)
+
+
+class IMAPStub:
+    """Minimal asyncio IMAP server (CAPABILITY, LOGIN, SELECT/EXAMINE, IDLE, UID SEARCH/FETCH, NOOP, LOGOUT)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, uidvalidity: int = 1, keepalive: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.uidvalidity = uidvalidity
+        # Seconds between untagged "still here" responses during IDLE
+        self.keepalive = keepalive
+        self.messages: List[bytes] = []
+        self.logins = 0
+        # Sessions currently in IDLE
+        self.idling = 0
+        self._arrived = asyncio.Event()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "IMAPStub":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def deliver(self, raw: bytes):
+        """Add a message to the INBOX and wake every session waiting in IDLE"""
+        self.messages.append(raw)
+        arrived, self._arrived = self._arrived, asyncio.Event()
+        arrived.set()
+
+    def _fetch_item(self, raw: bytes, section: str, partial) -> bytes:
+        head, _, body = raw.partition(b"\r\n\r\n")
+        if section.upper().startswith("HEADER"):
+            data = head + b"\r\n\r\n"
+        elif section.upper() == "TEXT":
+            data = body
+        else:
+            data = raw
+        if partial[0]:
+            start, length = int(partial[0]), int(partial[1])
+            data = data[start:start + length]
+        return data
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def reply(line: str):
+            writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply("* OK [CAPABILITY IMAP4rev1 IDLE] stub ready")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                tag, _, rest = line.decode(errors="replace").strip().partition(" ")
+                command, _, args = rest.partition(" ")
+                command = command.upper()
+                if command == "UID":
+                    command, _, args = args.partition(" ")
+                    command = "UID " + command.upper()
+
+                if command == "CAPABILITY":
+                    await reply("* CAPABILITY IMAP4rev1 IDLE")
+                    await reply(f"{tag} OK CAPABILITY completed")
+                elif command == "LOGIN":
+                    self.logins += 1
+                    await reply(f"{tag} OK LOGIN completed")
+                elif command in ("SELECT", "EXAMINE"):
+                    await reply(f"* {len(self.messages)} EXISTS")
+                    await reply(f"* OK [UIDVALIDITY {self.uidvalidity}] UIDs valid")
+                    await reply(f"* OK [UIDNEXT {len(self.messages) + 1}] Predicted next UID")
+                    await reply(f"{tag} OK [READ-ONLY] {command} completed")
+                elif command == "IDLE":
+                    await reply("+ idling")
+                    self.idling += 1
+                    seen = len(self.messages)
+                    done = asyncio.ensure_future(reader.readline())
+                    while not done.done():
+                        arrived = asyncio.ensure_future(self._arrived.wait())
+                        await asyncio.wait([done, arrived], timeout=self.keepalive, return_when=asyncio.FIRST_COMPLETED)
+                        arrived.cancel()
+                        if not done.done() and not arrived.done():
+                            await reply("* OK Still here")
+                        if len(self.messages) > seen:
+                            seen = len(self.messages)
+                            await reply(f"* {seen} EXISTS")
+                    self.idling -= 1
+                    await reply(f"{tag} OK IDLE terminated")
+                elif command == "UID SEARCH":
+                    # Every UID; the client drops the ones it has already seen
+                    await reply("* SEARCH " + " ".join(str(uid) for uid in range(1, len(self.messages) + 1)))
+                    await reply(f"{tag} OK SEARCH completed")
+                elif command == "UID FETCH":
+                    uid_set, _, items = args.partition(" ")
+                    for uid in (int(uid) for uid in uid_set.split(",")):
+                        if not 1 <= uid <= len(self.messages):
+                            continue
+                        parts = [f"* {uid} FETCH (UID {uid}".encode()]
+                        for match in _ITEM_RE.finditer(items):
+                            section, start, length = match.groups()
+                            data = self._fetch_item(self.messages[uid - 1], section, (start, length))
+                            name = f"BODY[{section}]" + (f"<{start}>" if start else "")
+                            parts.append(f" {name} {{{len(data)}}}\r\n".encode() + data)
+                        writer.write(b"".join(parts) + b")\r\n")
+                    await reply(f"{tag} OK FETCH completed")
+                elif command == "LOGOUT":
+                    await reply("* BYE stub closing")
+                    await reply(f"{tag} OK LOGOUT completed")
+                    break
+                elif command == "NOOP":
+                    await reply(f"{tag} OK NOOP completed")
+                else:
+                    await reply(f"{tag} BAD Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
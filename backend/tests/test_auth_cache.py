@@ -0,0 +1,34 @@
+import pytest
+
+from app.database import RedisDB
+from app.entity_cache import EntityCache
+from app.services.auth_cache import AuthCache
+
+
+@pytest.fixture
+def redis_db(engine):
+    return RedisDB(engine, cache=EntityCache(["users"], max_size=100, ttl=60.0))
+
+
+def test_revalidated_profile_is_read_past_the_entity_cache(redis_db, user):
+    cache = AuthCache(max_size=10, user_ttl=0)
+    assert cache.get_user(redis_db, user["id"])["full_name"] == "Owner"
+    # Warm the entity cache with the current record
+    redis_db.get("users", user["id"])
+
+    # Another process changes the profile; its invalidation has not arrived here yet
+    changed = {**redis_db.get("users", user["id"], fresh=True), "full_name": "Renamed"}
+    redis_db.engine.set(f"users:{user['id']}", redis_db._encode("users", changed))
+    redis_db.bump_user_version(user["id"])
+
+    profile = cache.get_user(redis_db, user["id"])
+    assert profile["full_name"] == "Renamed"
+    assert "password_hash" not in profile
+
+
+def test_login_lookup_reads_the_stored_password_hash(redis_db, user):
+    redis_db.get("users", user["id"])
+    changed = {**redis_db.get("users", user["id"], fresh=True), "password_hash": "new-hash"}
+    redis_db.engine.set(f"users:{user['id']}", redis_db._encode("users", changed))
+
+    assert redis_db.get_user_by_email("owner@example.com")["password_hash"] == "new-hash"
@@ -0,0 +1,117 @@
+import email
+
+from app.services.bounce_parser import looks_like_bounce, parse_bounce
+from app.services.reply_checker import process_messages
+
+DSN = """\
+From: Mail Delivery System <MAILER-DAEMON@mx.example.net>
+To: sender@example.com
+Subject: Undelivered Mail Returned to Sender
+MIME-Version: 1.0
+Content-Type: multipart/report; report-type=delivery-status; boundary="b1"
+
+--b1
+Content-Type: text/plain
+
+This is the mail system at host mx.example.net.
+
+--b1
+Content-Type: message/delivery-status
+
+Reporting-MTA: dns; mx.example.net
+
+Final-Recipient: rfc822; {recipient}
+Action: failed
+Status: {status}
+Diagnostic-Code: smtp; 550 5.1.1 <{recipient}>: Recipient address rejected
+
+--b1
+Content-Type: text/rfc822-headers
+
+From: sender@example.com
+To: {recipient}
+Message-ID: <{message_id}>
+Subject: Launch
+
+--b1--
+"""
+
+TEXT_BOUNCE = """\
+From: Mail Delivery System <Mailer-Daemon@mail.example.org>
+To: sender@example.com
+Subject: Mail delivery failed: returning message to sender
+X-Failed-Recipients: gone@example.org
+Content-Type: text/plain
+
+This message was created automatically by mail delivery software.
+
+A message that you sent could not be delivered to one or more of its
+recipients. This is a permanent error.
+
+  gone@example.org
+    SMTP error from remote mail server after RCPT TO:<gone@example.org>:
+    550 No such user
+
+------ This is a copy of the message, including all the headers. ------
+
+Message-ID: <sent-2@example.com>
+Subject: Launch
+"""
+
+
+def _dsn(recipient="lead@example.com", status="5.1.1", message_id="sent-1@example.com"):
+    return email.message_from_string(DSN.format(recipient=recipient, status=status, message_id=message_id))
+
+
+def test_rfc3464_report():
+    msg = _dsn()
+    assert looks_like_bounce(msg)
+    bounce = parse_bounce(msg)
+    assert bounce["original_message_id"] == "sent-1@example.com"
+    [recipient] = bounce["recipients"]
+    assert recipient["recipient"] == "lead@example.com"
+    assert recipient["status"] == "5.1.1"
+    assert recipient["action"] == "failed"
+    assert recipient["hard"]
+
+
+def test_temporary_failure_is_soft():
+    [recipient] = parse_bounce(_dsn(status="4.2.2"))["recipients"]
+    assert not recipient["hard"]
+
+
+def test_text_bounce_uses_failed_recipients_header():
+    bounce = parse_bounce(email.message_from_string(TEXT_BOUNCE))
+    assert bounce["original_message_id"] == "sent-2@example.com"
+    [recipient] = bounce["recipients"]
+    assert recipient["recipient"] == "gone@example.org"
+    assert recipient["status"] == "5.0.0"
+    assert recipient["hard"]
+
+
+def test_ordinary_reply_is_not_a_bounce():
+    msg = email.message_from_string("From: lead@example.com\nSubject: Re: Launch\n\nThanks!\n")
+    assert not looks_like_bounce(msg)
+    assert parse_bounce(msg) is None
+
+
+def test_hard_bounces_count_each_lead_once(redis_db, user, campaign):
+    account = {"id": "acct-1", "email_address": "sender@example.com"}
+    for n in (1, 2):
+        lead = redis_db.create("leads", {"email": f"lead{n}@example.com", "status": "sent"}, user_id=user["id"])
+        redis_db.create("email_events", {
+            "campaign_id": campaign["id"], "lead_id": lead["id"],
+            "event_type": "sent", "message_id": f"sent-{n}@example.com"
+        })
+    bounces = [_dsn(f"lead{n}@example.com", message_id=f"sent-{n}@example.com") for n in (1, 2)]
+
+    results = process_messages(redis_db, account, bounces)
+    assert [result["bounce_type"] for result in results] == ["hard", "hard"]
+    # The same bounce seen again (e.g. a refetch) is logged but not counted
+    process_messages(redis_db, account, bounces[:1])
+
+    [stored] = redis_db.with_counters("campaigns", [redis_db.get("campaigns", campaign["id"], fresh=True)])
+    assert stored["bounced_count"] == 2
+    assert redis_db.find_suppressed(user["id"], ["lead1@example.com", "lead2@example.com"]) == {
+        "lead1@example.com", "lead2@example.com"
+    }
@@ -0,0 +1,36 @@
+from app.services.cascade_delete import create_cascade_job, run_cascade_job
+
+
+def _seed_dependents(redis_db, campaign):
+    sequence = redis_db.create("email_sequences", {"campaign_id": campaign["id"], "step_number": 1})
+    redis_db.create_many("email_events", [
+        {"campaign_id": campaign["id"], "lead_id": "lead-1", "event_type": "sent"},
+        {"campaign_id": campaign["id"], "lead_id": "lead-1", "event_type": "opened"},
+    ])
+    return sequence
+
+
+def test_background_cascade_bumps_versions_after_root_is_gone(redis_db, user, campaign):
+    _seed_dependents(redis_db, campaign)
+    job = create_cascade_job(redis_db, "campaigns", campaign["id"], user["id"])
+    before = redis_db.get_collection_versions(user["id"], ["email_sequences", "email_events"])
+
+    # The route hides the campaign before the job runs
+    redis_db.delete("campaigns", campaign["id"])
+    job = run_cascade_job(redis_db, job["id"], "campaigns", campaign["id"], user["id"])
+
+    assert job["status"] == "completed"
+    assert job["deleted"] == {"email_sequences": 1, "email_events": 2}
+    after = redis_db.get_collection_versions(user["id"], ["email_sequences", "email_events"])
+    assert all(new > old for new, old in zip(after, before))
+    assert redis_db.get_by_field("email_events", "campaign_id", campaign["id"]) == []
+
+
+def test_finished_jobs_are_purged_after_retention(redis_db, user, campaign):
+    job = create_cascade_job(redis_db, "campaigns", campaign["id"], user["id"])
+    run_cascade_job(redis_db, job["id"], "campaigns", campaign["id"], user["id"])
+
+    assert redis_db.purge_finished_jobs(3600) == 0
+    assert redis_db.purge_finished_jobs(0) == 1
+    assert redis_db.get("jobs", job["id"]) is None
+    assert redis_db.engine.sorted_range_by_score("jobs:finished") == []
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.services import link_tracking
+from app.services.link_tracking import ClickRecorder
+
+
+@pytest.fixture
+def clicks_db(monkeypatch, redis_db):
+    monkeypatch.setattr(link_tracking, "get_redis_db", lambda: redis_db)
+    return redis_db
+
+
+def _click(n: int) -> dict:
+    return {"campaign_id": "c1", "lead_id": f"lead-{n}", "url": f"https://example.com/{n}"}
+
+
+def _clicked(redis_db) -> list:
+    return [e for e in redis_db.get_all("email_events") if e["event_type"] == "clicked"]
+
+
+def test_full_batch_is_flushed_by_the_background_task(clicks_db):
+    async def scenario():
+        recorder = ClickRecorder(flush_interval=60.0, batch_size=3, max_pending=100)
+        recorder.start()
+        try:
+            recorder.record(_click(1))
+            recorder.record(_click(2))
+            assert _clicked(clicks_db) == []
+            recorder.record(_click(3))
+            # record() itself never writes
+            assert len(recorder._pending) == 3
+            for _ in range(50):
+                if not recorder._pending:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await recorder.stop()
+
+    asyncio.run(scenario())
+    assert sorted(e["lead_id"] for e in _clicked(clicks_db)) == ["lead-1", "lead-2", "lead-3"]
+
+
+def test_failed_flush_keeps_clicks_for_the_next_one(monkeypatch, clicks_db):
+    recorder = ClickRecorder(flush_interval=60.0, batch_size=100, max_pending=100)
+    create_many = clicks_db.create_many
+
+    def failing(entity, records):
+        raise ConnectionError("redis down")
+
+    for n in range(3):
+        recorder.record(_click(n))
+    monkeypatch.setattr(clicks_db, "create_many", failing)
+    assert recorder.flush() is False
+    recorder.record(_click(3))
+    assert len(recorder._pending) == 4
+
+    monkeypatch.setattr(clicks_db, "create_many", create_many)
+    assert recorder.flush() is True
+    assert recorder._pending == []
+    assert len(_clicked(clicks_db)) == 4
+
+
+def test_requeued_clicks_are_bounded(monkeypatch, clicks_db):
+    recorder = ClickRecorder(flush_interval=60.0, batch_size=100, max_pending=3)
+    monkeypatch.setattr(clicks_db, "create_many", lambda entity, records: 1 / 0)
+
+    for n in range(5):
+        recorder.record(_click(n))
+    recorder.flush()
+
+    # The oldest clicks are dropped first
+    assert [click["lead_id"] for click in recorder._pending] == ["lead-2", "lead-3", "lead-4"]
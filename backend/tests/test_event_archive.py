@@ -0,0 +1,61 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import ARCHIVED_ENTITIES, INDEXED_FIELDS, RedisDB, _packed, decode_record, get_db
+from app.dependencies import get_current_user
+from app.routers import email_events, inbox
+from app.storage import SQLiteArchive
+
+
+@pytest.fixture
+def archived_db(tmp_path, engine, monkeypatch):
+    archive = SQLiteArchive(
+        str(tmp_path / "events.db"),
+        {entity: INDEXED_FIELDS.get(entity, ()) for entity in ARCHIVED_ENTITIES},
+        encode=lambda entity, record: RedisDB(engine).codec.dumps_bytes(_packed(entity, record)),
+        decode=decode_record
+    )
+    redis_db = RedisDB(engine, archive=archive)
+    for router in (email_events, inbox):
+        monkeypatch.setattr(router, "get_redis_db", lambda db: redis_db)
+
+    def whole_archive(*args, **kwargs):
+        raise AssertionError("listing read the whole archive")
+
+    monkeypatch.setattr(archive, "iter_batches", whole_archive)
+    return redis_db
+
+
+@pytest.fixture
+def client(engine, user):
+    app = FastAPI()
+    app.include_router(email_events.router)
+    app.include_router(inbox.router)
+    app.dependency_overrides[get_db] = lambda: engine
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+def _sent(redis_db, owner, campaign):
+    lead = redis_db.create("leads", {"email": f"lead-{owner['id']}@example.com"}, user_id=owner["id"])
+    event = redis_db.create("email_events", {
+        "campaign_id": campaign["id"], "lead_id": lead["id"], "event_type": "sent"
+    })
+    return lead, event
+
+
+def test_unfiltered_listings_read_only_the_users_archived_events(archived_db, client, user, campaign):
+    other = archived_db.create_user("other@example.com", "hash")
+    theirs = archived_db.create("campaigns", {"name": "Theirs"}, user_id=other["id"])
+    lead, old = _sent(archived_db, user, campaign)
+    _, other_old = _sent(archived_db, other, theirs)
+    archived_db.archive_records("email_events", [old, other_old])
+    archived_db.create("email_events", {"campaign_id": campaign["id"], "lead_id": lead["id"], "event_type": "replied"})
+
+    events = client.get("/api/email-events/").json()
+    assert sorted(event["event_type"] for event in events) == ["replied", "sent"]
+    assert {event["lead"]["id"] for event in events} == {lead["id"]}
+
+    threads = client.get("/api/inbox/threads").json()
+    assert [(t["lead_id"], t["event_count"], t["has_reply"]) for t in threads] == [(lead["id"], 2, True)]
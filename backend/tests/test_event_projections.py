@@ -0,0 +1,51 @@
+from app.config import get_settings
+from app.database import decode_record
+from app.event_log import EventLogConsumer, stream_keys
+from app.services.event_projections import PROJECTIONS
+
+
+def _consumer(redis_db):
+    consumer = EventLogConsumer(redis_db, PROJECTIONS["campaign_stats"], "worker-1", decode_record)
+    consumer.setup()
+    return consumer
+
+
+def _events(redis_db, campaign, *event_types):
+    redis_db.create_many("email_events", [
+        {"campaign_id": campaign["id"], "lead_id": f"lead-{n}", "event_type": event_type}
+        for n, event_type in enumerate(event_types)
+    ])
+
+
+def test_redelivered_entries_are_counted_once(redis_db, campaign):
+    consumer = _consumer(redis_db)
+    _events(redis_db, campaign, "sent", "sent", "opened")
+    assert consumer.poll() == 3
+
+    # The same entries delivered again (a consumer that died before its acknowledgement was seen)
+    for key in stream_keys():
+        redis_db.engine.stream_set_group_position(key, "campaign_stats", "0")
+    assert consumer.poll() == 3
+
+    assert redis_db.get_event_counts(campaign["id"]) == {"sent": 2, "opened": 1}
+
+
+def test_events_of_deleted_campaigns_leave_no_stats(redis_db, campaign):
+    consumer = _consumer(redis_db)
+    _events(redis_db, campaign, "sent")
+    redis_db.delete("campaigns", campaign["id"])
+
+    assert consumer.poll() == 1
+    assert redis_db.engine.hash_get_all(f"stats:by_campaign:{campaign['id']}") == {}
+
+
+def test_replay_rebuilds_from_records_beyond_the_trimmed_log(monkeypatch, redis_db, campaign):
+    monkeypatch.setattr(get_settings(), "event_stream_max_length", 2)
+    consumer = _consumer(redis_db)
+    _events(redis_db, campaign, "sent", "sent", "sent", "opened", "clicked")
+
+    consumer.replay()
+    # The retained entries were already counted by the rebuild
+    consumer.poll()
+
+    assert redis_db.get_event_counts(campaign["id"]) == {"sent": 3, "opened": 1, "clicked": 1}
@@ -0,0 +1,30 @@
+import csv
+import io
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.routers import email_events
+
+
+def test_csv_export_carries_send_errors_and_click_urls(engine, redis_db, user, campaign):
+    lead = redis_db.create("leads", {"email": "lead@example.com"}, user_id=user["id"])
+    redis_db.create_many("email_events", [
+        {"campaign_id": campaign["id"], "lead_id": lead["id"], "event_type": "failed",
+         "error_message": "550 mailbox unavailable"},
+        {"campaign_id": campaign["id"], "lead_id": lead["id"], "event_type": "clicked",
+         "url": "https://example.com/pricing"},
+    ])
+    app = FastAPI()
+    app.include_router(email_events.router)
+    app.dependency_overrides[get_db] = lambda: engine
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    response = TestClient(app).get("/api/email-events/export?format=csv")
+
+    assert response.status_code == 200
+    rows = {row["event_type"]: row for row in csv.DictReader(io.StringIO(response.text))}
+    assert rows["failed"]["error_message"] == "550 mailbox unavailable"
+    assert rows["clicked"]["url"] == "https://example.com/pricing"
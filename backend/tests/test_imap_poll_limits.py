@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+
+from app.config import get_settings
+from app.services import reply_checker
+
+
+class _Sock:
+    def __init__(self):
+        self.timeouts = []
+
+    def settimeout(self, value):
+        self.timeouts.append(value)
+
+
+class SlowIMAP:
+    """imaplib stand-in whose SEARCH takes longer than the whole poll is allowed"""
+
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sock = _Sock()
+        self.commands = []
+        self.logged_out = False
+        SlowIMAP.instances.append(self)
+
+    def login(self, user, password):
+        return "OK", [b""]
+
+    def select(self, mailbox, readonly=False):
+        return "OK", [b"1"]
+
+    def response(self, code):
+        return code, [b"1"]
+
+    def uid(self, command, *args):
+        self.commands.append(command)
+        time.sleep(0.2)
+        return "OK", [b"1 2 3"]
+
+    def logout(self):
+        self.logged_out = True
+
+
+def test_fetch_stops_itself_at_the_poll_deadline(monkeypatch):
+    monkeypatch.setattr(reply_checker.imaplib, "IMAP4", SlowIMAP)
+    account = {"imap_host": "imap.test", "imap_use_ssl": False, "email_address": "a@test"}
+
+    with pytest.raises(TimeoutError):
+        reply_checker.fetch_new_messages(account, None, timeout=5.0, poll_timeout=0.1)
+
+    mail = SlowIMAP.instances[-1]
+    assert mail.commands == ["SEARCH"]
+    assert mail.logged_out
+    # Each command's socket timeout is capped by what remains of the poll
+    assert 0 < max(mail.sock.timeouts[:-1]) <= 0.1
+
+
+def test_host_slot_is_held_until_the_fetch_thread_returns(monkeypatch, redis_db):
+    monkeypatch.setattr(get_settings(), "imap_max_connections_per_host", 1)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch(account, sync_state, timeout, poll_timeout):
+        with lock:
+            active.append(account["id"])
+            peak.append(len(active))
+        time.sleep(0.2)
+        with lock:
+            active.remove(account["id"])
+        return [], {"uidvalidity": 1, "last_uid": 0}
+
+    monkeypatch.setattr(reply_checker, "fetch_new_messages", fetch)
+
+    async def poll_all():
+        host_limits = defaultdict(lambda: asyncio.Semaphore(1))
+        accounts = [{"id": f"acct-{i}", "imap_host": "imap.test", "email_address": f"{i}@test"} for i in range(3)]
+        tasks = [asyncio.ensure_future(reply_checker.poll_account(redis_db, a, host_limits)) for a in accounts]
+        await asyncio.sleep(0.05)
+        # Cancelling the poll that holds the slot must not let another connection start early
+        tasks[0].cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(poll_all())
+    assert max(peak) == 1
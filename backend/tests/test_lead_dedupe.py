@@ -0,0 +1,45 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.routers import leads
+
+
+def _legacy_lead(redis_db, engine, user, lead_list, email):
+    """A lead stored before the email index existed"""
+    lead = redis_db.create("leads", {"email": email, "lead_list_id": lead_list["id"]}, user_id=user["id"])
+    engine.delete(f"leads:email_ids:by_lead_list_id:{lead_list['id']}", f"leads:email_counts:by_user:{user['id']}")
+    return lead
+
+
+def test_index_of_existing_list_is_built_on_first_lookup(redis_db, engine, user):
+    lead_list = redis_db.create("lead_lists", {"name": "Old"}, user_id=user["id"])
+    lead = _legacy_lead(redis_db, engine, user, lead_list, "Lead@Example.com")
+    other = redis_db.create("lead_lists", {"name": "Other"}, user_id=user["id"])
+
+    assert redis_db.find_lead_emails(["lead@example.com"], lead_list_id=lead_list["id"]) == {
+        "lead@example.com": lead["id"]
+    }
+    assert redis_db.find_lead_emails(["lead@example.com"], lead_list_id=other["id"], user_id=user["id"]) == {
+        "lead@example.com": None
+    }
+
+
+def test_bulk_create_reports_skipped_duplicates(redis_db, engine, user):
+    lead_list = redis_db.create("lead_lists", {"name": "Old"}, user_id=user["id"])
+    _legacy_lead(redis_db, engine, user, lead_list, "lead@example.com")
+    app = FastAPI()
+    app.include_router(leads.router)
+    app.dependency_overrides[get_db] = lambda: engine
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    response = TestClient(app).post("/api/leads/bulk", json={
+        "lead_list_id": lead_list["id"],
+        "leads": [{"email": "lead@example.com"}, {"email": "new@example.com"}, {"email": "NEW@example.com"}],
+    })
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["skipped"]) == (1, 2)
+    assert [lead["email"] for lead in body["leads"]] == ["new@example.com"]
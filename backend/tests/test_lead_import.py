@@ -0,0 +1,52 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.dependencies import get_current_user
+from app.routers import leads
+
+
+@pytest.fixture
+def client(engine, user):
+    app = FastAPI()
+    app.include_router(leads.router)
+    app.dependency_overrides[get_db] = lambda: engine
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+@pytest.fixture
+def lead_list(redis_db, user):
+    return redis_db.create("lead_lists", {"name": "List"}, user_id=user["id"])
+
+
+def test_other_users_campaign_is_rejected(client, redis_db, lead_list):
+    other = redis_db.create_user("other@example.com", "hash")
+    theirs = redis_db.create("campaigns", {"name": "Theirs"}, user_id=other["id"])
+
+    imported = client.post(
+        f"/api/leads/import?lead_list_id={lead_list['id']}&campaign_id={theirs['id']}",
+        content=b"email\nlead@example.com\n", headers={"content-type": "text/csv"}
+    )
+    bulk = client.post("/api/leads/bulk", json={
+        "lead_list_id": lead_list["id"], "campaign_id": theirs["id"], "leads": [{"email": "lead@example.com"}]
+    })
+
+    assert (imported.status_code, bulk.status_code) == (404, 404)
+    assert redis_db.get_by_field("leads", "lead_list_id", lead_list["id"]) == []
+
+
+def test_upsert_moves_existing_leads_to_the_campaign(client, redis_db, user, campaign, lead_list):
+    lead = redis_db.create("leads", {"email": "lead@example.com", "lead_list_id": lead_list["id"]}, user_id=user["id"])
+
+    response = client.post(
+        f"/api/leads/import?lead_list_id={lead_list['id']}&campaign_id={campaign['id']}&mode=upsert",
+        content=b"email,company\nlead@example.com,Acme\n", headers={"content-type": "text/csv"}
+    )
+
+    assert response.status_code == 200
+    assert response.json()["updated"] == 1
+    stored = redis_db.get("leads", lead["id"], fresh=True)
+    assert (stored["campaign_id"], stored["company"]) == (campaign["id"], "Acme")
+    assert [l["id"] for l in redis_db.get_by_field("leads", "campaign_id", campaign["id"])] == [lead["id"]]
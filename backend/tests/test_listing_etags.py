@@ -0,0 +1,103 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import RedisDB, get_db
+from app.dependencies import get_current_user
+from app.entity_cache import EntityCache
+from app.routers import campaigns, email_events
+from app.services.tracking_tokens import encode_token
+
+
+@pytest.fixture
+def client(engine, user):
+    app = FastAPI()
+    app.include_router(campaigns.router)
+    app.include_router(email_events.router)
+    app.dependency_overrides[get_db] = lambda: engine
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+def _revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_unchanged_listing_is_not_modified(client, campaign):
+    first = client.get("/api/campaigns/")
+    assert first.status_code == 200
+    assert [c["id"] for c in first.json()] == [campaign["id"]]
+
+    second = _revalidate(client, "/api/campaigns/", first.headers["etag"])
+    assert second.status_code == 304
+    assert second.headers["etag"] == first.headers["etag"]
+
+
+def test_writes_change_the_etag(client, redis_db, user, campaign):
+    etag = client.get("/api/campaigns/").headers["etag"]
+
+    redis_db.update("campaigns", campaign["id"], {"name": "Renamed"})
+    changed = _revalidate(client, "/api/campaigns/", etag)
+    assert changed.status_code == 200
+    assert changed.json()[0]["name"] == "Renamed"
+
+    # Counters live outside the record but still change the listing
+    etag = changed.headers["etag"]
+    redis_db.increment_counters("campaigns", {campaign["id"]: {"bounced_count": 1}}, owners={user["id"]})
+    counted = _revalidate(client, "/api/campaigns/", etag)
+    assert counted.status_code == 200
+    assert counted.json()[0]["bounced_count"] == 1
+
+
+def test_tracked_open_changes_the_event_listing(monkeypatch, client, redis_db, user, campaign):
+    lead = redis_db.create("leads", {"email": "lead@example.com", "status": "sent"}, user_id=user["id"])
+    etag = client.get("/api/email-events/").headers["etag"]
+
+    owners = RedisDB._owners
+
+    def resolve(self, entity, records):
+        # The open handler knows the owner from the lead; no campaign lookup on this path
+        assert entity != "email_events"
+        return owners(self, entity, records)
+
+    monkeypatch.setattr(RedisDB, "_owners", resolve)
+
+    token = encode_token("open", campaign_id=campaign["id"], lead_id=lead["id"], step_number=1)
+    assert client.get(f"/api/email-events/track-open?t={token}").status_code == 200
+
+    changed = _revalidate(client, "/api/email-events/", etag)
+    assert changed.status_code == 200
+    assert [event["event_type"] for event in changed.json()] == ["opened"]
+
+
+def test_other_users_writes_keep_the_etag(client, redis_db, campaign):
+    etag = client.get("/api/campaigns/").headers["etag"]
+    other = redis_db.create_user("other@example.com", "hash")
+    redis_db.create("campaigns", {"name": "Theirs"}, user_id=other["id"])
+
+    assert _revalidate(client, "/api/campaigns/", etag).status_code == 304
+
+
+def test_listing_is_built_past_the_entity_cache(monkeypatch, client, engine, user, campaign):
+    redis_db = RedisDB(engine, cache=EntityCache(["campaigns", "sending_accounts"], max_size=100, ttl=60.0))
+    monkeypatch.setattr(campaigns, "get_redis_db", lambda db: redis_db)
+    redis_db.get("campaigns", campaign["id"])
+
+    # Another process renames the campaign; its invalidation has not arrived here yet
+    changed = {**redis_db.get("campaigns", campaign["id"], fresh=True), "name": "Renamed"}
+    engine.set(f"campaigns:{campaign['id']}", redis_db._encode("campaigns", changed))
+    engine.hash_incr(f"versions:by_user:{user['id']}", "campaigns")
+
+    # The body stored under the new ETag must not be the cached copy
+    assert client.get("/api/campaigns/").json()[0]["name"] == "Renamed"
+
+
+@pytest.mark.parametrize("status", ["replied", "bounced", "unsubscribed"])
+def test_late_open_keeps_the_lead_status(client, redis_db, user, campaign, status):
+    lead = redis_db.create("leads", {"email": "lead@example.com", "status": status}, user_id=user["id"])
+
+    token = encode_token("open", campaign_id=campaign["id"], lead_id=lead["id"], step_number=1)
+    assert client.get(f"/api/email-events/track-open?t={token}").status_code == 200
+
+    assert redis_db.get("leads", lead["id"], fresh=True)["status"] == status
+    assert [event["event_type"] for event in redis_db.get_all("email_events")] == ["opened"]
@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+def test_metrics_need_the_token(monkeypatch):
+    monkeypatch.setattr(main.settings, "metrics_token", "scrape-secret")
+    client = TestClient(main.app)
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
+
+
+def test_metrics_without_token_are_loopback_only(monkeypatch):
+    monkeypatch.setattr(main.settings, "metrics_token", "")
+
+    assert TestClient(main.app).get("/metrics").status_code == 404
+    assert TestClient(main.app, client=("127.0.0.1", 50000)).get("/metrics").status_code == 200
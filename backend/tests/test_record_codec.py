@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app import database
+from app.codec import CODECS
+from app.database import RECORD_LAYOUTS, decode_record, encode_record
+
+EVENT = {
+    "id": "e1",
+    "created_at": "2026-01-01T00:00:00",
+    "updated_at": "2026-01-01T00:00:00",
+    "occurred_at": "2026-01-01T00:00:00",
+    "event_type": "bounced",
+    "campaign_id": "c1",
+    "lead_id": "l1",
+    "sequence_id": None,
+    "step_number": 1,
+    "sending_account_id": "a1",
+    "message_id": None,
+    "recipient_email": "lead@example.com",
+    "subject": "Hello",
+}
+
+
+@pytest.fixture(params=sorted(CODECS))
+def codec(request):
+    return CODECS[request.param]()
+
+
+@pytest.mark.parametrize("extras", [{}, {"metadata": {"bounce_type": "hard"}, "error_message": "550"}])
+def test_round_trip(codec, extras):
+    record = {**EVENT, **extras}
+    assert decode_record("email_events", encode_record("email_events", record, codec), codec) == record
+
+
+def test_updated_at_is_kept_when_it_differs(codec):
+    record = {**EVENT, "updated_at": "2026-01-02T00:00:00"}
+    assert decode_record("email_events", encode_record("email_events", record, codec), codec) == record
+
+
+def test_unlayouted_entities_stay_objects(codec):
+    record = {"id": "l1", "email": "lead@example.com"}
+    data = encode_record("leads", record, codec)
+    assert isinstance(codec.loads(data), dict)
+    assert decode_record("leads", data, codec) == record
+
+
+@pytest.mark.parametrize("extras", [{}, {"metadata": {"status": "5.1.1"}}])
+def test_records_survive_an_appended_layout_field(monkeypatch, codec, extras):
+    record = {**EVENT, **extras}
+    data = encode_record("email_events", record, codec)
+
+    monkeypatch.setitem(RECORD_LAYOUTS, "email_events", RECORD_LAYOUTS["email_events"] + ("url",))
+    assert decode_record("email_events", data, codec) == {**record, "url": None}
+
+
+@pytest.mark.parametrize("extras", [{}, {"metadata": {"status": "5.1.1"}}])
+def test_tag_1_records_are_still_read(extras):
+    layout = RECORD_LAYOUTS["email_events"]
+    # Tag 1 wrote the trailing object only when there were other fields
+    legacy = [1, *(EVENT[field] for field in layout)]
+    legacy[layout.index("updated_at") + 1] = None
+    if extras:
+        legacy.append(extras)
+    assert decode_record("email_events", json.dumps(legacy)) == {**EVENT, **extras}
+    assert database.RECORD_LAYOUT_TAG == 2
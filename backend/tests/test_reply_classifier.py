@@ -0,0 +1,36 @@
+import email
+
+import pytest
+
+from app.services.reply_classifier import HUMAN_REPLY, UNSUBSCRIBE_REQUEST, classify_reply
+
+
+def _reply(body: str, subject: str = "Re: Launch"):
+    return email.message_from_string(f"From: lead@example.com\nSubject: {subject}\n\n{body}")
+
+
+@pytest.mark.parametrize("body", [
+    "unsubscribe",
+    "Please unsubscribe me from this list.",
+    "Remove me",
+    "Hi,\n\nTake me off your mailing list, thanks.\n\nJane",
+    "Stop emailing me!",
+    "Please don't contact me again.",
+])
+def test_imperative_requests_are_unsubscribes(body):
+    assert classify_reply(_reply(body)) == UNSUBSCRIBE_REQUEST
+
+
+def test_unsubscribe_subject_is_an_unsubscribe():
+    assert classify_reply(_reply("", subject="Re: Unsubscribe")) == UNSUBSCRIBE_REQUEST
+
+
+@pytest.mark.parametrize("body", [
+    "Not interested right now, but keep me on the list for next quarter.",
+    "Can you send the opt-out rates for your last campaign?",
+    "How do I unsubscribe my colleague? I still want these.",
+    "If this doesn't fit, I can always remove me from the thread later. Let's talk Tuesday.",
+    "Thanks!\n\n> Reply unsubscribe to stop receiving these emails",
+])
+def test_mentions_of_unsubscribing_are_human_replies(body):
+    assert classify_reply(_reply(body)) == HUMAN_REPLY
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from app.services.reply_listener import IdleConnection, ReplyListener
+from .imap_stub import IMAPStub
+
+REPLY = (
+    b"From: Lead <lead@example.com>\r\n"
+    b"To: sender@example.com\r\n"
+    b"Subject: Re: Launch\r\n"
+    b"Message-ID: <reply-1@example.com>\r\n"
+    b"In-Reply-To: <sent-1@example.com>\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"\r\n"
+    b"Sounds good, let's talk next week.\r\n"
+)
+
+
+async def _until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def _seed(redis_db, user, campaign, port):
+    account = redis_db.create("sending_accounts", {
+        "email_address": "sender@example.com",
+        "status": "active",
+        "imap_host": "127.0.0.1",
+        "imap_port": port,
+        "imap_use_ssl": False,
+    }, user_id=user["id"])
+    lead = redis_db.create("leads", {"email": "lead@example.com", "status": "contacted"}, user_id=user["id"])
+    redis_db.create("email_events", {
+        "campaign_id": campaign["id"],
+        "lead_id": lead["id"],
+        "sending_account_id": account["id"],
+        "event_type": "sent",
+        "message_id": "sent-1@example.com",
+    })
+    return account, lead
+
+
+def test_reply_pushed_during_idle_is_recorded(redis_db, user, campaign):
+    async def scenario():
+        stub = await IMAPStub().start()
+        account, lead = _seed(redis_db, user, campaign, stub.port)
+        listener = ReplyListener(redis_db)
+        try:
+            listener._refresh()
+            await _until(lambda: stub.idling)
+
+            await stub.deliver(REPLY)
+            await _until(lambda: redis_db.get("leads", lead["id"], fresh=True)["status"] == "replied")
+        finally:
+            for task in listener.tasks.values():
+                task.cancel()
+            await asyncio.gather(*listener.tasks.values(), return_exceptions=True)
+            await stub.stop()
+
+        events = redis_db.get_by_field("email_events", "lead_id", lead["id"])
+        assert sorted(event["event_type"] for event in events) == ["replied", "sent"]
+        assert redis_db.get_imap_sync_state(account["id"])["last_uid"] == 1
+        # Fetched on the IDLE connection, not a second login
+        assert stub.logins == 1
+
+    asyncio.run(scenario())
+
+
+def test_listener_restarts_when_account_changes(redis_db, user, campaign):
+    async def scenario():
+        old, new = await IMAPStub().start(), await IMAPStub().start()
+        account, _ = _seed(redis_db, user, campaign, old.port)
+        listener = ReplyListener(redis_db)
+        try:
+            listener._refresh()
+            await _until(lambda: old.idling)
+            first = listener.tasks[account["id"]]
+
+            listener._refresh()
+            assert listener.tasks[account["id"]] is first
+
+            # Fields the connection doesn't use are picked up without a restart
+            redis_db.update("sending_accounts", account["id"], {"daily_send_limit": 10})
+            listener._refresh()
+            assert listener.tasks[account["id"]] is first
+            assert listener.accounts[account["id"]]["daily_send_limit"] == 10
+
+            redis_db.update("sending_accounts", account["id"], {"imap_port": new.port})
+            listener._refresh()
+            await _until(lambda: new.idling)
+            assert first.cancelled() or first.done()
+        finally:
+            for task in listener.tasks.values():
+                task.cancel()
+            await asyncio.gather(*listener.tasks.values(), return_exceptions=True)
+            await old.stop()
+            await new.stop()
+
+    asyncio.run(scenario())
+
+
+def test_idle_timeout_is_not_extended_by_keepalives():
+    async def scenario():
+        stub = await IMAPStub(keepalive=0.05).start()
+        conn = IdleConnection(stub.host, stub.port, use_ssl=False, timeout=5.0)
+        try:
+            await conn.connect()
+            await conn.login("sender@example.com", "secret")
+            await conn.select("INBOX")
+
+            started = time.monotonic()
+            assert await conn.idle(0.3) is False
+            assert time.monotonic() - started < 1.0
+        finally:
+            await conn.close()
+            await stub.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+import base64
+import hashlib
+import hmac
+import struct
+import uuid
+
+from app.services.tracking_tokens import MAC_SIZE, decode_token, encode_token, get_signing_keys
+
+IDS = {field: str(uuid.uuid4()) for field in ("campaign_id", "lead_id", "sequence_id", "sending_account_id")}
+
+
+def test_click_tokens_round_trip_without_a_variant():
+    token = encode_token("click", step_number=2, link_index=3, **IDS)
+    assert decode_token(token) == ("click", {**IDS, "step_number": 2, "link_index": 3})
+    # kind, key version, four UUIDs, two uint16s and the MAC
+    assert len(base64.urlsafe_b64decode(token + "==")) == 2 + 4 * 16 + 4 + MAC_SIZE
+
+
+def test_click_tokens_with_the_old_variant_slot_still_decode():
+    payload = bytes([2, 1]) + b"".join(uuid.UUID(IDS[f]).bytes for f in IDS) + bytes(16) + struct.pack(">2H", 1, 0)
+    mac = hmac.new(get_signing_keys()[1], payload, hashlib.sha256).digest()[:MAC_SIZE]
+    token = base64.urlsafe_b64encode(payload + mac).rstrip(b"=").decode()
+
+    assert decode_token(token) == ("click", {**IDS, "step_number": 1, "link_index": 0})
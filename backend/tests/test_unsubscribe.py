@@ -0,0 +1,68 @@
+import email
+
+from app.services.reply_checker import process_messages
+from app.services.tracking_tokens import encode_token
+
+
+def _lead_with_sent_email(redis_db, user, campaign, address="lead@example.com"):
+    lead = redis_db.create("leads", {"email": address, "status": "sent"}, user_id=user["id"])
+    redis_db.create("email_events", {
+        "campaign_id": campaign["id"], "lead_id": lead["id"],
+        "event_type": "sent", "message_id": f"sent-{lead['id']}@example.com"
+    })
+    return lead
+
+
+def test_unsubscribe_reply_adds_list_entry(redis_db, user, campaign):
+    lead = _lead_with_sent_email(redis_db, user, campaign)
+    msg = email.message_from_string(
+        f"From: lead@example.com\nSubject: Re: Launch\nIn-Reply-To: <sent-{lead['id']}@example.com>\n\n"
+        "Please unsubscribe me from this list.\n"
+    )
+
+    [result] = process_messages(redis_db, {"id": "acct-1", "email_address": "sender@example.com"}, [msg])
+
+    assert result["status"] == "unsubscribe_detected"
+    assert redis_db.get("leads", lead["id"], fresh=True)["status"] == "unsubscribed"
+    assert redis_db.find_suppressed(user["id"], ["lead@example.com"]) == {"lead@example.com"}
+    [entry] = redis_db.get_all("unsubscribe_list", user_id=user["id"])
+    assert entry["email"] == "lead@example.com"
+    assert entry["reason"] == "reply"
+
+
+def test_mailto_unsubscribe_is_matched_by_its_token(redis_db, user, campaign):
+    lead = _lead_with_sent_email(redis_db, user, campaign)
+    token = encode_token("unsubscribe", campaign_id=campaign["id"], lead_id=lead["id"])
+    # Sent by the mail client to the List-Unsubscribe mailto: no In-Reply-To
+    msg = email.message_from_string(f"From: lead@example.com\nSubject: unsubscribe {token}\n\n")
+    forged = email.message_from_string(f"From: lead@example.com\nSubject: unsubscribe {token[:-4]}AAAA\n\n")
+
+    results = process_messages(redis_db, {"id": "acct-1", "email_address": "sender@example.com"}, [msg, forged])
+
+    assert [result["status"] for result in results] == ["unsubscribe_detected"]
+    [entry] = redis_db.get_all("unsubscribe_list", user_id=user["id"])
+    assert entry["reason"] == "mailto"
+
+
+def test_unsubscribe_of_bounced_address_adds_list_entry_once(redis_db, user, campaign):
+    lead = _lead_with_sent_email(redis_db, user, campaign)
+    redis_db.suppress_emails(user["id"], ["lead@example.com"], "bounced")
+
+    redis_db.unsubscribe_lead(lead["id"], reason="one_click")
+    redis_db.unsubscribe_lead(lead["id"], reason="one_click")
+
+    assert len(redis_db.get_all("unsubscribe_list", user_id=user["id"])) == 1
+
+
+def test_lifting_unsubscribe_keeps_hard_bounce_suppression(redis_db, user, campaign):
+    bounced = _lead_with_sent_email(redis_db, user, campaign, "bounced@example.com")
+    unsubscribed = _lead_with_sent_email(redis_db, user, campaign, "unsubscribed@example.com")
+    redis_db.suppress_emails(user["id"], ["bounced@example.com"], "bounced")
+    redis_db.unsubscribe_lead(bounced["id"])
+    redis_db.unsubscribe_lead(unsubscribed["id"])
+
+    redis_db.unsuppress_emails(user["id"], ["bounced@example.com", "unsubscribed@example.com"], "unsubscribed")
+
+    assert redis_db.find_suppressed(user["id"], ["bounced@example.com", "unsubscribed@example.com"]) == {
+        "bounced@example.com"
+    }
@@ -56,14 +56,18 @@ export function useCreateLeadsBulk() {
   return useMutation({
     mutationFn: async ({ leadListId, campaignId, leads }: { leadListId: string; campaignId?: string; leads: { email: string; first_name?: string; last_name?: string; company?: string; custom_fields?: Record<string, unknown> }[] }) => {
       const data = await api.createLeadsBulk(leadListId, campaignId, leads);
-      return data as Lead[];
+      return data as { created: number; skipped: number; leads: Lead[] };
     },
     onSuccess: (data, variables) => {
       queryClient.invalidateQueries({ queryKey: ["leads"] });
       if (variables.campaignId) {
         queryClient.invalidateQueries({ queryKey: ["leads", variables.campaignId] });
       }
-      toast.success(`${data.length} leads imported successfully`);
+      toast.success(
+        data.skipped
+          ? `${data.created} leads imported, ${data.skipped} duplicates skipped`
+          : `${data.created} leads imported successfully`
+      );
     },
     onError: (error) => {
       toast.error(`Failed to import leads: ${(error as Error).message}`);
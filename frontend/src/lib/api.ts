@@ -136,7 +136,7 @@ class ApiClient {
     }
 
     async createLeadsBulk(leadListId: string, campaignId: string | undefined, leads: any[]) {
-        return this.request<any[]>('/api/leads/bulk', {
+        return this.request<{ created: number; skipped: number; leads: any[] }>('/api/leads/bulk', {
             method: 'POST',
             body: JSON.stringify({ lead_list_id: leadListId, campaign_id: campaignId, leads }),
         });